@@ -0,0 +1,132 @@
+"""
+管理 API Blueprint
+提供 Redis session 分析與清理的管理端點（需設定 ADMIN_TOKEN）
+"""
+
+import os
+from functools import wraps
+
+from flask import Blueprint, request, jsonify
+
+from shared.logger import get_logger
+from shared.session_store import BaseSessionStore
+from shared.session_admin import collect_session_stats, make_predicate, sweep_sessions
+
+
+# 創建 Blueprint
+admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
+
+logger = get_logger(__name__)
+
+# 單次請求最多掃描的 key 數（避免 HTTP 請求長時間佔用 Redis）
+MAX_KEYS_PER_REQUEST = int(os.getenv("ADMIN_MAX_KEYS", 50000))
+
+# 管理端點的預設速率（每秒處理的 key 數）
+ADMIN_OPS_PER_SECOND = float(os.getenv("ADMIN_OPS_PER_SECOND", 1000))
+
+# 請求參數 rate 的下限（0 或負數會關閉速率限制，因此不接受）
+ADMIN_MIN_OPS_PER_SECOND = 1.0
+
+
+def require_admin_token(view):
+    """驗證 X-Admin-Token；未設定 ADMIN_TOKEN 時管理端點一律關閉"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        admin_token = os.getenv("ADMIN_TOKEN")
+        if not admin_token:
+            return jsonify({"error": "管理端點未啟用"}), 404
+        if request.headers.get("X-Admin-Token") != admin_token:
+            return jsonify({"error": "未授權"}), 401
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _scan_options(params: dict) -> dict:
+    """解析共用的掃描參數"""
+    max_keys = min(int(params.get("max_keys", MAX_KEYS_PER_REQUEST)), MAX_KEYS_PER_REQUEST)
+    return {
+        "version": params.get("version", "*"),
+        "batch_size": int(params.get("batch", 200)),
+        "max_keys": max_keys,
+        "ops_per_second": max(float(params.get("rate", ADMIN_OPS_PER_SECOND)), ADMIN_MIN_OPS_PER_SECOND),
+    }
+
+
+@admin_bp.route("/sessions/stats", methods=["GET"])
+@require_admin_token
+def session_stats():
+    """統計 session 數量與記憶體用量"""
+    params = request.args
+    try:
+        options = _scan_options(params)
+        store = BaseSessionStore(module_name=params.get("module", "*"))
+        stats = collect_session_stats(store, top_n=int(params.get("top", 10)), **options)
+    except ValueError as e:
+        return jsonify({"error": f"參數錯誤：{e}"}), 400
+    except Exception as e:
+        logger.error("session 統計失敗: %s", e)
+        return jsonify({"error": "session 統計失敗"}), 503
+
+    return jsonify(stats)
+
+
+@admin_bp.route("/sessions/sweep", methods=["POST"])
+@require_admin_token
+def session_sweep():
+    """清除或壓縮符合條件的 session（預設 dry_run）"""
+    data = request.get_json() or {}
+    try:
+        options = _scan_options(data)
+        idle_hours = data.get("idle_hours")
+        predicate = make_predicate(
+            states=data.get("states"),
+            min_bytes=data.get("min_bytes"),
+            idle_seconds=float(idle_hours) * 3600 if idle_hours is not None else None,
+            min_history=data.get("min_history"),
+            no_ttl=bool(data.get("no_ttl", False)),
+        )
+        store = BaseSessionStore(module_name=data.get("module", "*"))
+        result = sweep_sessions(
+            store,
+            predicate,
+            action=data.get("action", "purge"),
+            keep_messages=int(data.get("keep", 20)),
+            dry_run=bool(data.get("dry_run", True)),
+            **options,
+        )
+    except ValueError as e:
+        return jsonify({"error": f"參數錯誤：{e}"}), 400
+    except Exception as e:
+        logger.error("session 清理失敗: %s", e)
+        return jsonify({"error": "session 清理失敗"}), 503
+
+    return jsonify(result)
+
+
+@admin_bp.route("/llm/usage", methods=["GET"])
+@require_admin_token
+def llm_usage():
+    """各呼叫點的模型路由與 token 用量，以及各模型的呼叫統計"""
+    from dataclasses import asdict
+
+    from shared.gpt_client import MODEL_ROUTES, get_usage_stats
+    from shared.llm_resilience import get_llm_stats
+
+    return jsonify(
+        {
+            "routes": {site: asdict(route) for site, route in MODEL_ROUTES.items()},
+            "usage": get_usage_stats(),
+            "models": get_llm_stats(),
+        }
+    )
+
+
+@admin_bp.route("/prompts", methods=["GET"])
+@require_admin_token
+def prompt_stats():
+    """各 prompt 範本已編譯的前綴數、命中率與前綴大小（字元數）"""
+    from shared.prompt_templates import get_prompt_registry
+
+    return jsonify(get_prompt_registry().stats())
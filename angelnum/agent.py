@@ -6,7 +6,11 @@ import json
 from typing import Optional, Dict, Any
 from enum import Enum
 
+from shared.admission import LLMOverloadedError
 from shared.gpt_client import GPTClient
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class AngelConversationState(Enum):
@@ -30,6 +34,7 @@ class AngelConversationSession:
         self.user_gender: Optional[str] = None
         self.birthdate: Optional[str] = None
         self.angel_number: Optional[str] = None  # 使用者選擇的天使數字
+        self.angel_meanings: Optional[list[str]] = None  # 天使數字的核心意義（追問時沿用）
         self.tone: str = "friendly"
         self.conversation_history: list[Dict[str, str]] = []
 
@@ -46,6 +51,7 @@ class AngelConversationSession:
             "user_gender": self.user_gender,
             "birthdate": self.birthdate,
             "angel_number": self.angel_number,
+            "angel_meanings": self.angel_meanings,
             "tone": self.tone,
             "conversation_history": self.conversation_history,
         }
@@ -59,6 +65,7 @@ class AngelConversationSession:
         session.user_gender = data.get("user_gender")
         session.birthdate = data.get("birthdate")
         session.angel_number = data.get("angel_number")
+        session.angel_meanings = data.get("angel_meanings")
         session.tone = data.get("tone", "friendly")
         session.conversation_history = data.get("conversation_history", [])
         return session
@@ -120,6 +127,7 @@ class AngelNumberAgent:
                 response_format={"type": "json_object"},
                 temperature=0.3,
                 max_tokens=300,
+                site="extract",
             )
 
             result = json.loads(response)
@@ -147,6 +155,9 @@ class AngelNumberAgent:
 
             return name, gender, birthdate, None
 
+        except LLMOverloadedError:
+            # 負載過高不是輸入不完整，交給呼叫端回覆模板
+            raise
         except Exception as e:
-            print(f"Error in extract_birthdate_with_ai: {e}")
+            logger.error("Error in extract_birthdate_with_ai: %s", e)
             return None, None, None, "無法解析輸入資訊"
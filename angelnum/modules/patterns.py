@@ -0,0 +1,255 @@
+"""
+天使數字模式分類
+依數字結構（重複、階梯、對稱、雙重組合、交疊、鏡像、多層混合）產生標題、意義與關鍵字。
+
+付費版數字最多 4 位數，所有可能的輸入（1–4 位數，含前導 0，共 11,110 個）
+在基礎能量表載入時一次算好，查詢時直接取表。
+
+分類規則的回歸檢查（以固定的佔位能量產生整張表，與 pattern_fixture.json 比對）：
+    python -m angelnum.modules.patterns check     # 比對分類結果
+    python -m angelnum.modules.patterns dump      # 更新 pattern_fixture.json（規則有意變更時）
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from itertools import product
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping
+
+# 預先計算的最大位數（與付費版的輸入上限一致）
+MAX_TABLE_DIGITS = 4
+
+FIXTURE_PATH = Path(__file__).with_name("pattern_fixture.json")
+
+
+def classify_pattern(number: str, energy_of: Callable[[str], str]) -> dict:
+    """
+    依數字結構分類並產生意義描述（純函數，不查詢資料庫）
+
+    Args:
+        number: 天使數字字串（只含數字）
+        energy_of: 查詢單一數字基礎能量的函數
+
+    Returns:
+        {"pattern", "title", "meanings", "keywords"}
+    """
+    digits = list(number)
+    unique_digits = list(dict.fromkeys(digits))  # 保持出現順序，結果才會固定
+
+    # 1. 檢查重複數模板（如 111, 2222, 3333）
+    if len(unique_digits) == 1 and digits[0] != "0":
+        digit = digits[0]
+        energy = energy_of(digit)
+        repetition_power = "極強" if len(digits) >= 4 else "強烈"
+        return {
+            "pattern": "repetition",
+            "title": f"{number} - {energy}的{repetition_power}放大",
+            "meanings": [
+                f"重複數表示「放大能量」與「強化訊息」,數字 {digit} 的核心能量是：{energy}。",
+                f"重複 {len(digits)} 次表示宇宙訊息{repetition_power},「顯化之門」正在開啟。",
+                "這是立即採取行動的訊號,能量倍增、宇宙同步的時刻。",
+            ],
+            "keywords": ["能量放大", "強化訊息", "顯化之門", energy],
+        }
+
+    # 2. 檢查階梯數模板（如 123, 234, 1234）
+    is_ascending = all(
+        int(digits[i]) == int(digits[i - 1]) + 1 for i in range(1, len(digits))
+    )
+    if is_ascending:
+        energies = [energy_of(d) for d in digits]
+        return {
+            "pattern": "ascending",
+            "title": f"{number} - 循序成長的能量階梯",
+            "meanings": [
+                "階梯數象徵能量循序提升、學習進化、階段成長。",
+                f"能量從 {energies[0]} 逐步發展到 {energies[-1]},每一步都在為未來鋪路。",
+                "你正穩步向上成長,人生階段正在循序推進,請保持耐心與信心。",
+            ],
+            "keywords": ["循序成長", "階段進化", "穩步向前"] + energies,
+        }
+
+    # 3. 檢查對稱交錯模板（如 121, 232, 343）- 3位數特定模式
+    if len(digits) == 3 and digits[0] == digits[2] and digits[0] != digits[1]:
+        outer = digits[0]
+        center = digits[1]
+        energy_outer = energy_of(outer)
+        energy_center = energy_of(center)
+        return {
+            "pattern": "symmetric_center",
+            "title": f"{number} - 以{energy_center}為核心的覺醒",
+            "meanings": [
+                f"對稱交錯象徵中心覺醒、聚焦核心,數字 {center} 的能量（{energy_center}）是關鍵。",
+                f"外在的 {outer}（{energy_outer}）環繞著內在核心,提醒你專注於核心本質。",
+                "外在世界的變化只是映照你內心的焦點,向內探尋才是關鍵。",
+            ],
+            "keywords": ["中心覺醒", "聚焦核心", energy_center, energy_outer],
+        }
+
+    # 4. 檢查雙重組合模板（如 1212, 1313, 1414）- 4位數 ABAB 模式
+    if (
+        len(digits) == 4
+        and digits[0] == digits[2]
+        and digits[1] == digits[3]
+        and digits[0] != digits[1]
+    ):
+        digit_a = digits[0]
+        digit_b = digits[1]
+        energy_a = energy_of(digit_a)
+        energy_b = energy_of(digit_b)
+        return {
+            "pattern": "dual_alternating",
+            "title": f"{number} - {energy_a}與{energy_b}的反覆磨合",
+            "meanings": [
+                f"雙重組合象徵兩種能量的反覆磨合：{energy_a}（{digit_a}）與 {energy_b}（{digit_b}）。",
+                "結構為 A-B-A-B,象徵平衡與互補,兩股力量在你生命中交替出現。",
+                f"在{energy_b}中{energy_a},在{energy_a}中尋找{energy_b}。",
+            ],
+            "keywords": ["能量磨合", "平衡互補", energy_a, energy_b],
+        }
+
+    # 5. 檢查交疊遞進模板（如 1122, 2233, 3344）- 4位數 AABB 模式
+    if (
+        len(digits) == 4
+        and digits[0] == digits[1]
+        and digits[2] == digits[3]
+        and digits[0] != digits[2]
+    ):
+        first_pair = digits[0]
+        second_pair = digits[2]
+        energy_first = energy_of(first_pair)
+        energy_second = energy_of(second_pair)
+        return {
+            "pattern": "transition",
+            "title": f"{number} - 從{energy_first}邁向{energy_second}",
+            "meanings": [
+                f"交疊遞進象徵階段轉換與能量交接,從 {energy_first} 過渡到 {energy_second}。",
+                "前半與後半為不同能量,表示你正從一種狀態邁入另一種狀態。",
+                f"這是轉化的時刻,放下過去的{energy_first},迎接即將到來的{energy_second}。",
+            ],
+            "keywords": ["階段轉換", "能量交接", energy_first, energy_second],
+        }
+
+    # 6. 檢查鏡像數模板（如 1221, 2112）- 通用對稱模式
+    if len(digits) >= 2 and digits == digits[::-1]:
+        return {
+            "pattern": "mirror",
+            "title": f"{number} - 內外平衡的鏡像能量",
+            "meanings": [
+                "鏡像數象徵互為映照、內外平衡、靈魂共振。",
+                "結構對稱代表「內在與外在世界對話」,常與人際、愛情、靈魂伴侶課題有關。",
+                "你與他人的能量正在對齊,關係是自我投射的鏡子,內在和諧將映照於外。",
+            ],
+            "keywords": ["內外平衡", "靈魂共振", "對稱映照", "關係鏡像"],
+        }
+
+    # 7. 多層混合模板（複雜數字）
+    if len(unique_digits) >= 3:
+        energies = [energy_of(d) for d in unique_digits]
+        return {
+            "pattern": "complex_integration",
+            "title": f"{number} - 多重能量的整合與協奏",
+            "meanings": [
+                f"這個數字融合了多種能量：{' + '.join(energies)}。",
+                "複合進化象徵跨領域整合,你正在整合不同面向的能量。",
+                "形成全新的生命節奏,多元能量將匯聚成獨特的智慧與力量。",
+            ],
+            "keywords": ["能量整合", "多元融合", "跨領域發展"] + energies,
+        }
+
+    # 8. 通用解析（使用單位數字的組合）
+    energies = [energy_of(d) for d in digits]
+    return {
+        "pattern": "general",
+        "title": f"{number} - 天使的特殊訊息",
+        "meanings": [
+            f"這個數字包含了 {' + '.join(energies)} 的能量組合。",
+            "每個數字都是宇宙給你的指引,請用心感受這些能量如何在你生命中流動。",
+            "天使正透過這組數字向你傳遞專屬的訊息,請保持開放的心接收。",
+        ],
+        "keywords": ["神聖指引", "能量組合"] + energies,
+    }
+
+
+def all_numbers(max_digits: int = MAX_TABLE_DIGITS):
+    """所有 1 到 max_digits 位數的數字字串（含前導 0）"""
+    for length in range(1, max_digits + 1):
+        for digits in product("0123456789", repeat=length):
+            yield "".join(digits)
+
+
+def build_pattern_table(
+    energy: Mapping[str, str], default_energy: str, max_digits: int = MAX_TABLE_DIGITS
+) -> Mapping[str, dict]:
+    """
+    預先計算所有 1 到 max_digits 位數的分類結果
+
+    Args:
+        energy: 基礎能量表 {數字字元: 能量描述}
+        default_energy: 表中沒有該數字時使用的描述
+
+    Returns:
+        唯讀的 {數字字串: 分類結果}
+    """
+
+    def energy_of(digit: str) -> str:
+        return energy.get(digit, default_energy)
+
+    return MappingProxyType(
+        {number: classify_pattern(number, energy_of) for number in all_numbers(max_digits)}
+    )
+
+
+# ---------- 回歸檢查 ----------
+
+
+def _fixture_energy() -> Dict[str, str]:
+    """固定的佔位能量（讓檢查結果與資料庫內容無關）"""
+    return {str(digit): f"能量{digit}" for digit in range(10)}
+
+
+def build_fixture() -> dict:
+    """以佔位能量產生分類摘要：每個數字的模式，加上完整輸出的雜湊"""
+    table = build_pattern_table(_fixture_energy(), "神聖能量")
+    raw = json.dumps(dict(table), ensure_ascii=False, sort_keys=True)
+    return {
+        "digest": hashlib.sha256(raw.encode("utf-8")).hexdigest(),
+        "patterns": {number: entry["pattern"] for number, entry in table.items()},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="天使數字模式分類表")
+    parser.add_argument("command", choices=["dump", "check"])
+    args = parser.parse_args(argv)
+
+    fixture = build_fixture()
+    if args.command == "dump":
+        FIXTURE_PATH.write_text(
+            json.dumps(fixture, ensure_ascii=False, indent=0, sort_keys=True) + "\n",
+            encoding="utf-8",
+        )
+        print(f"已寫入 {FIXTURE_PATH}（{len(fixture['patterns'])} 個數字）")
+        return 0
+
+    expected = json.loads(FIXTURE_PATH.read_text(encoding="utf-8"))
+    changed = [
+        number
+        for number, pattern in fixture["patterns"].items()
+        if expected["patterns"].get(number) != pattern
+    ]
+    if changed:
+        print(f"模式分類與 fixture 不一致（{len(changed)} 個）：{', '.join(changed[:20])}")
+        return 1
+    if fixture["digest"] != expected["digest"]:
+        print("模式分類一致，但標題、意義或關鍵字內容與 fixture 不同")
+        return 1
+    print(f"模式分類與 fixture 一致（{len(fixture['patterns'])} 個數字）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
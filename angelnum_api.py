@@ -14,46 +14,35 @@ from angelnum.agent import (
     AngelConversationState,
 )
 from angelnum.modules.angel_numbers import get_angel_number_meaning
+from angelnum.prompts import FREE_TONE_PROMPTS, get_tone_prompts, prompts
+from shared.admission import LLMOverloadedError, overloaded_response
 from shared.gpt_client import GPTClient
+from jobs_api import job_mode
+from shared.logger import get_logger
 from shared.session_store import BaseSessionStore
-from shared.rule_loader import load_global_rules
+from shared.rule_loader import get_global_rules_hash
+from shared.refresh_cache import content_hash
+from shared.request_context import bind_session
+from shared.interpretation_cache import (
+    NAME_SLOT,
+    get_interpretation_cache,
+    render_name,
+)
 
 # 創建 Blueprint
 angelnum_bp = Blueprint("angelnum", __name__, url_prefix="/angel")
 
+logger = get_logger(__name__)
+
 # 創建 Session Store
 session_store = BaseSessionStore(module_name="angelnum")
 
 # 創建 Agent
 agent = AngelNumberAgent()
 
-# 免費版語氣配置（3種）
-FREE_TONE_PROMPTS = {
-    "friendly": "親切輕鬆,像朋友聊天一樣溫暖自然",
-    "caring": "溫暖關懷,像靈性導師般深情陪伴",
-    "ritual": "莊重神聖,充滿儀式感與神性",
-}
-
-# 付費版語氣配置（10種）- 參考 lifenum 的語氣風格
-PAID_TONE_PROMPTS = {
-    "guan_yu": "請使用關聖帝君的莊嚴、正直語氣，帶有沉穩節奏。關鍵語彙：忠義、正道、守信、因果、明辨是非。**嚴格警告：禁止使用任何文言文詞彙（汝、吾、乃、之、於、若、然、故、是以、當、須、方能、焉、矣、已為汝析得、為汝、汝之等），必須100%使用現代中文（你、我、的、在、如果、因此、應該、需要、能夠、已為你分析、為你、你的）。語調莊重威嚴但完全現代化表達。**",
-    "michael": "請使用大天使米迦勒的堅定、有領導感語氣，帶安定力量。關鍵語彙：勇氣、信任、光明、防禦、戰士。語調堅定且充滿力量。",
-    "gabriel": "請使用大天使加百列的溫柔中帶清晰指引語氣，像傳信者。關鍵語彙：啟發、信息、真理、溝通、覺醒。語調溫和且具有啟發性。",
-    "raphael": "請使用大天使拉斐爾的柔和、慈悲、安撫人心語氣。關鍵語彙：療癒、平衡、綠光、修復、愛自己。語調溫暖且充滿愛意。",
-    "uriel": "請使用大天使烏列爾的沈穩、智者風格語氣，講話慢而深。關鍵語彙：洞察、智慧、火焰、真理、學習。語調深沈且充滿智慧。",
-    "zadkiel": "請使用大天使沙德基爾的柔中帶慈悲語氣，像引導人放下怨恨的導師。關鍵語彙：寬恕、紫焰、轉化、慈悲、理解。語調慈悲且包容。",
-    "jophiel": "請使用大天使喬菲爾的溫柔、鼓舞、偏女性化語氣，有藝術氣息。關鍵語彙：美感、靈感、光彩、愛自己。語調優雅且具有美感。",
-    "chamuel": "請使用大天使沙木爾的溫暖、包容語氣，像心理諮商師。關鍵語彙：愛、關係、理解、和解、自我接納。語調溫暖且充滿愛。",
-    "metatron": "請使用大天使梅塔特隆的權威、理性語氣，有數據感與宇宙秩序感。關鍵語彙：紀律、次序、靈性法則、神聖幾何。語調理性且系統化。",
-    "ariel": "請使用大天使阿列爾的豐盛、自然語氣，帶大地母親般的滋養感。關鍵語彙：豐盛、大地、自然、繁榮、創造。語調溫和且充滿生命力。",
-}
-
-
-def get_tone_prompts(version: str = "free") -> dict:
-    """根據版本獲取語氣配置"""
-    if version == "paid":
-        return PAID_TONE_PROMPTS
-    return FREE_TONE_PROMPTS
+# 天使數字解讀快取（提示詞內容有意變更時調整 revision，舊的快取就不再使用）
+interpretation_cache = get_interpretation_cache("angelnum")
+READING_PROMPT_REVISION = 2
 
 
 # ========== 工具函數 ==========
@@ -67,9 +56,11 @@ def get_session_by_id(
         data = session_store.load(version, session_id)
         if data is None:
             return None
-        return AngelConversationSession.from_dict(data)
+        conv_session = AngelConversationSession.from_dict(data)
+        bind_session(conv_session)
+        return conv_session
     except Exception as e:
-        print(f"[ERROR] 獲取會話失敗: {e}")
+        logger.error("獲取會話失敗: %s", e)
         return None
 
 
@@ -84,7 +75,7 @@ def save_and_return(
         session_store.save(version, session_id, conv_session.to_dict())
         return jsonify(response_data)
     except Exception as e:
-        print(f"[ERROR] 保存會話失敗: {e}")
+        logger.error("保存會話失敗: %s", e)
         return jsonify({"error": "Session 存儲服務暫時不可用"}), 503
 
 
@@ -175,6 +166,7 @@ def handle_init_with_tone(version: str):
     )
 
 
+@job_mode("angelnum")
 def handle_chat(version: str):
     """統一對話處理"""
     data = request.json
@@ -204,15 +196,17 @@ def handle_chat(version: str):
     # 記錄使用者輸入
     conv_session.add_message("user", user_input)
 
-    # 獲取語氣配置
-    tone_prompts = get_tone_prompts(version)
+    loaded_state = conv_session.state.value
 
     # ========== 狀態機處理 ==========
 
     # 1. WAITING_BASIC_INFO - 等待基本資訊
     if conv_session.state == AngelConversationState.WAITING_BASIC_INFO:
         # 使用 AI 解析基本資訊
-        name, gender, birthdate, error_msg = agent.extract_birthdate_with_ai(user_input)
+        try:
+            name, gender, birthdate, error_msg = agent.extract_birthdate_with_ai(user_input)
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "angelnum extract"))
 
         if error_msg:
             response = generate_error_message(conv_session.tone, "incomplete_info")
@@ -319,41 +313,9 @@ def handle_chat(version: str):
         angel_data = get_angel_number_meaning(
             angel_number, use_intelligent_analysis=use_intelligent
         )
+        conv_session.angel_meanings = angel_data["meanings"]
         meanings_text = "\n".join(angel_data["meanings"])
 
-        # 根據語氣設定 system prompt
-        tone_description = tone_prompts.get(
-            conv_session.tone, tone_prompts.get("guan_yu", "friendly")
-        )
-
-        # 構建 Prompt
-        system_prompt = f"""你是一位專業的天使數字解讀師。
-
-天使數字 {angel_number} 的核心意義如下：
-
-{meanings_text}
-
-請根據以上核心意義,為使用者提供深度、溫暖且具啟發性的解析。
-
-【語氣要求】
-使用「{tone_description}」的語氣。
-
-【內容要求】
-1. 解釋這個數字在此刻出現的深層意義
-2. 闡述天使想要傳達的核心訊息（基於上述意義展開）
-3. 提供對使用者生活的具體建議和指引
-4. 給予溫暖的鼓勵與支持
-
-【格式要求】
-- 不使用任何 markdown 格式標記（如 **、##、- 等）
-- 使用純文字和換行組織內容
-- 回應長度控制在 {"400-500" if version == "paid" else "300-400"} 字左右
-- 要有溫度、有深度、有啟發性
-
-{load_global_rules()}
-
-請記住：你不只是在解釋數字,更是在傳遞來自宇宙的愛與指引。"""
-
         # 根據語氣設定問候語
         if conv_session.tone == "friendly":
             greeting = (
@@ -366,33 +328,52 @@ def handle_chat(version: str):
         else:
             greeting = f"{conv_session.user_name}，關於天使數字 {angel_number} 的解讀如下：\n\n"
 
-        user_prompt = f"使用者的姓名是 {conv_session.user_name},他/她最近反覆看到天使數字 {angel_number}。\n\n請根據這個數字的核心意義,為 {conv_session.user_name} 提供完整、溫暖且具啟發性的解析,幫助他/她理解宇宙想要傳達的訊息。**請務必在內容中使用「{conv_session.user_name}」來稱呼對方，嚴禁使用「使用者」、「你」等泛稱。**"
+        # 解讀內容不含姓名（以 NAME_SLOT 佔位），相同數字與語氣的使用者可共用快取的變體
+        user_prompt = f"使用者最近反覆看到天使數字 {angel_number}。\n\n請根據這個數字的核心意義,為使用者提供完整、溫暖且具啟發性的解析,幫助他/她理解宇宙想要傳達的訊息。**請在內容中以「{NAME_SLOT}」稱呼對方（原樣保留這個佔位符，系統會替換成對方的姓名），嚴禁使用「使用者」、「你」等泛稱。**"
 
         try:
-            client = GPTClient()
-            print(f"\n{'=' * 60}")
-            print(f"[DEBUG] 解析天使數字 ({version})")
-            print(f"[DEBUG] Angel Number: {angel_number}")
-            print(f"[DEBUG] Pattern: {angel_data.get('pattern', 'unknown')}")
-            print(f"[DEBUG] User: {conv_session.user_name}")
-            print(f"[DEBUG] Tone: {conv_session.tone}")
-            print(f"{'=' * 60}\n")
+            logger.debug(
+                "解析天使數字 (%s): number=%s, pattern=%s, tone=%s",
+                version, angel_number, angel_data.get("pattern", "unknown"), conv_session.tone,
+            )
 
             # 付費版使用 higher temperature for creativity
             temp = 1.0 if version == "paid" else 0.7
             max_tok = 800 if version == "paid" else 500
 
-            final_response = client.ask(
-                system_prompt, user_prompt, temperature=temp, max_tokens=max_tok
-            )
+            def generate_reading() -> str:
+                # system prompt 只在快取未命中時需要，前綴依 (數字, 版本, 語氣) 預先編譯
+                system_prompt = prompts.render(
+                    "angelnum.reading", (angel_number, version, conv_session.tone)
+                )
+                reading = GPTClient().ask(
+                    system_prompt,
+                    user_prompt,
+                    temperature=temp,
+                    max_tokens=max_tok,
+                    site="reading",
+                )
+                # 清理 markdown 格式標記
+                return (
+                    reading.replace("**", "")
+                    .replace("__", "")
+                    .replace("##", "")
+                    .replace("###", "")
+                )
 
-            # 清理 markdown 格式標記
-            final_response = (
-                final_response.replace("**", "")
-                .replace("__", "")
-                .replace("##", "")
-                .replace("###", "")
+            cache_key = interpretation_cache.make_key(
+                revision=READING_PROMPT_REVISION,
+                number=angel_number,
+                pattern=angel_data.get("pattern", "unknown"),
+                meanings=content_hash(meanings_text),
+                tone=conv_session.tone,
+                version=version,
+                rules=get_global_rules_hash(),
+            )
+            reading = interpretation_cache.get_or_generate(
+                cache_key, generate_reading, validate=lambda text: NAME_SLOT in text
             )
+            final_response = render_name(reading, conv_session.user_name)
 
             # 加上問候語
             final_response = greeting + final_response
@@ -446,11 +427,10 @@ def handle_chat(version: str):
                     },
                 )
 
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "angelnum reading"))
         except Exception as e:
-            print(f"[ERROR] 解析天使數字錯誤: {e}")
-            import traceback
-
-            traceback.print_exc()
+            logger.exception("解析天使數字錯誤: %s", e)
 
             error_response = f"抱歉,解析過程發生錯誤：{str(e)}"
             conv_session.add_message("assistant", error_response)
@@ -598,16 +578,14 @@ def handle_chat(version: str):
         angel_number = conv_session.angel_number
         name = conv_session.user_name
 
-        # 重新獲取意義用於上下文
-        use_intelligent = version == "paid"
-        angel_data = get_angel_number_meaning(
-            angel_number, use_intelligent_analysis=use_intelligent
-        )
-        meanings_text = "\n".join(angel_data["meanings"])
-
-        tone_description = tone_prompts.get(
-            conv_session.tone, tone_prompts.get("guan_yu", "friendly")
-        )
+        # 沿用選擇數字時取得的意義（舊會話沒有保存時才重新取得）
+        meanings = conv_session.angel_meanings
+        if meanings is None:
+            angel_data = get_angel_number_meaning(
+                angel_number, use_intelligent_analysis=version == "paid"
+            )
+            meanings = conv_session.angel_meanings = angel_data["meanings"]
+        meanings_text = "\n".join(meanings)
 
         # 構建對話歷史摘要（取最近的3-4輪對話）
         recent_history = (
@@ -624,35 +602,27 @@ def handle_chat(version: str):
             ]
         )
 
-        system_prompt = f"""你是一位專業的天使數字解讀師,正在與使用者 {name} 進行深度對話。
-
-天使數字 {angel_number} 的核心意義：
-{meanings_text}
+        system_prompt = prompts.render(
+            "angelnum.follow_up",
+            (version, conv_session.tone),
+            reference=f"天使數字 {angel_number} 的核心意義：\n{meanings_text}",
+            user=f"""你正在與使用者 {name} 進行深度對話。
 
 【對話背景】
 你們正在討論天使數字 {angel_number},以下是最近的對話內容：
-{history_text}
-
-【語氣要求】
-使用「{tone_description}」的語氣。
-
-【回答要求】
-1. 基於天使數字 {angel_number} 的核心意義來回答
-2. 參考對話歷史,保持對話的連貫性
-3. 提供具體、實用且有啟發性的回答
-4. 不使用 markdown 格式標記
-5. 回應長度控制在 350-500 字,請務必完整表達完整的意思
-
-{load_global_rules()}
-
-請針對使用者的最新問題,提供有深度的回答。"""
+{history_text}""",
+        )
 
         user_prompt = f"使用者的最新問題：{user_input}\n\n請根據對話背景和天使數字的意義,提供深度且連貫的回答。"
 
         try:
             client = GPTClient()
             response_text = client.ask(
-                system_prompt, user_prompt, temperature=1.0, max_tokens=800
+                system_prompt,
+                user_prompt,
+                temperature=1.0,
+                max_tokens=800,
+                site="follow_up",
             )
 
             # 清理格式
@@ -688,8 +658,10 @@ def handle_chat(version: str):
                 },
             )
 
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "angelnum follow_up"))
         except Exception as e:
-            print(f"[ERROR] 對話回答錯誤: {e}")
+            logger.error("對話回答錯誤: %s", e)
             error_response = f"抱歉,回答過程發生錯誤：{str(e)}"
             conv_session.add_message("assistant", error_response)
             return save_and_return(
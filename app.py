@@ -1,20 +1,36 @@
 import os
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 
+from shared.metrics import CONTENT_TYPE, get_metrics_registry
+from shared.logger import get_logger
+from shared.reference_snapshot import start_reference_sync
+from shared.request_context import bind_request_context, get_request_context, reset_request_context
+from shared.tracing import TRACE_SERVER_TIMING, current_trace, end_trace, start_trace
+
+logger = get_logger(__name__)
+
+# 不建立 trace 的路徑（健康檢查與指標抓取）
+UNTRACED_PATHS = ("/health", "/metrics")
+
 # 導入 Blueprints
 try:
     from lifenum_api import lifenum_bp
     from angelnum_api import angelnum_bp
+    from angelnum.modules.angel_numbers import preload_angel_tables
     from divination_api import divination_bp
     from auspicious_api import auspicious_bp
+    from admin_api import admin_bp
+    from jobs_api import jobs_bp
 except ImportError as e:
-    print(f"Warning: Failed to import blueprints: {e}")
+    logger.warning("Failed to import blueprints: %s", e)
     # 在測試環境中可能會失敗，這裡做簡單處理
     lifenum_bp = None
     angelnum_bp = None
     divination_bp = None
     auspicious_bp = None
+    admin_bp = None
+    jobs_bp = None
 
 
 def create_app():
@@ -23,22 +39,72 @@ def create_app():
     # 配置 CORS
     CORS(app, resources={r"/*": {"origins": "*"}})
 
+    # 請求上下文：LLM 呼叫的指標與日誌依此標記 blueprint 與版本
+    @app.before_request
+    def bind_context():
+        parts = request.path.strip("/").split("/")
+        g.request_context_token = bind_request_context(
+            blueprint=request.blueprint,
+            version=next((part for part in parts if part in ("free", "paid")), None),
+            endpoint=request.endpoint,
+        )
+        if request.path not in UNTRACED_PATHS:
+            context = get_request_context()
+            g.trace_token = start_trace(
+                f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                traceparent=request.headers.get("traceparent"),
+                request_id=context.get("request_id"),
+                blueprint=context.get("blueprint"),
+                version=context.get("version"),
+            )
+
+    # 追蹤：以 Server-Timing header 回報各階段耗時（瀏覽器開發者工具的 Timing 頁籤）
+    @app.after_request
+    def add_server_timing(response):
+        trace = current_trace()
+        if trace is not None:
+            trace.root.set(status_code=response.status_code)
+            if TRACE_SERVER_TIMING:
+                response.headers["Server-Timing"] = trace.server_timing()
+                response.headers["Timing-Allow-Origin"] = "*"
+        return response
+
+    @app.teardown_request
+    def reset_context(exc):
+        end_trace(g.pop("trace_token", None), error=exc)
+        token = g.pop("request_context_token", None)
+        if token is not None:
+            reset_request_context(token)
+
+    # 從本機快照載入參考資料（不等待網路），並在背景與 Supabase 對帳
+    start_reference_sync()
+    if angelnum_bp:
+        preload_angel_tables()
+
     # 註冊 Blueprints
     if lifenum_bp:
         app.register_blueprint(lifenum_bp)
-        print("Registered Blueprint: lifenum (prefix: /life)")
+        logger.info("Registered Blueprint: lifenum (prefix: /life)")
 
     if angelnum_bp:
         app.register_blueprint(angelnum_bp)
-        print("Registered Blueprint: angelnum (prefix: /angel)")
+        logger.info("Registered Blueprint: angelnum (prefix: /angel)")
 
     if divination_bp:
         app.register_blueprint(divination_bp)
-        print("Registered Blueprint: divination (prefix: /divination)")
+        logger.info("Registered Blueprint: divination (prefix: /divination)")
 
     if auspicious_bp:
         app.register_blueprint(auspicious_bp)
-        print("Registered Blueprint: auspicious (prefix: /auspicious)")
+        logger.info("Registered Blueprint: auspicious (prefix: /auspicious)")
+
+    if admin_bp:
+        app.register_blueprint(admin_bp)
+        logger.info("Registered Blueprint: admin (prefix: /admin)")
+
+    if jobs_bp:
+        app.register_blueprint(jobs_bp)
+        logger.info("Registered Blueprint: jobs (prefix: /jobs)")
 
     @app.route("/", methods=["GET", "POST"])
     def index():
@@ -59,6 +125,14 @@ def create_app():
     def health_check():
         return jsonify({"status": "healthy"}), 200
 
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Prometheus 指標（設定 METRICS_TOKEN 時需以 Bearer token 存取）"""
+        token = os.getenv("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return jsonify({"error": "未授權"}), 401
+        return Response(get_metrics_registry().render(), content_type=CONTENT_TYPE)
+
     return app
 
 
@@ -6,10 +6,28 @@
 from __future__ import annotations
 
 import json
+import re
+from datetime import date
 from typing import Optional, Dict, Any
 from enum import Enum
 
+from shared.admission import LLMOverloadedError
 from shared.gpt_client import GPTClient
+from shared.logger import get_logger
+from auspicious.modules.lunar_calendar import ZODIAC_ANIMALS, zodiac_for_birthdate
+
+logger = get_logger(__name__)
+
+# 本地解析基本資訊用的規則
+_BIRTHDATE_RE = re.compile(
+    r"(民國|民国)?\s*(\d{2,4})\s*[/\-.年]\s*(\d{1,2})\s*[/\-.月]\s*(\d{1,2})\s*日?"
+)
+_GENDER_KEYWORDS = {
+    "male": ("先生", "男性", "男", "male", "Male", "M"),
+    "female": ("小姐", "女士", "女性", "女", "female", "Female", "F"),
+}
+_ZODIAC_RE = re.compile(r"屬\s*([" + ZODIAC_ANIMALS + r"])")
+_NAME_RE = re.compile(r"[\u4e00-\u9fff]{2,4}")
 
 
 class AuspiciousState(Enum):
@@ -83,9 +101,84 @@ class AuspiciousAgent:
     def __init__(self):
         self.gpt_client = GPTClient()
 
+    def extract_basic_info_locally(self, user_input: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        以規則解析常見格式的基本資訊（例如：王小明 男 1990/07/12 屬馬），不呼叫 AI
+
+        生肖未提供時依生日推算（以農曆正月初一為界）
+
+        Returns:
+            與 extract_basic_info 相同格式的字典；無法完整解析時返回 None
+        """
+        match = _BIRTHDATE_RE.search(user_input)
+        if not match:
+            return None
+        is_roc, year, month, day = match.groups()
+        if is_roc or len(year) == 3:
+            year = int(year) + 1911  # 民國年
+        elif len(year) == 4:
+            year = int(year)
+        else:
+            return None  # 兩位數年份無法判斷是否為民國年，交給 AI
+        try:
+            birthdate = date(year, int(month), int(day))
+        except ValueError:
+            return None
+
+        rest = (user_input[: match.start()] + " " + user_input[match.end():]).strip()
+
+        zodiac = None
+        zodiac_match = _ZODIAC_RE.search(rest)
+        if zodiac_match:
+            zodiac = zodiac_match.group(1)
+            rest = rest.replace(zodiac_match.group(0), " ")
+
+        gender = None
+        for token in re.split(r"[\s,，、]+", rest):
+            for value, keywords in _GENDER_KEYWORDS.items():
+                if token in keywords:
+                    gender = value
+                    rest = rest.replace(token, " ", 1)
+                    break
+            if gender:
+                break
+
+        # 其餘內容必須只剩姓名，避免把「我是王小明」之類的句子誤判成姓名
+        name = re.sub(r"[\s,，、。.!！:：;；]+", "", rest)
+        if not (gender and _NAME_RE.fullmatch(name)):
+            return None
+
+        if not zodiac:
+            try:
+                zodiac = zodiac_for_birthdate(birthdate)
+            except ValueError:
+                return None
+
+        return {
+            "name": name,
+            "gender": gender,
+            "birthdate": birthdate.strftime("%Y/%m/%d"),
+            "zodiac": zodiac,
+            "error_message": None,
+        }
+
+    def fill_zodiac(self, info: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+        """生肖缺漏時依生日推算（生日無法解析或超出農曆表範圍時維持原值）"""
+        if info.get("zodiac") or not info.get("birthdate"):
+            return info
+        match = _BIRTHDATE_RE.search(info["birthdate"])
+        if not match:
+            return info
+        try:
+            _, year, month, day = match.groups()
+            info["zodiac"] = zodiac_for_birthdate(date(int(year), int(month), int(day)))
+        except ValueError:
+            pass
+        return info
+
     def extract_basic_info(self, user_input: str) -> Dict[str, Optional[str]]:
         """
-        使用 AI 提取基本資訊
+        提取基本資訊（常見格式以規則解析，其餘使用 AI）
 
         Args:
             user_input: 用戶輸入
@@ -93,6 +186,10 @@ class AuspiciousAgent:
         Returns:
             包含 name, gender, birthdate, zodiac 的字典
         """
+        local_result = self.extract_basic_info_locally(user_input)
+        if local_result:
+            return local_result
+
         system_prompt = """你是專業的資訊擷取助理。請從使用者輸入中提取姓名、性別、生日與生肖資訊。
 
 生日格式不限，可能的格式包括：
@@ -136,19 +233,25 @@ class AuspiciousAgent:
                 response_format={"type": "json_object"},
                 temperature=0.3,
                 max_tokens=300,
+                site="extract",
             )
 
             result = json.loads(response)
-            return {
-                "name": result.get("name"),
-                "gender": result.get("gender"),
-                "birthdate": result.get("birthdate"),
-                "zodiac": result.get("zodiac"),
-                "error_message": result.get("error_message"),
-            }
+            return self.fill_zodiac(
+                {
+                    "name": result.get("name"),
+                    "gender": result.get("gender"),
+                    "birthdate": result.get("birthdate"),
+                    "zodiac": result.get("zodiac"),
+                    "error_message": result.get("error_message"),
+                }
+            )
 
+        except LLMOverloadedError:
+            # 負載過高不是輸入不完整，交給呼叫端回覆模板
+            raise
         except Exception as e:
-            print(f"Error in extract_basic_info: {e}")
+            logger.error("Error in extract_basic_info: %s", e)
             return {
                 "name": None,
                 "gender": None,
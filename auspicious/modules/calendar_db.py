@@ -1,23 +1,55 @@
 """
 黃曆資料查詢模組
-從 Supabase 查詢黃曆資料
+從 Supabase 查詢黃曆資料（使用共享的 Supabase 客戶端）
+
+- 月份內容以 LRU + TTL 快取在記憶體
+- 可用月份清單預先載入成索引，查詢不存在的月份不需再打資料庫
+- 月份全文解析成每日紀錄（宜、忌、沖、煞），查詢單日時只需送出當天資料
 """
 
 import os
-from typing import Optional
-from supabase import create_client, Client
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from shared.supabase_client import get_supabase_client
+from shared.logger import get_logger
+from shared.reference_snapshot import get_reference_store
+from shared.refresh_cache import RefreshingCache
+from shared.tracing import traced
+from shared.ttl_cache import TTLCache
+from .calendar_index import months_between, parse_month_content
+
+logger = get_logger(__name__)
+
+# 快取設定
+CALENDAR_CACHE_TTL = int(os.getenv("CALENDAR_CACHE_TTL", 3600))  # 月份內容 1 小時
+CALENDAR_CACHE_MAX_MONTHS = int(os.getenv("CALENDAR_CACHE_MAX_MONTHS", 24))
+MONTH_INDEX_TTL = 600  # 月份索引 10 分鐘
 
 
 class CalendarDB:
     """黃曆資料庫查詢"""
 
     def __init__(self):
-        # 從環境變數讀取 Supabase 配置
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_KEY")
+        self.supabase = get_supabase_client()
+        self.reference = get_reference_store()
         # 使用環境變數或默認表名
         self.table_name = os.getenv("SUPABASE_CALENDAR_TABLE", "auspicious_calendar")
 
+        self._month_cache = TTLCache(
+            max_entries=CALENDAR_CACHE_MAX_MONTHS, ttl=CALENDAR_CACHE_TTL
+        )
+        self._day_index_cache = TTLCache(
+            max_entries=CALENDAR_CACHE_MAX_MONTHS, ttl=CALENDAR_CACHE_TTL
+        )
+        self._month_index = RefreshingCache(
+            "calendar_months",
+            self._fetch_month_index,
+            ttl=MONTH_INDEX_TTL,
+            refresh_ahead=60,
+        )
+        self.reference.add_listener(self._on_reference_update)
+
     def get_month_data(self, month: str) -> Optional[str]:
         """
         查詢指定月份的黃曆內容
@@ -28,41 +60,171 @@ class CalendarDB:
         Returns:
             黃曆內容文本，若無資料則返回 None
         """
-        try:
-            supabase: Client = create_client(self.supabase_url, self.supabase_key)
-            response = (
-                supabase.table(self.table_name)
-                .select("content")
-                .eq("month", month)
-                .execute()
+        return self.get_months([month])[month]
+
+    @traced("db.calendar.get_months", "db", lambda self, *a, **k: {"table": self.table_name})
+    def get_months(self, months: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        批次查詢多個月份的黃曆內容（已快取的月份不查詢，其餘以單次 in_ 查詢取得）
+
+        Args:
+            months: 月份列表，格式 YYYY-MM
+
+        Returns:
+            {月份: 黃曆內容或 None}
+        """
+        months = list(dict.fromkeys(months))
+        result: Dict[str, Optional[str]] = {}
+        missing = []
+        for month in months:
+            content = self._month_cache.get(month)
+            if content is None:
+                row = self.reference.get_row(self.table_name, "month", month)
+                if row is not None:
+                    content = row.get("content", "")
+                    self._month_cache.set(month, content)
+            if content is not None:
+                result[month] = content
+            else:
+                missing.append(month)
+
+        # 月份索引已載入時，只查詢確實存在的月份
+        index = self._month_index.get() if missing else None
+        if index is not None:
+            for month in missing:
+                if month not in index:
+                    result[month] = None
+            missing = [month for month in missing if month in index]
+
+        if missing:
+            try:
+                response = (
+                    self.supabase.table(self.table_name)
+                    .select("month, content")
+                    .in_("month", missing)
+                    .execute()
+                )
+                for item in response.data or []:
+                    if item.get("month") in missing and item["month"] not in result:
+                        content = item.get("content", "")
+                        self._month_cache.set(item["month"], content)
+                        result[item["month"]] = content
+            except Exception as e:
+                logger.error("Error querying calendar data for %s: %s", missing, e)
+
+        return {month: result.get(month) for month in months}
+
+    @traced("db.calendar.get_day_indexes", "db", lambda self, *a, **k: {"table": self.table_name})
+    def get_day_indexes(self, months: Iterable[str]) -> Dict[str, Dict[str, Dict]]:
+        """
+        批次取得多個月份的每日紀錄索引（內容以 get_months 一次取得）
+
+        Returns:
+            {月份: {YYYY-MM-DD: 每日紀錄}}；無資料或無法解析的月份為空字典
+        """
+        months = list(dict.fromkeys(months))
+        indexes = {}
+        uncached = []
+        for month in months:
+            index = self._day_index_cache.get(month)
+            if index is None:
+                uncached.append(month)
+            else:
+                indexes[month] = index
+
+        if uncached:
+            for month, content in self.get_months(uncached).items():
+                if content is None:
+                    indexes[month] = {}
+                    continue
+                index = parse_month_content(month, content)
+                self._day_index_cache.set(month, index)
+                if not index:
+                    logger.warning("%s 黃曆內容無法解析成每日紀錄", month)
+                indexes[month] = index
+
+        return {month: indexes[month] for month in months}
+
+    def get_day_range(self, start: str, end: str) -> Dict[str, Dict]:
+        """
+        取得日期範圍內的每日紀錄（跨月份合併，依日期排序）
+
+        Args:
+            start: 開始日期 YYYY-MM-DD（含）
+            end: 結束日期 YYYY-MM-DD（含）
+
+        Returns:
+            {YYYY-MM-DD: 每日紀錄}
+        """
+        months = months_between(start[:7], end[:7])
+        merged = {}
+        for index in self.get_day_indexes(months).values():
+            merged.update(
+                (day, record) for day, record in index.items() if start <= day <= end
             )
+        return dict(sorted(merged.items()))
 
-            if response.data and len(response.data) > 0:
-                return response.data[0].get("content", "")
+    def get_day_index(self, month: str) -> Dict[str, Dict]:
+        """
+        取得月份的每日紀錄索引（解析結果與月份內容一同快取）
 
-            return None
+        Returns:
+            {YYYY-MM-DD: 每日紀錄}；無資料或無法解析時為空字典
+        """
+        return self.get_day_indexes([month])[month]
 
-        except Exception as e:
-            print(f"Error querying calendar data for {month}: {e}")
-            return None
+    def get_day_record(self, date: str) -> Optional[Dict]:
+        """
+        查詢單日的黃曆紀錄
 
-    def get_available_months(self) -> list[str]:
+        Args:
+            date: 日期，格式 YYYY-MM-DD
+
+        Returns:
+            每日紀錄，若無資料或無法解析則返回 None
+        """
+        return self.get_day_index(date[:7]).get(date)
+
+    @traced("db.calendar.get_available_months", "db", lambda self, *a, **k: {"table": self.table_name})
+    def get_available_months(self) -> List[str]:
         """
-        獲取所有可用的月份
+        獲取所有可用的月份（來自預載的月份索引）
 
         Returns:
             月份列表，格式 YYYY-MM
         """
-        try:
-            supabase: Client = create_client(self.supabase_url, self.supabase_key)
-            response = supabase.table(self.table_name).select("month").execute()
+        index = self._month_index.get()
+        return sorted(index) if index else []
+
+    def clear_cache(self):
+        """清除月份內容、每日紀錄與月份索引快取"""
+        self._month_cache.clear()
+        self._day_index_cache.clear()
+        self._month_index.invalidate()
+
+    # ---------- 內部實作 ----------
+
+    def _fetch_month_index(self) -> frozenset:
+        """載入可用月份索引（只查詢 month 欄位；失敗時拋出例外）"""
+        rows = self.reference.get_rows(self.table_name)
+        if rows is None:
+            rows = self.supabase.table(self.table_name).select("month").execute().data
+        return frozenset(item["month"] for item in rows or [] if item.get("month"))
+
+    def _on_reference_update(self, store, changed_tables):
+        if self.table_name in changed_tables:
+            self.clear_cache()
+
 
-            if response.data:
-                months = [item["month"] for item in response.data]
-                return sorted(list(set(months)))  # 去重並排序
+_calendar_db: Optional[CalendarDB] = None
+_calendar_db_lock = threading.Lock()
 
-            return []
 
-        except Exception as e:
-            print(f"Error querying available months: {e}")
-            return []
+def get_calendar_db() -> CalendarDB:
+    """獲取黃曆資料庫實例 (Singleton)"""
+    global _calendar_db
+    if _calendar_db is None:
+        with _calendar_db_lock:
+            if _calendar_db is None:
+                _calendar_db = CalendarDB()
+    return _calendar_db
@@ -0,0 +1,168 @@
+"""
+黃曆每日索引模組
+將 auspicious_calendar 的月份全文解析成每日紀錄，查詢時只需送出當天的資料
+
+每日紀錄格式：
+{
+    "date": "2025-01-05",
+    "yi": ["嫁娶", "祭祀"],    # 宜
+    "ji": ["動土", "安葬"],    # 忌
+    "chong": "馬",             # 沖的生肖
+    "sha": "南",               # 煞方
+    "raw": "...",              # 當天的原始文字（解析不完整時仍可提供給 AI）
+}
+
+解析採寬鬆規則：以行首的日期標記切分每天的段落，再從段落中擷取宜、忌、沖、煞；
+無法辨識的月份會返回空索引，呼叫端應退回使用整月全文。
+"""
+
+import re
+from typing import Dict, List, Optional
+
+ZODIAC_CHARS = "鼠牛虎兔龍蛇馬羊猴雞狗豬"
+
+# 行首日期標記（只看每行前段，避免把內文中的日期當成新的一天）
+_DATE_HEAD_LENGTH = 16
+_FULL_DATE_RE = re.compile(r"(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})")
+_MONTH_DAY_RE = re.compile(r"(?<!\d)(\d{1,2})\s*月\s*(\d{1,2})\s*日")
+_SLASH_DAY_RE = re.compile(r"^[\s【\[(（]*(\d{1,2})\s*[/-]\s*(\d{1,2})(?!\d)")
+_DAY_ONLY_RE = re.compile(r"^[\s【\[(（]*(\d{1,2})\s*[日號号](?!\d)")
+
+# 欄位（宜、忌之後到下一個欄位標記或行尾為止）
+_FIELD_BOUNDARY = r"(?=(?:^|[\s【\[|｜,，;；])(?:宜|忌|沖|冲|煞|吉時|吉时|胎神|彭祖|五行|值神|喜神|財神|福神)|$)"
+_YI_RE = re.compile(
+    r"(?:^|[\s【\[|｜,，;；])宜\s*[】\]]?\s*[：:]?\s*(.*?)" + _FIELD_BOUNDARY,
+    re.MULTILINE,
+)
+_JI_RE = re.compile(
+    r"(?:^|[\s【\[|｜,，;；])忌\s*[】\]]?\s*[：:]?\s*(.*?)" + _FIELD_BOUNDARY,
+    re.MULTILINE,
+)
+_CHONG_RE = re.compile(r"[沖冲][^" + ZODIAC_CHARS + r"\n]{0,8}?([" + ZODIAC_CHARS + r"])")
+_SHA_RE = re.compile(r"煞\s*[】\]]?\s*[：:]?\s*(?:方\s*[：:]?\s*)?([東南西北东]{1,2})")
+_ITEM_SPLIT_RE = re.compile(r"[\s、，,．.。/|｜;；]+")
+
+
+def normalize_date(text: str) -> Optional[str]:
+    """將使用者輸入的日期正規化為 YYYY-MM-DD（無法辨識時返回 None）"""
+    if not text:
+        return None
+    match = _FULL_DATE_RE.search(text)
+    if not match:
+        return None
+    year, month, day = (int(part) for part in match.groups())
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def months_between(start_month: str, end_month: str) -> List[str]:
+    """兩個月份（YYYY-MM，含頭尾）之間的所有月份"""
+    year, month = (int(part) for part in start_month.split("-")[:2])
+    end = tuple(int(part) for part in end_month.split("-")[:2])
+    months = []
+    while (year, month) <= end:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _match_day(line: str, year: int, month: int) -> Optional[int]:
+    """判斷這一行是否為新一天的開頭，是則返回日期（屬於其他月份時返回 None）"""
+    head = line.strip()[:_DATE_HEAD_LENGTH]
+    if not head:
+        return None
+
+    match = _FULL_DATE_RE.search(head)
+    if match:
+        y, m, d = (int(part) for part in match.groups())
+        return d if (y, m) == (year, month) else None
+
+    match = _MONTH_DAY_RE.search(head)
+    if match:
+        m, d = (int(part) for part in match.groups())
+        return d if m == month else None
+
+    match = _SLASH_DAY_RE.match(head)
+    if match:
+        m, d = (int(part) for part in match.groups())
+        return d if m == month else None
+
+    match = _DAY_ONLY_RE.match(head)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def _split_items(text: str) -> List[str]:
+    items = []
+    for item in _ITEM_SPLIT_RE.split(text.strip()):
+        item = item.strip("【】[]()（）:：")
+        if item and item not in ("無", "无") and item not in items:
+            items.append(item)
+    return items
+
+
+def parse_day_block(date: str, block: str) -> Dict:
+    """從單日段落擷取宜、忌、沖、煞"""
+    yi = _YI_RE.search(block)
+    ji = _JI_RE.search(block)
+    chong = _CHONG_RE.search(block)
+    sha = _SHA_RE.search(block)
+    return {
+        "date": date,
+        "yi": _split_items(yi.group(1)) if yi else [],
+        "ji": _split_items(ji.group(1)) if ji else [],
+        "chong": chong.group(1) if chong else None,
+        "sha": sha.group(1).replace("东", "東") if sha else None,
+        "raw": block.strip(),
+    }
+
+
+def parse_month_content(month: str, content: str) -> Dict[str, Dict]:
+    """
+    將整月黃曆全文解析成每日紀錄
+
+    Args:
+        month: 月份，格式 YYYY-MM
+        content: auspicious_calendar.content
+
+    Returns:
+        {YYYY-MM-DD: 每日紀錄}；無法辨識任何日期時返回空字典
+    """
+    try:
+        year, month_num = (int(part) for part in month.split("-")[:2])
+    except ValueError:
+        return {}
+
+    blocks: Dict[int, List[str]] = {}
+    current_day = None
+    for line in (content or "").splitlines():
+        day = _match_day(line, year, month_num)
+        if day is not None and 1 <= day <= 31:
+            current_day = day
+            blocks.setdefault(day, [])
+        if current_day is not None and line.strip():
+            blocks[current_day].append(line.rstrip())
+
+    records = {}
+    for day, lines in blocks.items():
+        date = f"{year:04d}-{month_num:02d}-{day:02d}"
+        record = parse_day_block(date, "\n".join(lines))
+        # 沒有任何宜忌資訊的段落視為誤判（例如月份說明中的日期）
+        if record["yi"] or record["ji"] or record["chong"]:
+            records[date] = record
+    return records
+
+
+def format_day_record(record: Dict) -> str:
+    """將每日紀錄整理成提示詞用的精簡文字"""
+    lines = [f"日期：{record['date']}"]
+    lines.append(f"宜：{'、'.join(record['yi']) if record['yi'] else '（未列出）'}")
+    lines.append(f"忌：{'、'.join(record['ji']) if record['ji'] else '（未列出）'}")
+    if record.get("chong"):
+        lines.append(f"沖：{record['chong']}")
+    if record.get("sha"):
+        lines.append(f"煞：{record['sha']}")
+    lines.append(f"原始資料：\n{record['raw']}")
+    return "\n".join(lines)
@@ -0,0 +1,148 @@
+"""
+吉日搜尋模組
+在日期範圍內掃描每日黃曆紀錄，依分類活動的「宜」命中數評分，
+排除沖到使用者生肖的日子，返回最適合的前幾個日期（不需呼叫 AI）
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from .calendar_index import ZODIAC_CHARS, months_between
+from .lunar_calendar import day_clash
+
+# 單次搜尋最多掃描的天數（約一季）
+SEARCH_MAX_DAYS = 93
+
+# 評分權重
+MATCH_SCORE = 10  # 每個「宜」命中
+CONFLICT_PENALTY = 15  # 每個「忌」命中
+
+# 簡體生肖字轉繁體
+_ZODIAC_ALIASES = {"龙": "龍", "马": "馬", "鸡": "雞", "猪": "豬"}
+
+
+def normalize_zodiac(text: Optional[str]) -> Optional[str]:
+    """從「屬馬」、「馬」、「马年」等輸入取出生肖字（無法辨識時返回 None）"""
+    for char in text or "":
+        char = _ZODIAC_ALIASES.get(char, char)
+        if char in ZODIAC_CHARS:
+            return char
+    return None
+
+
+def parse_date(text: str) -> date:
+    """解析 YYYY-MM-DD（格式錯誤時拋出 ValueError）"""
+    return datetime.strptime(text.strip(), "%Y-%m-%d").date()
+
+
+def _matches(activities: Iterable[str], items: List[str]) -> List[str]:
+    """活動列表中出現在黃曆項目裡的活動（黃曆項目可能是複合詞，採包含比對）"""
+    return [
+        activity
+        for activity in activities
+        if any(activity in item for item in items)
+    ]
+
+
+def score_day(record: Dict, activities: List[str], zodiac: Optional[str]) -> Optional[Dict]:
+    """
+    為單日評分
+
+    Returns:
+        評分結果；沖到生肖、諸事不宜或「忌」多於「宜」時返回 None
+    """
+    chong = record.get("chong")
+    sha = record.get("sha")
+    if not chong or not sha:
+        # 黃曆文字未列出沖煞時，以本地推算補上
+        try:
+            clash = day_clash(parse_date(record["date"]))
+            chong, sha = chong or clash["chong"], sha or clash["sha"]
+        except ValueError:
+            pass
+    if zodiac and chong == zodiac:
+        return None
+    if "諸事不宜" in record.get("ji", []):
+        return None
+
+    matched = _matches(activities, record.get("yi", []))
+    if not matched:
+        return None
+    conflicts = _matches(activities, record.get("ji", []))
+    score = len(matched) * MATCH_SCORE - len(conflicts) * CONFLICT_PENALTY
+    if score <= 0:
+        return None
+
+    return {
+        "date": record["date"],
+        "score": score,
+        "matched": matched,
+        "conflicts": conflicts,
+        "yi": record.get("yi", []),
+        "ji": record.get("ji", []),
+        "chong": chong,
+        "sha": sha,
+    }
+
+
+def search_best_dates(
+    calendar_db,
+    activities: List[str],
+    start: date,
+    end: date,
+    zodiac: Optional[str] = None,
+    top_k: int = 5,
+) -> Dict:
+    """
+    在日期範圍內搜尋最適合的日子
+
+    Args:
+        calendar_db: CalendarDB 實例（提供 get_day_indexes）
+        activities: 分類對應的黃曆活動
+        start: 開始日期（含）
+        end: 結束日期（含）
+        zodiac: 使用者生肖字，沖到此生肖的日子會被排除
+        top_k: 返回筆數
+
+    Returns:
+        {"results": [...], "scanned_days": int, "missing_months": [...]}
+    """
+    if end < start:
+        raise ValueError("結束日期不可早於開始日期")
+    if (end - start).days + 1 > SEARCH_MAX_DAYS:
+        raise ValueError(f"搜尋範圍最多 {SEARCH_MAX_DAYS} 天")
+
+    candidates = []
+    scanned = 0
+    missing_months = []
+    start_key, end_key = start.isoformat(), end.isoformat()
+
+    # 範圍內所有月份以單次查詢取得
+    day_indexes = calendar_db.get_day_indexes(
+        months_between(start.isoformat()[:7], end.isoformat()[:7])
+    )
+    for month, day_index in day_indexes.items():
+        if not day_index:
+            missing_months.append(month)
+            continue
+        for day_key, record in day_index.items():
+            if not (start_key <= day_key <= end_key):
+                continue
+            scanned += 1
+            result = score_day(record, activities, zodiac)
+            if result:
+                candidates.append(result)
+
+    # 分數高者優先，同分時較早的日期優先
+    candidates.sort(key=lambda item: (-item["score"], item["date"]))
+    return {
+        "results": candidates[:top_k],
+        "scanned_days": scanned,
+        "missing_months": missing_months,
+    }
+
+
+def default_range(days: int = 30) -> tuple:
+    """未指定範圍時的預設搜尋範圍（今天起算）"""
+    today = date.today()
+    return today, today + timedelta(days=days - 1)
@@ -0,0 +1,294 @@
+"""
+農曆表產生器（天文計算）
+以 Meeus《Astronomical Algorithms》的朔日（第 49 章）與太陽視黃經（第 25 章）公式，
+依現行農曆規則（1929 年起以東八區、之前以北京地方平時定日，冬至所在月為十一月、歲中十三個月時以第一個無中氣月為閏月）
+推算 1900–2100 年的農曆月份，並輸出 lunar_calendar.LUNAR_YEAR_INFO 使用的編碼表。
+
+執行時不需要此模組；只有更新或檢查內建表格時使用：
+    python -m auspicious.modules.lunar_astronomy generate   # 輸出表格原始碼
+    python -m auspicious.modules.lunar_astronomy check      # 比對內建表格與天文計算結果
+"""
+
+import argparse
+import math
+import sys
+from datetime import date, timedelta
+from typing import List, Tuple
+
+# 東八區（中國標準時間，1929 年起採用）
+TIMEZONE_OFFSET_DAYS = 8 / 24
+# 1929 年以前以北京地方平時（東經 116°25′）定日
+BEIJING_MEAN_TIME_OFFSET_DAYS = (116 + 25 / 60) / 360
+STANDARD_TIME_SINCE_JD = 2425612.5 - 8 / 24  # 1929-01-01 00:00 東八區
+
+_JD_ORDINAL_ORIGIN = 1721425.5  # date.fromordinal(1)（0001-01-01 00:00 UT）的儒略日
+
+
+def _sin(degrees: float) -> float:
+    return math.sin(math.radians(degrees))
+
+
+def delta_t_days(year: float) -> float:
+    """力學時與世界時的差（ΔT，Espenak & Meeus 多項式），單位：日"""
+    if year < 1920:
+        t = year - 1900
+        seconds = -2.79 + 1.494119 * t - 0.0598939 * t**2 + 0.0061966 * t**3 - 0.000197 * t**4
+    elif year < 1941:
+        t = year - 1920
+        seconds = 21.20 + 0.84493 * t - 0.076100 * t**2 + 0.0020936 * t**3
+    elif year < 1961:
+        t = year - 1950
+        seconds = 29.07 + 0.407 * t - t**2 / 233 + t**3 / 2547
+    elif year < 1986:
+        t = year - 1975
+        seconds = 45.45 + 1.067 * t - t**2 / 260 - t**3 / 718
+    elif year < 2005:
+        t = year - 2000
+        seconds = (
+            63.86 + 0.3345 * t - 0.060374 * t**2 + 0.0017275 * t**3
+            + 0.000651814 * t**4 + 0.00002373599 * t**5
+        )
+    elif year < 2050:
+        t = year - 2000
+        seconds = 62.92 + 0.32217 * t + 0.005589 * t**2
+    else:
+        seconds = -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year)
+    return seconds / 86400
+
+
+def _jde_to_local_date(jde: float) -> date:
+    """力學時儒略日 → 中國當地日期"""
+    year = 2000 + (jde - 2451545.0) / 365.25
+    jd_ut = jde - delta_t_days(year)
+    if jd_ut < STANDARD_TIME_SINCE_JD:
+        jd_local = jd_ut + BEIJING_MEAN_TIME_OFFSET_DAYS
+    else:
+        jd_local = jd_ut + TIMEZONE_OFFSET_DAYS
+    return date.fromordinal(int(math.floor(jd_local - _JD_ORDINAL_ORIGIN)) + 1)
+
+
+def new_moon_jde(k: int) -> float:
+    """第 k 個朔（k=0 為 2000-01-06 附近）的力學時儒略日"""
+    t = k / 1236.85
+    jde = (
+        2451550.09766 + 29.530588861 * k + 0.00015437 * t**2
+        - 0.000000150 * t**3 + 0.00000000073 * t**4
+    )
+    e = 1 - 0.002516 * t - 0.0000074 * t**2
+    m = 2.5534 + 29.10535670 * k - 0.0000014 * t**2 - 0.00000011 * t**3
+    mp = (
+        201.5643 + 385.81693528 * k + 0.0107582 * t**2
+        + 0.00001238 * t**3 - 0.000000058 * t**4
+    )
+    f = (
+        160.7108 + 390.67050284 * k - 0.0016118 * t**2
+        - 0.00000227 * t**3 + 0.000000011 * t**4
+    )
+    omega = 124.7746 - 1.56375588 * k + 0.0020672 * t**2 + 0.00000215 * t**3
+
+    correction = (
+        -0.40720 * _sin(mp)
+        + 0.17241 * e * _sin(m)
+        + 0.01608 * _sin(2 * mp)
+        + 0.01039 * _sin(2 * f)
+        + 0.00739 * e * _sin(mp - m)
+        - 0.00514 * e * _sin(mp + m)
+        + 0.00208 * e * e * _sin(2 * m)
+        - 0.00111 * _sin(mp - 2 * f)
+        - 0.00057 * _sin(mp + 2 * f)
+        + 0.00056 * e * _sin(2 * mp + m)
+        - 0.00042 * _sin(3 * mp)
+        + 0.00042 * e * _sin(m + 2 * f)
+        + 0.00038 * e * _sin(m - 2 * f)
+        - 0.00024 * e * _sin(2 * mp - m)
+        - 0.00017 * _sin(omega)
+        - 0.00007 * _sin(mp + 2 * m)
+        + 0.00004 * _sin(2 * mp - 2 * f)
+        + 0.00004 * _sin(3 * m)
+        + 0.00003 * _sin(mp + m - 2 * f)
+        + 0.00003 * _sin(2 * mp + 2 * f)
+        - 0.00003 * _sin(mp + m + 2 * f)
+        + 0.00003 * _sin(mp - m + 2 * f)
+        - 0.00002 * _sin(mp - m - 2 * f)
+        - 0.00002 * _sin(3 * mp + m)
+        + 0.00002 * _sin(4 * mp)
+    )
+
+    planetary = (
+        (325, 299.77 + 0.107408 * k - 0.009173 * t**2),
+        (165, 251.88 + 0.016321 * k),
+        (164, 251.83 + 26.651886 * k),
+        (126, 349.42 + 36.412478 * k),
+        (110, 84.66 + 18.206239 * k),
+        (62, 141.74 + 53.303771 * k),
+        (60, 207.14 + 2.453732 * k),
+        (56, 154.84 + 7.306860 * k),
+        (47, 34.52 + 27.261239 * k),
+        (42, 207.19 + 0.121824 * k),
+        (40, 291.34 + 1.844379 * k),
+        (37, 161.72 + 24.198154 * k),
+        (35, 239.56 + 25.513099 * k),
+        (23, 331.55 + 3.592518 * k),
+    )
+    correction += sum(coefficient * _sin(angle) for coefficient, angle in planetary) * 1e-6
+    return jde + correction
+
+
+def solar_longitude(jde: float) -> float:
+    """太陽視黃經（度）"""
+    t = (jde - 2451545.0) / 36525
+    l0 = 280.46646 + 36000.76983 * t + 0.0003032 * t**2
+    m = 357.52911 + 35999.05029 * t - 0.0001537 * t**2
+    c = (
+        (1.914602 - 0.004817 * t - 0.000014 * t**2) * _sin(m)
+        + (0.019993 - 0.000101 * t) * _sin(2 * m)
+        + 0.000289 * _sin(3 * m)
+    )
+    omega = 125.04 - 1934.136 * t
+    return (l0 + c - 0.00569 - 0.00478 * _sin(omega)) % 360
+
+
+def solar_term_jde(year: int, longitude: float) -> float:
+    """指定年份太陽視黃經到達 longitude 的力學時儒略日"""
+    # 以春分（3/20）為起點估計
+    jde = 2451623.8 + (year - 2000) * 365.2422 + (longitude % 360) / 360 * 365.2422
+    for _ in range(50):
+        delta = 58.13 * math.sin(math.radians(longitude - solar_longitude(jde)))
+        jde += delta
+        if abs(delta) < 1e-7:
+            break
+    return jde
+
+
+def _winter_solstice(year: int) -> date:
+    return _jde_to_local_date(solar_term_jde(year, 270))
+
+
+def _new_moon_dates(start: date, end: date) -> List[date]:
+    """當地日期在 [start, end] 的所有朔日"""
+    k = int(math.floor((start.year + (start.timetuple().tm_yday / 365.25) - 2000) * 12.3685)) - 2
+    dates = []
+    while True:
+        day = _jde_to_local_date(new_moon_jde(k))
+        if day > end:
+            return dates
+        if day >= start:
+            dates.append(day)
+        k += 1
+
+
+def _zhongqi_dates(start_year: int, end_year: int) -> List[date]:
+    """所有中氣（太陽黃經為 30 度倍數）的當地日期"""
+    dates = []
+    for year in range(start_year, end_year + 1):
+        for longitude in range(0, 360, 30):
+            dates.append(_jde_to_local_date(solar_term_jde(year, longitude)))
+    return sorted(dates)
+
+
+def compute_lunar_months(first_year: int, last_year: int) -> List[Tuple[date, int, bool]]:
+    """
+    推算農曆月份
+
+    Returns:
+        [(月首日期, 月份數字, 是否閏月)]，涵蓋 first_year 到 last_year 的所有農曆年
+    """
+    solstices = {year: _winter_solstice(year) for year in range(first_year - 2, last_year + 2)}
+    moons = _new_moon_dates(
+        solstices[first_year - 2] - timedelta(days=60),
+        solstices[last_year + 1] + timedelta(days=60),
+    )
+    zhongqi = _zhongqi_dates(first_year - 2, last_year + 2)
+
+    def month_start_index(day: date) -> int:
+        """包含 day 的月份在 moons 中的索引"""
+        return max(i for i, start in enumerate(moons) if start <= day)
+
+    months: List[Tuple[date, int, bool]] = []
+    for year in range(first_year - 1, last_year + 1):
+        first = month_start_index(solstices[year - 1])  # 十一月（含冬至）
+        last = month_start_index(solstices[year])  # 下一個十一月
+        has_leap = last - first == 13
+        leap_found = False
+        number = 11
+        for index in range(first, last):
+            start, end = moons[index], moons[index + 1]
+            is_leap = False
+            if has_leap and not leap_found and index != first:
+                if not any(start <= day < end for day in zhongqi):
+                    is_leap = True
+                    leap_found = True
+            if index != first and not is_leap:
+                number = number % 12 + 1
+            months.append((start, number, is_leap))
+    return months
+
+
+def build_year_info(first_year: int = 1900, last_year: int = 2100) -> Tuple[date, List[int]]:
+    """
+    產生農曆年編碼
+
+    每年一個整數：bit 0–12 依序為各月（含閏月）是否為大月（30 天），
+    bit 13–16 為閏月月份（0 表示無閏月）
+
+    Returns:
+        (first_year 正月初一的日期, 編碼列表)
+    """
+    months = compute_lunar_months(first_year, last_year + 1)
+    new_years = {
+        start.year: i
+        for i, (start, number, is_leap) in enumerate(months)
+        if number == 1 and not is_leap
+    }
+    info = []
+    for year in range(first_year, last_year + 1):
+        begin, end = new_years[year], new_years[year + 1]
+        bits = 0
+        leap_month = 0
+        for offset, index in enumerate(range(begin, end)):
+            length = (months[index + 1][0] - months[index][0]).days
+            if length == 30:
+                bits |= 1 << offset
+            if months[index][2]:
+                leap_month = months[index][1]
+        info.append(bits | (leap_month << 13))
+    return months[new_years[first_year]][0], info
+
+
+def format_table(info: List[int], per_line: int = 8) -> str:
+    """輸出 LUNAR_YEAR_INFO 的原始碼"""
+    lines = ["LUNAR_YEAR_INFO = ("]
+    for start in range(0, len(info), per_line):
+        chunk = ", ".join(f"0x{value:05x}" for value in info[start:start + per_line])
+        lines.append(f"    {chunk},  # {1900 + start}")
+    lines.append(")")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="農曆表產生器")
+    parser.add_argument("command", choices=["generate", "check"])
+    args = parser.parse_args(argv)
+
+    base, info = build_year_info()
+    if args.command == "generate":
+        print(f"# 正月初一基準日：{base.isoformat()}")
+        print(format_table(info))
+        return 0
+
+    from .lunar_calendar import LUNAR_BASE_DATE, LUNAR_YEAR_INFO
+
+    mismatches = [
+        1900 + i
+        for i, (expected, actual) in enumerate(zip(info, LUNAR_YEAR_INFO))
+        if expected != actual
+    ]
+    if base != LUNAR_BASE_DATE or len(info) != len(LUNAR_YEAR_INFO) or mismatches:
+        print(f"內建表格與天文計算不一致：{mismatches}")
+        return 1
+    print(f"內建表格一致（{len(info)} 年）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
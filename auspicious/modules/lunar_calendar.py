@@ -0,0 +1,217 @@
+"""
+離線農曆與沖煞模組
+以內建的 1900–2100 年農曆表推算農曆日期、年/日干支、生肖與每日沖煞，不需查詢資料庫或呼叫 AI
+
+- 生肖以農曆正月初一為界（而非國曆元旦或立春）
+- 日干支以儒略日推算；沖為日支對沖的生肖，煞依日支三合局定方位
+- 表格由 lunar_astronomy.py 以天文計算產生（python -m auspicious.modules.lunar_astronomy check 可驗證）；
+  1912 年以前的個別月份可能與清代時憲曆相差一日
+"""
+
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+HEAVENLY_STEMS = "甲乙丙丁戊己庚辛壬癸"
+EARTHLY_BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+ZODIAC_ANIMALS = "鼠牛虎兔龍蛇馬羊猴雞狗豬"
+
+# 煞方：申子辰煞南、寅午戌煞北、巳酉丑煞東、亥卯未煞西
+SHA_DIRECTIONS = {
+    "申": "南", "子": "南", "辰": "南",
+    "寅": "北", "午": "北", "戌": "北",
+    "巳": "東", "酉": "東", "丑": "東",
+    "亥": "西", "卯": "西", "未": "西",
+}
+
+LUNAR_MONTH_NAMES = ["正", "二", "三", "四", "五", "六", "七", "八", "九", "十", "十一", "十二"]
+_DAY_PREFIXES = ["初", "十", "廿", "三"]
+_DAY_DIGITS = ["十", "一", "二", "三", "四", "五", "六", "七", "八", "九"]
+
+# 1900 年正月初一
+LUNAR_BASE_DATE = date(1900, 1, 31)
+LUNAR_FIRST_YEAR = 1900
+
+# 每年一個整數：bit 0–12 依序為各月（含閏月）是否為大月（30 天），bit 13–16 為閏月月份（0 表示無閏月）
+LUNAR_YEAR_INFO = (
+    0x116d2, 0x00752, 0x00ea5, 0x0b64a, 0x0064b, 0x00a9b, 0x0955a, 0x0056a,  # 1900
+    0x00b59, 0x05752, 0x00752, 0x0db25, 0x00b25, 0x00a4b, 0x0b4ab, 0x002ad,  # 1908
+    0x0056b, 0x06b69, 0x00da9, 0x0fd92, 0x00e92, 0x00d25, 0x0da4d, 0x00a56,  # 1916
+    0x002b6, 0x095b5, 0x006d4, 0x00ea9, 0x05e92, 0x00e92, 0x0cd26, 0x0052b,  # 1924
+    0x00a57, 0x0b2b6, 0x00b5a, 0x006d4, 0x06ec9, 0x00749, 0x0f693, 0x00a93,  # 1932
+    0x0052b, 0x0ca5b, 0x00aad, 0x0056a, 0x09b55, 0x00ba4, 0x00b49, 0x05a93,  # 1940
+    0x00a95, 0x0f52d, 0x00536, 0x00aad, 0x0b5aa, 0x005b2, 0x00da5, 0x07d4a,  # 1948
+    0x00d4a, 0x10a95, 0x00a97, 0x00556, 0x0cab5, 0x00ad5, 0x006d2, 0x08ea5,  # 1956
+    0x00ea5, 0x0064a, 0x06c97, 0x00a9b, 0x0f55a, 0x0056a, 0x00b69, 0x0b752,  # 1964
+    0x00b52, 0x00b25, 0x0964b, 0x00a4b, 0x114ab, 0x002ad, 0x0056d, 0x0cb69,  # 1972
+    0x00da9, 0x00d92, 0x09d25, 0x00d25, 0x15a4d, 0x00a56, 0x002b6, 0x0c5b5,  # 1980
+    0x006d5, 0x00ea9, 0x0be92, 0x00e92, 0x00d26, 0x06a56, 0x00a57, 0x114d6,  # 1988
+    0x0035a, 0x006d5, 0x0b6c9, 0x00749, 0x00693, 0x0952b, 0x0052b, 0x00a5b,  # 1996
+    0x0555a, 0x0056a, 0x0fb55, 0x00ba4, 0x00b49, 0x0ba93, 0x00a95, 0x0052d,  # 2004
+    0x08aad, 0x00ab5, 0x135aa, 0x005d2, 0x00da5, 0x0dd4a, 0x00d4a, 0x00c95,  # 2012
+    0x0952e, 0x00556, 0x00ab5, 0x055b2, 0x006d2, 0x0cea5, 0x00725, 0x0064b,  # 2020
+    0x0ac97, 0x00cab, 0x0055a, 0x06ad6, 0x00b69, 0x17752, 0x00b52, 0x00b25,  # 2028
+    0x0da4b, 0x00a4b, 0x004ab, 0x0a55b, 0x005ad, 0x00b6a, 0x05b52, 0x00d92,  # 2036
+    0x0fd25, 0x00d25, 0x00a55, 0x0b4ad, 0x004b6, 0x005b5, 0x06daa, 0x00ec9,  # 2044
+    0x11e92, 0x00e92, 0x00d26, 0x0ca56, 0x00a57, 0x00556, 0x086d5, 0x00755,  # 2052
+    0x00749, 0x06e93, 0x00693, 0x0f52b, 0x0052b, 0x00a5b, 0x0b55a, 0x0056a,  # 2060
+    0x00b65, 0x0974a, 0x00b4a, 0x11a95, 0x00a95, 0x0052d, 0x0caad, 0x00ab5,  # 2068
+    0x005aa, 0x08ba5, 0x00da5, 0x00d4a, 0x07c95, 0x00c96, 0x0f94e, 0x00556,  # 2076
+    0x00ab5, 0x0b5b2, 0x006d2, 0x00ea5, 0x08e4a, 0x0068b, 0x10c97, 0x004ab,  # 2084
+    0x0055b, 0x0cad6, 0x00b6a, 0x00752, 0x09725, 0x00b45, 0x00a8b, 0x0549b,  # 2092
+    0x004ab,  # 2100
+)
+
+
+def _decode_year(info: int) -> List[Tuple[int, bool, int]]:
+    """解碼單一農曆年：[(月份, 是否閏月, 天數)]"""
+    leap_month = info >> 13
+    months = []
+    number = 0
+    for offset in range(13 if leap_month else 12):
+        is_leap = bool(leap_month) and offset == leap_month
+        if not is_leap:
+            number += 1
+        months.append((number, is_leap, 30 if info >> offset & 1 else 29))
+    return months
+
+
+def _build_new_year_ordinals() -> List[int]:
+    ordinals = [LUNAR_BASE_DATE.toordinal()]
+    for info in LUNAR_YEAR_INFO:
+        ordinals.append(ordinals[-1] + sum(days for _, _, days in _decode_year(info)))
+    return ordinals
+
+
+# 各農曆年正月初一的 ordinal（最後一筆為範圍結束的下一天）
+_NEW_YEAR_ORDINALS = _build_new_year_ordinals()
+LUNAR_LAST_DATE = date.fromordinal(_NEW_YEAR_ORDINALS[-1] - 1)
+
+
+def year_ganzhi(lunar_year: int) -> str:
+    """年干支（例如 2024 → 甲辰）"""
+    return HEAVENLY_STEMS[(lunar_year - 4) % 10] + EARTHLY_BRANCHES[(lunar_year - 4) % 12]
+
+
+def year_zodiac(lunar_year: int) -> str:
+    """農曆年的生肖"""
+    return ZODIAC_ANIMALS[(lunar_year - 4) % 12]
+
+
+def format_lunar_day(day: int) -> str:
+    """農曆日名稱（初一、十五、廿三、三十）"""
+    if day == 10:
+        return "初十"
+    if day == 20:
+        return "二十"
+    if day == 30:
+        return "三十"
+    return _DAY_PREFIXES[day // 10] + _DAY_DIGITS[day % 10]
+
+
+def solar_to_lunar(day: date) -> Dict:
+    """
+    國曆轉農曆
+
+    Returns:
+        {"year", "month", "day", "is_leap", "year_ganzhi", "zodiac", "text"}
+
+    Raises:
+        ValueError: 日期超出 1900–2100 農曆表範圍
+    """
+    ordinal = day.toordinal()
+    if not (_NEW_YEAR_ORDINALS[0] <= ordinal < _NEW_YEAR_ORDINALS[-1]):
+        raise ValueError(
+            f"日期超出農曆表範圍（{LUNAR_BASE_DATE.isoformat()} ~ {LUNAR_LAST_DATE.isoformat()}）"
+        )
+
+    index = bisect_right(_NEW_YEAR_ORDINALS, ordinal) - 1
+    lunar_year = LUNAR_FIRST_YEAR + index
+    remaining = ordinal - _NEW_YEAR_ORDINALS[index]
+    for number, is_leap, days in _decode_year(LUNAR_YEAR_INFO[index]):
+        if remaining < days:
+            break
+        remaining -= days
+
+    ganzhi = year_ganzhi(lunar_year)
+    text = (
+        f"{ganzhi}年{'閏' if is_leap else ''}{LUNAR_MONTH_NAMES[number - 1]}月"
+        f"{format_lunar_day(remaining + 1)}"
+    )
+    return {
+        "year": lunar_year,
+        "month": number,
+        "day": remaining + 1,
+        "is_leap": is_leap,
+        "year_ganzhi": ganzhi,
+        "zodiac": year_zodiac(lunar_year),
+        "text": text,
+    }
+
+
+def zodiac_for_birthdate(birthdate: date) -> str:
+    """依生日推算生肖（以農曆正月初一為界）"""
+    return solar_to_lunar(birthdate)["zodiac"]
+
+
+def _day_cycle_index(day: date) -> int:
+    """日干支在六十甲子中的序號（0 = 甲子）"""
+    julian_day_number = day.toordinal() + 1721425
+    return (julian_day_number + 49) % 60
+
+
+def day_ganzhi(day: date) -> str:
+    """日干支（例如 2000-01-01 → 戊午）"""
+    index = _day_cycle_index(day)
+    return HEAVENLY_STEMS[index % 10] + EARTHLY_BRANCHES[index % 12]
+
+
+def day_clash(day: date) -> Dict:
+    """
+    每日沖煞
+
+    Returns:
+        {"ganzhi": 日干支, "chong": 沖的生肖, "chong_ganzhi": 對沖干支, "sha": 煞方}
+    """
+    index = _day_cycle_index(day)
+    stem, branch = index % 10, index % 12
+    clash_branch = (branch + 6) % 12
+    return {
+        "ganzhi": HEAVENLY_STEMS[stem] + EARTHLY_BRANCHES[branch],
+        "chong": ZODIAC_ANIMALS[clash_branch],
+        "chong_ganzhi": HEAVENLY_STEMS[(stem + 6) % 10] + EARTHLY_BRANCHES[clash_branch],
+        "sha": SHA_DIRECTIONS[EARTHLY_BRANCHES[branch]],
+    }
+
+
+def describe_day(day: date, zodiac: Optional[str] = None) -> Dict:
+    """
+    單日的農曆與沖煞資訊
+
+    Args:
+        day: 國曆日期
+        zodiac: 使用者生肖（提供時會判斷是否相沖）
+    """
+    clash = day_clash(day)
+    info = {
+        "date": day.isoformat(),
+        "lunar": solar_to_lunar(day)["text"],
+        **clash,
+    }
+    if zodiac:
+        info["clashes_user"] = clash["chong"] == zodiac
+    return info
+
+
+def format_day_description(info: Dict) -> str:
+    """將 describe_day 的結果整理成提示詞用文字"""
+    lines = [
+        f"日期：{info['date']}（農曆{info['lunar']}）",
+        f"日干支：{info['ganzhi']}",
+        f"沖：沖（{info['chong_ganzhi']}）{info['chong']}",
+        f"煞：煞{info['sha']}",
+    ]
+    if "clashes_user" in info:
+        lines.append(f"是否沖到使用者生肖：{'是' if info['clashes_user'] else '否'}")
+    return "\n".join(lines)
+
@@ -9,12 +9,17 @@ import uuid
 
 from auspicious.agent import AuspiciousAgent, AuspiciousSession, AuspiciousState
 from auspicious.session_store import get_session_store
-from shared.rule_loader import load_global_rules
-
+from auspicious.prompts import FREE_TONE_PROMPTS, PAID_TONE_PROMPTS, prompts
+from jobs_api import job_mode
+from shared.admission import LLMOverloadedError, overloaded_response
+from shared.logger import get_logger, sampled
+from shared.request_context import bind_session
 
 # 創建 Blueprint
 auspicious_bp = Blueprint("auspicious", __name__, url_prefix="/auspicious")
 
+logger = get_logger(__name__)
+
 # 創建 Session Store
 session_store = get_session_store()
 
@@ -23,9 +28,6 @@ agent = AuspiciousAgent()
 
 # ========== 語氣配置 ==========
 
-# 免費版語氣配置（3種）
-FREE_TONE_PROMPTS = {"friendly": "親切版", "caring": "貼心版", "ritual": "儀式感"}
-
 FREE_TONE_GREETINGS = {
     "friendly": """歡迎來到《黃道吉日 AI 小日曆》📅
 最近有什麼重要的事情想安排嗎？搬家、結婚、開業，或只是想找個順利一點的日子都可以～
@@ -56,66 +58,6 @@ NO_TONE_MESSAGE = """小提醒 🌟：請先選擇您想要的對話語氣，
 這樣我才能用最適合你的方式替你查詢黃道吉日並說明建議 👇
 🔸請選擇：「friendly / caring / ritual」"""
 
-# 付費版語氣配置（9種神明）
-PAID_TONE_PROMPTS = {
-    "guan_gong": {
-        "name": "關聖帝君（主神）",
-        "style": "莊嚴、正直、有威信",
-        "keywords": "忠義、正道、守信、因果回饋、明辨是非",
-        "example": "「行於正道，心自無愧。是非有報，天理昭昭。」",
-        "greeting": "我是關聖帝君。既然來到這裡求問吉日，請帶著誠心。你心中的安排，我會為你明辨良辰，指引方向。\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "wealth_god": {
-        "name": "五路財神",
-        "style": "豪爽、自信、帶鼓舞氣場",
-        "keywords": "財運、貴人、機會、行動、回報",
-        "example": "「財不聚怠惰人，行動即是開運的起點。勤者得財，信者得福。」",
-        "greeting": "哈哈哈！恭喜發財！我是五路財神。想挑個開業吉日、簽約好日？來來來，讓我看看哪天能替你招財進寶！\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "wen_chang": {
-        "name": "文昌帝君",
-        "style": "沉穩、理性、帶學者氣息",
-        "keywords": "學習、啟發、智慧、思辨、修身",
-        "example": "「勤讀者，心明而志定。修德養性，功名自來。」",
-        "greeting": "學海無涯，唯勤是岸。我是文昌帝君。你有什麼學業、考試、簽約的大事想選個好日子？說來聽聽。\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "yue_lao": {
-        "name": "月老星君",
-        "style": "溫柔、睿智、帶人情味",
-        "keywords": "緣分、誠心、愛情、相遇、和合",
-        "example": "「紅線不亂繞，真心自相牽。緣來時，請以誠相待。」",
-        "greeting": "千里姻緣一線牽。我是月老。孩子，是想挑個好日子辦婚事嗎？來，讓我為你理理這條紅線。\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "guanyin": {
-        "name": "觀世音菩薩",
-        "style": "慈悲、柔和、帶母性與寬慰",
-        "keywords": "慈悲、願力、平安、覺悟、善念",
-        "example": "「願你以善為舟，度己度人。靜聽內心，慈悲自現。」",
-        "greeting": "南無大慈大悲觀世音菩薩。善哉善哉。孩子，心裡有什麼重要的日子想安排？我願以慈悲之心，為你擇選良辰。\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "mazu": {
-        "name": "媽祖",
-        "style": "穩定、溫厚、如母親般的包容",
-        "keywords": "平安、庇佑、守護、航程、母愛",
-        "example": "「風浪不懼，因為我在你身旁。信念如舟，必達彼岸。」",
-        "greeting": "海不揚波，民生安樂。我是默娘。孩子，人生像行船，大事小事都要挑個好日子。別怕，我會幫你守護。\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "jiutian": {
-        "name": "九天娘娘",
-        "style": "神秘、果斷、帶女戰神氣勢",
-        "keywords": "啟示、力量、轉機、覺醒、行動",
-        "example": "「命運非天定，覺醒者自創天命。敢行者，天地助之。」",
-        "greeting": "天道無親，常與善人。我是九天玄女。你的大事，需要一個有力量的日子。準備好接受天命了嗎？\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-    "fude": {
-        "name": "福德正神",
-        "style": "樸實、親切、有長輩感",
-        "keywords": "福報、穩定、家運、土地、勤誠",
-        "example": "「厚德載福，勤誠得財。守本分者，天地自報之。」",
-        "greeting": "呵呵呵，土地公來囉！我是福德正神。家和萬事興，平安就是福。孩子，有什麼家裡的大事想挑個好日子？\n\n請告訴我你的姓名、性別、生日與生肖。\n例如：王小明 男 1990/07/12 屬馬",
-    },
-}
-
 # 基本資訊錯誤提示
 BASIC_INFO_ERROR_TEMPLATES = {
     "friendly": """噢～我好像還沒收到完整的資料呢 😅
@@ -165,31 +107,41 @@ BASIC_INFO_SUCCESS = {
 # ========== 分類定義 ==========
 
 # 五種分類配置
+# activities：該分類在黃曆「宜」「忌」中對應的活動（供吉日搜尋評分）
 CATEGORIES = {
     "daily_life": {
         "name": "生活日常",
         "examples": "出門治公、購物、聚會",
         "description": "出行、出火、捕捉、畋獵、取魚、結網、沐浴、會親友、進人口、納財、牧養、平治道塗、交車、入殮、破土、火化、安葬、立碑、移柩等日常生活及喪葬活動",
+        "activities": [
+            "出行", "出火", "捕捉", "畋獵", "取魚", "結網", "沐浴", "會親友",
+            "進人口", "納財", "牧養", "平治道塗", "交車", "入殮", "破土", "火化",
+            "安葬", "立碑", "移柩",
+        ],
     },
     "family_home": {
         "name": "家庭居所",
         "examples": "搬家、簽約、動工",
         "description": "入宅、安床、作灶、動土、上樑、裁衣、破屋壞垣等居家相關",
+        "activities": ["入宅", "安床", "作灶", "動土", "上樑", "裁衣", "破屋", "壞垣"],
     },
     "relationship": {
         "name": "感情人際",
         "examples": "約會、告白、合作",
         "description": "納采、嫁娶、冠笄等婚嫁感情相關",
+        "activities": ["納采", "嫁娶", "冠笄"],
     },
     "celebration": {
         "name": "喜慶大事",
         "examples": "婚嫁、慶典、開業",
         "description": "祭祀、祈福、開光、設醮、齋醮、安香等祭祀祈福儀式",
+        "activities": ["祭祀", "祈福", "開光", "設醮", "齋醮", "安香"],
     },
     "work_career": {
         "name": "工作事業",
         "examples": "開工、會議、啟動計劃",
         "description": "開市等商業經營相關",
+        "activities": ["開市"],
     },
 }
 
@@ -229,7 +181,9 @@ CATEGORY_SELECTION_PROMPT = {
 
 def get_session_by_id(version: str, session_id: str) -> Optional[AuspiciousSession]:
     """根據 session_id 從 Redis 獲取會話"""
-    return session_store.load_session(version, session_id)
+    auspicious_session = session_store.load_session(version, session_id)
+    bind_session(auspicious_session)
+    return auspicious_session
 
 
 def save_and_return(
@@ -281,6 +235,7 @@ def handle_init_with_tone(version: str):
     return save_and_return(version, session_id, auspicious_session, response_data)
 
 
+@job_mode("auspicious")
 def handle_chat(version: str):
     """處理對話互動"""
     data = request.get_json()
@@ -304,10 +259,15 @@ def handle_chat(version: str):
     if message:
         auspicious_session.add_message("user", message)
 
+    loaded_state = auspicious_session.state.value
+
     # 根據當前狀態處理
     if auspicious_session.state == AuspiciousState.WAITING_BASIC_INFO:
         # 使用 AI 提取基本資訊
-        extracted = agent.extract_basic_info(message)
+        try:
+            extracted = agent.extract_basic_info(message)
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "auspicious extract"))
 
         # 驗證是否提取成功
         if (
@@ -428,18 +388,48 @@ def handle_chat(version: str):
         auspicious_session.state = AuspiciousState.PROVIDING_DATES
 
         # 查詢黃曆資料
-        from auspicious.modules.calendar_db import CalendarDB
+        from auspicious.modules.calendar_db import get_calendar_db
+        from auspicious.modules.calendar_index import normalize_date, format_day_record
+        from auspicious.modules.date_search import normalize_zodiac, parse_date
+        from auspicious.modules.lunar_calendar import describe_day, format_day_description
         from shared.gpt_client import GPTClient
 
-        calendar_db = CalendarDB()
+        calendar_db = get_calendar_db()
         gpt_client = GPTClient()
 
         # 從選擇的日期提取年月（YYYY-MM）
-        selected_date = auspicious_session.selected_date  # 格式: YYYY-MM-DD
+        selected_date = (
+            normalize_date(auspicious_session.selected_date)
+            or auspicious_session.selected_date
+        )  # 格式: YYYY-MM-DD
         year_month = selected_date[:7]  # 取前7位：YYYY-MM
 
-        # 查詢該月份的黃曆資料
-        calendar_content = calendar_db.get_month_data(year_month)
+        # 本地推算農曆、干支與沖煞（不需資料庫或 AI）
+        try:
+            day_info = describe_day(
+                parse_date(selected_date), normalize_zodiac(auspicious_session.zodiac)
+            )
+        except ValueError:
+            day_info = None
+
+        # 優先只查詢當天的黃曆紀錄；無法解析時才使用整月資料
+        day_record = calendar_db.get_day_record(selected_date)
+        if day_record:
+            calendar_content = format_day_record(day_record)
+            calendar_title = f"黃曆資料（{selected_date}）"
+            lookup_instruction = f"根據 {selected_date} 這一天的「宜」和「忌」事項進行判斷"
+        else:
+            calendar_content = calendar_db.get_month_data(year_month)
+            calendar_title = f"黃曆資料（{year_month}月）"
+            lookup_instruction = f"從黃曆中找到 {selected_date} 這一天的「宜」和「忌」事項"
+
+        if not calendar_content and day_info:
+            # 尚未收錄該月份黃曆時，改用本地推算的農曆與沖煞
+            calendar_content = "（此月份尚未收錄宜忌資料）"
+            lookup_instruction = f"此日期沒有宜忌資料，請依 {selected_date} 的日干支與沖煞給出一般性的擇日建議"
+
+        if day_info:
+            calendar_content += f"\n\n農曆與沖煞（本地推算）：\n{format_day_description(day_info)}"
 
         if calendar_content:
             # 使用 AI 分析黃曆與用戶需求
@@ -447,9 +437,11 @@ def handle_chat(version: str):
                 "name", auspicious_session.category
             )
 
-            system_prompt = f"""你是專業的黃道吉日顧問。請根據黃曆資料，判斷指定日期是否適合用戶的需求。
-
-用戶資訊：
+            system_prompt = prompts.render(
+                "auspicious.date_advice",
+                (auspicious_session.tone,),
+                reference=f"{calendar_title}：\n{calendar_content}",
+                user=f"""用戶資訊：
 - 姓名：{auspicious_session.user_name}
 - 性別：{auspicious_session.user_gender}
 - 生日：{auspicious_session.birthdate}
@@ -458,18 +450,9 @@ def handle_chat(version: str):
 - 查詢分類：{category_name}
 - 具體事項：{message}
 
-黃曆資料（{year_month}月）：
-{calendar_content}
-
-請根據以上資訊提供參考建議：
-1. 從黃曆中找到 {selected_date} 這一天的「宜」和「忌」事項
-2. 分析這些事項與用戶需求的關聯性
-3. 如果黃曆中有「沖」的生肖，檢查是否沖到用戶的生肖（{auspicious_session.zodiac}），說明可能的影響和化解方式
-4. 提供綜合性的建議
-5. 語氣要符合「{auspicious_session.tone}」，親切且專業。**請務必在回答中使用用戶的名字「{auspicious_session.user_name}」，嚴禁使用「親愛的使用者」或「用戶」等泛稱。**
-
-{load_global_rules()}
-"""
+【判斷方式】{lookup_instruction}
+請檢查是否沖到用戶的生肖（{auspicious_session.zodiac}），並在回答中使用用戶的名字「{auspicious_session.user_name}」。""",
+            )
 
             user_prompt = f"請分析 {selected_date} 這天是否適合「{message}」。"
 
@@ -479,10 +462,13 @@ def handle_chat(version: str):
                     user_prompt=user_prompt,
                     temperature=0.7,
                     max_tokens=500,
+                    site="reading",
                 )
                 response_text = ai_response
+            except LLMOverloadedError:
+                return jsonify(overloaded_response(session_id, loaded_state, "auspicious reading"))
             except Exception as e:
-                print(f"AI 分析錯誤: {e}")
+                logger.error("AI 分析錯誤: %s", e)
                 response_text = f"抱歉，在分析黃曆時遇到了一些技術問題。不過根據你選擇的日期 {selected_date}，建議你可以再確認一下當天的具體時辰和個人情況。"
         else:
             # 沒有該月份的黃曆資料
@@ -573,30 +559,21 @@ def handle_chat(version: str):
 
         # 繼續對話 - 使用 AI 以神明口吻回答
         tone = auspicious_session.tone
-        tone_config = PAID_TONE_PROMPTS.get(tone, PAID_TONE_PROMPTS["guan_gong"])
 
         from shared.gpt_client import GPTClient
 
         gpt_client = GPTClient()
 
         # 建立對話上下文
-        system_prompt = f"""你是{tone_config["name"]}。
-
-風格：{tone_config["style"]}
-關鍵詞：{tone_config["keywords"]}
-說話範例：{tone_config["example"]}
-
-用戶已經查詢了黃道吉日，現在有後續問題。請以神明的身分，用溫和且專業的口吻回答。
-
-用戶資訊：
+        system_prompt = prompts.render(
+            "auspicious.follow_up",
+            (tone,),
+            user=f"""用戶資訊：
 - 姓名：{auspicious_session.user_name}
 - 選擇日期：{auspicious_session.selected_date}
 - 分類：{auspicious_session.category}
-- 具體事項：{auspicious_session.specific_question}
-
-請保持角色一致，不要重複已經說過的內容，直接回答用戶的疑問。
-
-{load_global_rules()}"""
+- 具體事項：{auspicious_session.specific_question}""",
+        )
 
         user_prompt = f"{auspicious_session.user_name}的追問：{message}"
 
@@ -606,9 +583,12 @@ def handle_chat(version: str):
                 user_prompt=user_prompt,
                 temperature=0.7,
                 max_tokens=400,
+                site="follow_up",
             )
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "auspicious follow_up"))
         except Exception as e:
-            print(f"AI 回應錯誤: {e}")
+            logger.error("AI 回應錯誤: %s", e)
             response_text = (
                 "抱歉，我現在無法回答你的問題。請稍後再試，或者換個方式提問。"
             )
@@ -648,6 +628,116 @@ def handle_reset(version: str):
     return jsonify({"success": True, "message": "會話已重置"})
 
 
+def narrate_search_results(
+    category_name: str, zodiac: Optional[str], results: list, tone: str
+) -> str:
+    """請 AI 以一次呼叫說明搜尋出的候選日期（不參與挑選）"""
+    from shared.gpt_client import GPTClient
+
+    lines = []
+    for index, item in enumerate(results, 1):
+        line = f"{index}. {item['date']}：宜 {'、'.join(item['yi'])}；忌 {'、'.join(item['ji']) or '無'}"
+        if item.get("chong"):
+            line += f"；沖{item['chong']}"
+        if item.get("sha"):
+            line += f"；煞{item['sha']}"
+        lines.append(line)
+
+    system_prompt = prompts.render(
+        "auspicious.narrate",
+        (tone,),
+        user=f"""查詢分類：{category_name}
+使用者生肖：{zodiac or '未提供'}
+
+候選日期：
+{chr(10).join(lines)}""",
+    )
+    return GPTClient().ask(
+        system_prompt=system_prompt,
+        user_prompt=f"請說明這些適合「{category_name}」的日期。",
+        temperature=0.7,
+        max_tokens=500,
+        site="summary",
+    )
+
+
+def handle_search():
+    """在日期範圍內搜尋最適合指定分類的吉日"""
+    from auspicious.modules.calendar_db import get_calendar_db
+    from auspicious.modules.calendar_index import ZODIAC_CHARS
+    from auspicious.modules.date_search import (
+        default_range,
+        normalize_zodiac,
+        parse_date,
+        search_best_dates,
+    )
+
+    data = request.get_json() or {}
+    category = data.get("category")
+    if category not in CATEGORIES:
+        return (
+            jsonify({"error": "無效的分類", "categories": list(CATEGORIES.keys())}),
+            400,
+        )
+
+    # 無法辨識的生肖不能靜默忽略（否則搜尋結果不會排除沖到生肖的日子）
+    zodiac = normalize_zodiac(data.get("zodiac"))
+    if data.get("zodiac") and zodiac is None:
+        return jsonify({"error": "無效的生肖", "zodiacs": list(ZODIAC_CHARS)}), 400
+
+    try:
+        start, end = default_range()
+        if data.get("start_date"):
+            start = parse_date(data["start_date"])
+        if data.get("end_date"):
+            end = parse_date(data["end_date"])
+        top_k = max(1, min(int(data.get("top_k", 5)), 10))
+        search = search_best_dates(
+            get_calendar_db(),
+            CATEGORIES[category]["activities"],
+            start,
+            end,
+            zodiac=zodiac,
+            top_k=top_k,
+        )
+    except ValueError as e:
+        return jsonify({"error": f"參數錯誤：{e}"}), 400
+
+    category_name = CATEGORIES[category]["name"]
+    response_data = {
+        "category": category,
+        "category_name": category_name,
+        "zodiac": zodiac,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        **search,
+    }
+
+    # 只有需要時才請 AI 說明最終候選名單
+    if data.get("narrate") and search["results"]:
+        try:
+            response_data["narration"] = narrate_search_results(
+                category_name, zodiac, search["results"], data.get("tone", "friendly")
+            )
+        except LLMOverloadedError:
+            # 搜尋結果不需要 AI，名額不足時只略過說明
+            logger.info("吉日說明名額不足，略過", extra=sampled())
+            response_data["narration"] = None
+        except Exception as e:
+            logger.error("吉日說明生成錯誤: %s", e)
+            response_data["narration"] = None
+
+    return jsonify(response_data)
+
+
+# ========== 吉日搜尋路由 ==========
+
+
+@auspicious_bp.route("/search", methods=["POST"])
+def search_dates():
+    return handle_search()
+
+
 # ========== 免費版路由 ==========
 
 
@@ -4,9 +4,116 @@
 """
 
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from shared.admission import LLMOverloadedError
 from shared.gpt_client import GPTClient
-from shared.rule_loader import load_global_rules
+from shared.interpretation_cache import NAME_SLOT, render_name
+from shared.logger import get_logger, sampled
+from shared.rule_loader import load_global_rules, REFUSAL_MESSAGE
+from shared.prompt_builder import SystemPrompt
+from shared.prompt_templates import get_prompt_registry
+from .modules import variants
+
+logger = get_logger(__name__)
+
+
+# ========== 提示詞段落（靜態段落在前，方便命中供應商的 prompt 快取） ==========
+
+SAFETY_TASK_PROMPT = """你是一個內容審核助手，你的唯一任務是判斷用戶的問題是否違反上述全域規則中的【內容限制】。
+
+判斷標準：
+1. 問題是否包含「投資、股票、期貨、虛擬貨幣、彩券、賭博」等關鍵詞？
+2. 問題是否試圖尋求「保證獲利」或「發財」的指引？
+
+---
+
+輸出格式：
+- 如果問題**違反**了規則，你必須直接回傳規則中指定的**固定拒絕訊息**（即「本平台不提供投資...」那段話）。不要添加任何前言或後語。
+- 如果問題是**安全**的，請只回傳 "SAFE"。
+
+不要解釋你的判斷，只回傳 "SAFE" 或 拒絕訊息。"""
+
+# 解讀要求（NAME_SLOT 由系統替換成信眾的名字）
+_NAME_SLOT_RULE = f"**請以「{NAME_SLOT}」稱呼信眾（原樣保留這個佔位符，系統會替換成信眾的名字），嚴禁使用「信眾」、「使用者」、「你」等泛稱。**"
+
+SINGLE_TASK_PROMPT = f"""請根據下方的擲筊結果，為信眾解讀神意。
+
+請用符合你身份的語氣進行解讀，內容適用於任何問題（不要假設信眾問了什麼）。
+
+請直接以神明的口吻回答，不要有「我是AI」等出戲的語句。
+請使用現代白話文，語氣親切自然，不要使用「吾」、「汝」等文言文，但要保持神明的威嚴或慈悲感。
+{_NAME_SLOT_RULE}
+回答長度約 150-200 字。"""
+
+THREE_CAST_TASK_PROMPT = f"""請根據下方三次擲筊的基礎解讀，用你的語氣重新詮釋，內容適用於任何問題（不要假設信眾問了什麼）。
+
+此外，請特別加入一段【行動建議】，給予信眾可行的方向或需要注意的事項，幫助信眾更順利地解決問題。
+
+請使用現代白話文，語氣親切自然，不要使用「吾」、「汝」等文言文，但要保持神明應有的威嚴或慈悲感。
+{_NAME_SLOT_RULE}
+回答長度約 150-200 字。"""
+
+FOLLOW_UP_TASK_PROMPT = """請根據神明的身份和之前的擲筊結果，回答信眾的新問題。
+回答應具有指引性、慈悲心或威嚴感（視神明身份而定）。
+
+請使用現代白話文，語氣親切自然，不要使用「吾」、「汝」等文言文。
+**請務必使用信眾的名字來稱呼對方，嚴禁使用「信眾」、「使用者」、「你」等泛稱。**
+回答長度約 100-150 字。"""
+
+PERSONALIZE_TASK_PROMPT = """你剛剛對擲筊結果做了下方的解讀。
+請接著這段解讀，針對信眾的問題補充一段具體的指引，
+說明上述神意在這個問題上代表什麼、可以怎麼做。不要重複解讀的內容。
+
+請使用現代白話文，不要使用「吾」、「汝」等文言文。
+**請使用信眾的名字來稱呼對方，嚴禁使用「信眾」、「使用者」、「你」等泛稱。**
+回答長度約 60-100 字。"""
+
+
+def deity_tone_segment(tone_config: Dict[str, str]) -> str:
+    """神明語氣段落（同一位神明的請求內容相同）"""
+    return f"""你現在扮演 {tone_config["name"]}。
+你的語氣風格是：{tone_config["style"]}。
+你的關鍵詞是：{tone_config["keywords"]}。
+你的說話範例：{tone_config["example"]}。"""
+
+
+def tone_key(tone_config: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """語氣設定轉成可雜湊的範本鍵"""
+    return tuple(sorted(tone_config.items()))
+
+
+prompts = get_prompt_registry()
+
+
+@prompts.template("divination.safety")
+def build_safety_prompt() -> SystemPrompt:
+    return SystemPrompt(rules=load_global_rules(), task=SAFETY_TASK_PROMPT)
+
+
+@prompts.template("divination.single")
+def build_single_prompt(result: str, tone: Tuple[Tuple[str, str], ...]) -> SystemPrompt:
+    """單次擲筊變體的完整 system prompt（結果與語氣都是固定選項）"""
+    return SystemPrompt(
+        rules=load_global_rules(),
+        task=SINGLE_TASK_PROMPT,
+        tone=deity_tone_segment(dict(tone)),
+        reference=f"擲筊結果：{variants.RESULT_MEANINGS[result]}",
+    )
+
+
+def _deity_template(task: str):
+    def build(tone: Tuple[Tuple[str, str], ...]) -> SystemPrompt:
+        return SystemPrompt(
+            rules=load_global_rules(), task=task, tone=deity_tone_segment(dict(tone))
+        )
+
+    return build
+
+
+# 基礎解讀、對話內容等於請求時接在前綴之後
+prompts.register("divination.three_cast", _deity_template(THREE_CAST_TASK_PROMPT))
+prompts.register("divination.follow_up", _deity_template(FOLLOW_UP_TASK_PROMPT))
+prompts.register("divination.personalize", _deity_template(PERSONALIZE_TASK_PROMPT))
 
 
 class DivinationState(Enum):
@@ -61,38 +168,21 @@ class DivinationAgent:
         如果安全，返回 None
         如果不安全，返回拒絕訊息
         """
-        # 載入全域規則
-        global_rules = load_global_rules()
-
-        system_prompt = f"""你是一個內容審核助手，你的唯一任務是判斷用戶的問題是否違反【內容限制】。
-
-請嚴格遵守以下規則：
-
-{global_rules}
-
-判斷標準：
-1. 問題是否包含「投資、股票、期貨、虛擬貨幣、彩券、賭博」等關鍵詞？
-2. 問題是否試圖尋求「保證獲利」或「發財」的指引？
-
----
-
-輸出格式：
-- 如果問題**違反**了規則，你必須直接回傳規則中指定的**固定拒絕訊息**（即「本平台不提供投資...」那段話）。不要添加任何前言或後語。
-- 如果問題是**安全**的，請只回傳 "SAFE"。
-
-不要解釋你的判斷，只回傳 "SAFE" 或 拒絕訊息。"""
+        system_prompt = prompts.render("divination.safety")
 
         user_prompt = f"用戶問題：{question}"
 
         # 使用低 temperature 以確保一致性
         try:
-            response = self.gpt_client.ask(system_prompt, user_prompt, temperature=0.0)
+            response = self.gpt_client.ask(
+                system_prompt, user_prompt, temperature=0.0, site="safety"
+            )
 
             if "SAFE" in response:
                 return None
             return response
         except Exception as e:
-            print(f"Safety check failed: {e}")
+            logger.warning("Safety check failed: %s", e)
             # 如果檢查失敗，默認放行，或者你可以選擇拒絕
             return None
 
@@ -141,9 +231,10 @@ class DivinationAgent:
                 response_format={"type": "json_object"},
                 temperature=0.3,
                 max_tokens=500,
+                site="extract",
             )
 
-            print(f"[DEBUG] GPT Response: {response}")
+            logger.debug("GPT Response: %d chars", len(response))
 
             import json
 
@@ -155,67 +246,36 @@ class DivinationAgent:
                 "birthdate": result.get("birthdate"),
             }
 
-            print(f"[DEBUG] Extracted: {extracted}")
+            logger.debug("Extracted fields: %s", sorted(key for key, value in extracted.items() if value))
             return extracted
 
+        except LLMOverloadedError:
+            # 負載過高不是輸入不完整，交給呼叫端回覆模板
+            raise
         except Exception as e:
-            print(f"提取基本資訊失敗: {e}")
-            import traceback
-
-            traceback.print_exc()
+            logger.exception("提取基本資訊失敗: %s", e)
             return {"name": None, "gender": None, "birthdate": None}
 
-    def generate_interpretation(
-        self, tone_config: Dict[str, str], user_name: str, question: str, result: str
-    ) -> str:
-        """
-        生成擲筊解讀（付費版）
-
-        Args:
-            tone_config: 語氣配置
-            user_name: 用戶姓名
-            question: 用戶問題
-            result: 擲筊結果 (holy, laughing, negative)
-
-        Returns:
-            生成的解讀文本
-        """
-        result_meaning = {
-            "holy": "聖筊（肯定、允許、順勢）",
-            "laughing": "笑筊（暫不回答、調整、時機未到）",
-            "negative": "陰筊（否定、提醒、改變方向）",
-        }
-
-        system_prompt = f"""你現在扮演 {tone_config["name"]}。
-你的語氣風格是：{tone_config["style"]}。
-你的關鍵詞是：{tone_config["keywords"]}。
-你的說話範例：{tone_config["example"]}。
-
-請根據擲筊結果，為信眾 {user_name} 解讀神意。
-
-擲筊結果：{result_meaning[result]}
-信眾問題：{question}
-
-請用符合你身份的語氣進行解讀。
-
-請直接以神明的口吻回答，不要有「我是AI」等出戲的語句。
-請使用現代白話文，語氣親切自然，不要使用「吾」、「汝」等文言文，但要保持神明的威嚴或慈悲感。
-**請務必使用信眾的名字「{user_name}」來稱呼對方，嚴禁使用「信眾」、「使用者」、「你」等泛稱。**
-回答長度約 150-200 字。
+    def single_variant_job(
+        self, tone_config: Dict[str, str], result: str
+    ) -> Tuple[str, Callable[[], str]]:
+        """單次擲筊基礎解讀變體的 (快取鍵, 生成函數)"""
+        result_meaning = variants.RESULT_MEANINGS[result]
 
-{load_global_rules()}"""
-
-        try:
-            response = self.gpt_client.ask(
+        def generate() -> str:
+            system_prompt = prompts.render(
+                "divination.single", (result, tone_key(tone_config))
+            )
+            return self.gpt_client.ask(
                 system_prompt=system_prompt,
-                user_prompt=f"請為 {user_name} 解讀這個擲筊結果。",
+                user_prompt="請解讀這個擲筊結果。",
                 temperature=0.7,
                 max_tokens=500,
+                site="reading",
             )
-            return response
-        except Exception as e:
-            print(f"生成解讀失敗: {e}")
-            return "我此刻感應微弱，請稍後再試。"
+
+        key = variants.variant_key("single", result, tone_config, result_meaning)
+        return key, generate
 
     def generate_followup_response(
         self,
@@ -235,6 +295,9 @@ class DivinationAgent:
 
         Returns:
             生成的回應
+
+        Raises:
+            LLMOverloadedError: 負載過高（由呼叫端回覆模板並保持對話狀態）
         """
         # 構建歷史對話文本
         history_text = ""
@@ -242,25 +305,15 @@ class DivinationAgent:
             role = "信眾" if msg["role"] == "user" else "神明"
             history_text += f"{role}: {msg['content']}\n"
 
-        system_prompt = f"""你現在扮演 {tone_config["name"]}。
-你的語氣風格是：{tone_config["style"]}。
-你的關鍵詞是：{tone_config["keywords"]}。
-你的說話範例：{tone_config["example"]}。
-
-你正在與信眾 {user_name} 進行對話。
+        system_prompt = prompts.render(
+            "divination.follow_up",
+            (tone_key(tone_config),),
+            user=f"""你正在與信眾 {user_name} 進行對話，請使用信眾的名字「{user_name}」稱呼對方。
 之前的對話記錄：
 {history_text}
 
-信眾的新問題：{question}
-
-請根據神明的身份和之前的擲筊結果，回答信眾的問題。
-回答應具有指引性、慈悲心或威嚴感（視神明身份而定）。
-
-請使用現代白話文，語氣親切自然，不要使用「吾」、「汝」等文言文。
-**請務必使用信眾的名字「{user_name}」來稱呼對方，嚴禁使用「信眾」、「使用者」、「你」等泛稱。**
-回答長度約 100-150 字。
-
-{load_global_rules()}"""
+信眾的新問題：{question}""",
+        )
 
         try:
             response = self.gpt_client.ask(
@@ -268,13 +321,16 @@ class DivinationAgent:
                 user_prompt=f"請回答 {user_name} 的問題。",
                 temperature=0.7,
                 max_tokens=300,
+                site="follow_up",
             )
             return response
+        except LLMOverloadedError:
+            raise
         except Exception as e:
-            print(f"生成回應失敗: {e}")
+            logger.error("生成回應失敗: %s", e)
             return "我此刻感應微弱，請稍後再試。"
 
-    def generate_three_cast_interpretation(
+    def interpret_three_cast(
         self,
         tone_config: Dict[str, str],
         user_name: str,
@@ -282,9 +338,13 @@ class DivinationAgent:
         results: List[str],
         combination_type: str,
         base_interpretation: str,
-    ) -> str:
+    ) -> Dict[str, Optional[str]]:
         """
-        生成三次擲筊的綜合解讀（付費版）
+        審核問題並生成三次擲筊的綜合解讀（付費版）
+
+        神明語氣的解讀取自變體庫（依組合與神明語氣預先生成），
+        再以單次結構化呼叫同時審核問題並加上融入問題的個人化段落；
+        高負載時該次呼叫只審核、不生成個人化段落
 
         Args:
             tone_config: 語氣配置
@@ -295,41 +355,122 @@ class DivinationAgent:
             base_interpretation: 基礎解讀文本
 
         Returns:
-            生成的解讀文本
+            {"refusal_text": 違規時的固定回應或 None, "interpretation": 解讀文本}
         """
-        # 結果中文映射
-        result_mapping = {"holy": "聖筊", "laughing": "笑筊", "negative": "陰筊"}
-        results_chinese = [result_mapping[r] for r in results]
-
-        system_prompt = f"""你現在扮演 {tone_config["name"]}。
-你的語氣風格是：{tone_config["style"]}。
-你的關鍵詞是：{tone_config["keywords"]}。
-你的說話範例：{tone_config["example"]}。
-
-擲筊三次的結果：第一次 {results_chinese[0]}、第二次 {results_chinese[1]}、第三次 {results_chinese[2]}
+        key, generate = self.three_cast_variant_job(
+            tone_config, combination_type, base_interpretation
+        )
+        try:
+            base = variants.get_base_variant(key, generate)
+        except LLMOverloadedError:
+            logger.info("三次擲筊變體名額不足，使用基礎解讀", extra=sampled())
+            base = base_interpretation
+        except Exception as e:
+            logger.error("生成三次擲筊解讀失敗: %s", e)
+            base = base_interpretation  # 如果 AI 失敗，使用基礎解讀
+
+        results_chinese = "、".join(variants.RESULT_NAMES[r] for r in results)
+        return self._guarded_reading(
+            tone_config,
+            base,
+            user_name,
+            question,
+            f"三次擲筊依序為 {results_chinese}",
+        )
+
+    def three_cast_variant_job(
+        self,
+        tone_config: Dict[str, str],
+        combination_type: str,
+        base_interpretation: str,
+    ) -> Tuple[str, Callable[[], str]]:
+        """三次擲筊解讀變體的 (快取鍵, 生成函數)"""
+        results_chinese = "、".join(
+            variants.RESULT_NAMES[r]
+            for r in variants.COMBINATION_RESULTS.get(combination_type, [])
+        )
+
+        def generate() -> str:
+            system_prompt = prompts.render(
+                "divination.three_cast",
+                (tone_key(tone_config),),
+                reference=f"""擲筊三次的結果：{results_chinese}
 組合類型：{combination_type}
 
 基礎解讀：
-{base_interpretation}
+{base_interpretation}""",
+            )
+            return self.gpt_client.ask(
+                system_prompt=system_prompt,
+                user_prompt="請解讀這三次擲筊的結果。",
+                temperature=0.7,
+                max_tokens=500,
+                site="reading",
+            )
 
-請根據以上基礎解讀，用你的語氣重新詮釋，並結合信眾 {user_name} 的問題「{question}」給予更具體的指引。
+        key = variants.variant_key(
+            "three_cast", combination_type, tone_config, base_interpretation
+        )
+        return key, generate
 
-此外，請特別加入一段【行動建議】，給予信眾可行的方向或需要注意的事項，幫助信眾更順利地解決問題。
-
-請使用現代白話文，語氣親切自然，不要使用「吾」、「汝」等文言文，但要保持神明應有的威嚴或慈悲感。
-**請務必使用信眾的名字「{user_name}」來稱呼對方，嚴禁使用「信眾」、「使用者」、「你」等泛稱。**
-回答長度約 150-200 字。
+    def _guarded_reading(
+        self,
+        tone_config: Dict[str, str],
+        base: str,
+        user_name: str,
+        question: str,
+        cast_detail: str,
+    ) -> Dict[str, Optional[str]]:
+        """
+        以單次結構化呼叫審核問題，並在變體後加上融入問題的個人化段落
 
-{load_global_rules()}"""
+        高負載時只審核、不生成個人化段落；呼叫失敗時與過去的安全檢查一樣預設放行
 
-        try:
-            response = self.gpt_client.ask(
-                system_prompt=system_prompt,
-                user_prompt=f"請為 {user_name} 解讀這三次擲筊的結果。",
+        Returns:
+            {"refusal_text": 違規時的固定回應或 None, "interpretation": 解讀文本}
+        """
+        text = render_name(base, user_name)
+        system_prompt = prompts.render(
+            "divination.personalize",
+            (tone_key(tone_config),),
+            user=f"""擲筊結果：{cast_detail}
+
+你剛剛的解讀：
+{text}
+
+信眾的名字：{user_name}""",
+        )
+
+        def guard(personalize: bool) -> Dict[str, str]:
+            return self.gpt_client.guarded(
+                system_prompt,
+                f"信眾問題：{question}",
                 temperature=0.7,
-                max_tokens=500,
+                max_tokens=300 if personalize else 120,
+                include_answer=personalize,
+                default_refusal=REFUSAL_MESSAGE,
+                site="reading" if personalize else "safety",
             )
-            return response
-        except Exception as e:
-            print(f"生成三次擲筊解讀失敗: {e}")
-            return base_interpretation  # 如果 AI 失敗，返回基礎解讀
+
+        with variants.personalization_slot() as personalize:
+            try:
+                try:
+                    guarded = guard(personalize)
+                except LLMOverloadedError:
+                    if not personalize:
+                        raise
+                    # 名額不足時不能略過審核：改為只審核（safety 呼叫點不經准入控制）
+                    logger.info("個人化呼叫名額不足，改為只審核", extra=sampled())
+                    personalize = False
+                    guarded = guard(personalize)
+            except Exception as e:
+                logger.warning("審核與個人化呼叫失敗，只回傳基礎解讀: %s", e)
+                return {"refusal_text": None, "interpretation": text}
+
+        if guarded["verdict"] == "refuse":
+            return {"refusal_text": guarded["refusal_text"], "interpretation": None}
+        personal = guarded["answer"] if personalize else ""
+        return {
+            "refusal_text": None,
+            "interpretation": f"{text}\n\n{personal}" if personal else text,
+        }
@@ -1,16 +1,23 @@
 import os
 from typing import Dict, Any, Optional
 from shared.supabase_client import get_supabase_client
+from shared.logger import get_logger
+from shared.reference_snapshot import get_reference_store
+from shared.tracing import traced
+
+logger = get_logger(__name__)
 
 
 class DivinationDB:
     def __init__(self):
         self.supabase = get_supabase_client()
+        self.reference = get_reference_store()
         self.results_table = os.environ.get("SUPABASE_TABLE_1", "divination_results")
         self.combinations_table = os.environ.get(
             "SUPABASE_TABLE_2", "divination_combinations"
         )
 
+    @traced("db.divination.get_result", "db", lambda self, *a, **k: {"table": self.results_table})
     def get_divination_result(self, result_key: str) -> Optional[Dict[str, Any]]:
         """
         從資料庫獲取單次擲筊結果（聖筊/笑筊/陰筊）
@@ -18,6 +25,9 @@ class DivinationDB:
         Args:
             result_key: 'holy', 'laughing', 'negative'
         """
+        row = self.reference.get_row(self.results_table, "result_key", result_key)
+        if row is not None:
+            return row
         try:
             response = (
                 self.supabase.table(self.results_table)
@@ -30,9 +40,10 @@ class DivinationDB:
                 return response.data[0]
             return None
         except Exception as e:
-            print(f"Error fetching divination result for {result_key}: {e}")
+            logger.error("Error fetching divination result for %s: %s", result_key, e)
             return None
 
+    @traced("db.divination.get_combination", "db", lambda self, *a, **k: {"table": self.combinations_table})
     def get_combination_interpretation(
         self, combination_key: str
     ) -> Optional[Dict[str, Any]]:
@@ -42,6 +53,11 @@ class DivinationDB:
         Args:
             combination_key: e.g. 'holy_holy_holy'
         """
+        row = self.reference.get_row(
+            self.combinations_table, "combination_key", combination_key
+        )
+        if row is not None:
+            return row
         try:
             response = (
                 self.supabase.table(self.combinations_table)
@@ -54,7 +70,7 @@ class DivinationDB:
                 return response.data[0]
             return None
         except Exception as e:
-            print(
-                f"Error fetching combination interpretation for {combination_key}: {e}"
+            logger.error(
+                "Error fetching combination interpretation for %s: %s", combination_key, e
             )
             return None
@@ -0,0 +1,186 @@
+"""
+擲筊解讀變體庫
+影響解讀內容的輸入大多是離散的：三次擲筊共 10 種組合、單次擲筊 3 種結果、固定的神明語氣，
+只有信眾的問題每次不同。因此：
+
+- 每個 (組合/結果, 神明語氣) 預先生成數個不含姓名與問題的「基礎解讀」變體，
+  存放在共享的解讀快取（本機 + Redis），姓名以 NAME_SLOT 佔位
+- 回應時再以一次簡短的 LLM 呼叫審核問題並把問題融入（個人化段落）
+- 同時進行的個人化呼叫達到上限（高負載）時略過個人化段落，該次呼叫只審核問題
+
+預先生成所有變體（部署後或全域規則更新後執行）：
+    python -m divination.modules.variants warm
+    python -m divination.modules.variants warm --tones guan_gong mazu --kinds three_cast
+"""
+
+import argparse
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from shared.interpretation_cache import NAME_SLOT, get_interpretation_cache
+from shared.logger import get_logger, sampled
+from shared.refresh_cache import content_hash
+from shared.rule_loader import get_global_rules_hash
+
+logger = get_logger(__name__)
+
+# 提示詞內容有意變更時調整，舊的變體就不再使用
+VARIANT_PROMPT_REVISION = 2
+
+# 個人化設定
+PERSONALIZE_ENABLED = os.getenv("DIVINATION_PERSONALIZE", "true").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+PERSONALIZE_MAX_INFLIGHT = int(os.getenv("DIVINATION_PERSONALIZE_MAX_INFLIGHT", 4))
+
+# 擲筊結果
+RESULT_NAMES = {"holy": "聖筊", "laughing": "笑筊", "negative": "陰筊"}
+RESULT_MEANINGS = {
+    "holy": "聖筊（肯定、允許、順勢）",
+    "laughing": "笑筊（暫不回答、調整、時機未到）",
+    "negative": "陰筊（否定、提醒、改變方向）",
+}
+
+# 三次擲筊的 10 種組合（與 divination_api.determine_combination_type 一致）
+COMBINATION_RESULTS = {
+    "holy_holy_holy": ["holy", "holy", "holy"],
+    "negative_negative_negative": ["negative", "negative", "negative"],
+    "laughing_laughing_laughing": ["laughing", "laughing", "laughing"],
+    "holy_holy_negative": ["holy", "holy", "negative"],
+    "holy_holy_laughing": ["holy", "holy", "laughing"],
+    "negative_negative_holy": ["negative", "negative", "holy"],
+    "negative_negative_laughing": ["negative", "negative", "laughing"],
+    "laughing_laughing_holy": ["laughing", "laughing", "holy"],
+    "laughing_laughing_negative": ["laughing", "laughing", "negative"],
+    "mixed_all_three": ["holy", "negative", "laughing"],
+}
+
+_cache = get_interpretation_cache("divination")
+_personalize_slots = threading.BoundedSemaphore(max(1, PERSONALIZE_MAX_INFLIGHT))
+
+
+def has_name_slot(text: str) -> bool:
+    return NAME_SLOT in text
+
+
+def variant_key(kind: str, subject: str, tone_config: Dict[str, str], base_text: str) -> str:
+    """
+    基礎解讀變體的快取鍵
+
+    Args:
+        kind: "three_cast" 或 "single"
+        subject: 組合類型或單次結果
+        tone_config: 神明語氣設定（內容變更時自動換鍵）
+        base_text: 資料庫中的基礎解讀文字（內容變更時自動換鍵）
+    """
+    return _cache.make_key(
+        revision=VARIANT_PROMPT_REVISION,
+        kind=kind,
+        subject=subject,
+        tone=content_hash(tone_config),
+        base=content_hash(base_text),
+        rules=get_global_rules_hash(),
+    )
+
+
+def get_base_variant(key: str, generate: Callable[[], str]) -> str:
+    """取得一個基礎解讀變體（沒有時生成；只保存保留了姓名佔位符的結果）"""
+    return _cache.get_or_generate(key, generate, validate=has_name_slot)
+
+
+def add_variant(key: str, text: str):
+    """加入預先生成的變體"""
+    _cache.add_variant(key, text, validate=has_name_slot)
+
+
+def variant_count(key: str) -> int:
+    return len(_cache.get_variants(key))
+
+
+@contextmanager
+def personalization_slot():
+    """
+    個人化呼叫的名額
+
+    停用個人化或同時進行的呼叫已達上限（高負載）時 yield False，
+    呼叫端應改為只審核問題、不生成個人化段落
+    """
+    if not PERSONALIZE_ENABLED:
+        yield False
+        return
+    if not _personalize_slots.acquire(blocking=False):
+        logger.info("個人化呼叫已達上限，略過個人化段落", extra=sampled())
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        _personalize_slots.release()
+
+
+# ---------- 預先生成 ----------
+
+
+def warm(tones: Optional[List[str]] = None, kinds: Optional[List[str]] = None) -> int:
+    """
+    為每個 (組合/結果, 神明語氣) 補齊變體
+
+    Returns:
+        新生成的變體數
+    """
+    from divination.agent import DivinationAgent
+    from divination_api import PAID_TONE_PROMPTS, get_combination_base_text
+
+    agent = DivinationAgent()
+    kinds = kinds or ["three_cast", "single"]
+    tone_keys = tones or list(PAID_TONE_PROMPTS)
+    generated = 0
+
+    for tone in tone_keys:
+        tone_config = PAID_TONE_PROMPTS[tone]
+        jobs = []
+        if "three_cast" in kinds:
+            for combination_type in COMBINATION_RESULTS:
+                jobs.append(
+                    agent.three_cast_variant_job(
+                        tone_config, combination_type, get_combination_base_text(combination_type)
+                    )
+                )
+        if "single" in kinds:
+            for result in RESULT_MEANINGS:
+                jobs.append(agent.single_variant_job(tone_config, result))
+
+        for key, generate in jobs:
+            attempts = 0
+            while variant_count(key) < _cache.variants and attempts < _cache.variants * 2:
+                attempts += 1
+                before = variant_count(key)
+                add_variant(key, generate())
+                # 缺少名字欄位（被驗證拒絕）或與既有變體重複時不計入
+                if variant_count(key) > before:
+                    generated += 1
+        logger.info("%s 的變體已補齊", tone)
+    return generated
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="擲筊解讀變體庫")
+    parser.add_argument("command", choices=["warm"])
+    parser.add_argument("--tones", nargs="*", help="只處理指定的神明語氣（預設全部）")
+    parser.add_argument(
+        "--kinds", nargs="*", choices=["three_cast", "single"], help="只處理指定的類型"
+    )
+    args = parser.parse_args(argv)
+
+    generated = warm(args.tones, args.kinds)
+    print(f"共生成 {generated} 個變體")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,10 @@ import uuid
 from divination.agent import DivinationSession, DivinationAgent, DivinationState
 from divination.session_store import get_session_store
 from divination.modules.db import DivinationDB
+from jobs_api import job_mode
+from shared.admission import LLMOverloadedError, overloaded_response
+from shared.logger import get_logger
+from shared.request_context import bind_session
 
 
 # ========== 語氣模板配置 ==========
@@ -164,6 +168,8 @@ PAID_TONE_PROMPTS = {
 # 創建 Blueprint
 divination_bp = Blueprint("divination", __name__, url_prefix="/divination")
 
+logger = get_logger(__name__)
+
 # 未選擇語氣的提示
 NO_TONE_MESSAGE = """小提醒 🌟：請先選擇您想要的對話語氣，
 這樣我才能用最適合的方式替您擲筊並解讀指引 💫
@@ -227,10 +233,39 @@ def determine_combination_type(results):
     return "mixed_all_three"
 
 
+# 三次擲筊組合的備用解讀（資料庫無資料時使用）
+COMBINATION_FALLBACKS = {
+    "holy_holy_holy": "連三聖筊，大吉大利，神意完全認同，所求必應，萬事亨通。",
+    "negative_negative_negative": "連三陰筊，時機未到或方法錯誤，神明不認同，建議暫緩或改變方向。",
+    "laughing_laughing_laughing": "連三笑筊，情況未明或心意不定，神明笑而不答，請釐清問題後再問。",
+    "holy_holy_negative": "兩聖一陰，大致順利但仍有變數，需謹慎執行。",
+    "holy_holy_laughing": "兩聖一笑，方向正確但有些細節不需太執著，放鬆心情。",
+    "negative_negative_holy": "兩陰一聖，雖有阻礙但轉機已現，堅持正道可獲神助。",
+    "negative_negative_laughing": "兩陰一笑，此路不通且無需再問，應徹底反省或改變計畫。",
+    "laughing_laughing_holy": "兩笑一聖，事情還在變化中，但最終結果是好的，保持信心。",
+    "laughing_laughing_negative": "兩笑一陰，目前混沌不明且結果可能不佳，不建議冒進。",
+    "mixed_all_three": "聖陰笑各一，情況複雜，好壞參半，需智慧判斷，步步為營。",
+}
+
+
+def get_combination_base_text(combination_type: str) -> str:
+    """取得三次擲筊組合的基礎解讀（優先使用資料庫，無資料時使用備用解讀）"""
+    combination_data = DivinationDB().get_combination_interpretation(combination_type)
+    if combination_data:
+        return combination_data.get("interpretation_text", "")
+
+    logger.warning("Interpretation for %s not found in DB.", combination_type)
+    return COMBINATION_FALLBACKS.get(
+        combination_type, "神意深奧，請依直覺行事。（無法讀取詳細解讀）"
+    )
+
+
 def get_session_by_id(version: str, session_id: str):
     """根據 session_id 從 Redis 獲取會話"""
     session_store = get_session_store()
-    return session_store.load_session(version, session_id)
+    div_session = session_store.load_session(version, session_id)
+    bind_session(div_session)
+    return div_session
 
 
 def save_and_return(
@@ -291,6 +326,7 @@ def handle_init_with_tone(version: str):
     return save_and_return(version, session_id, div_session, response_data)
 
 
+@job_mode("divination")
 def handle_chat(version: str):
     """處理對話互動"""
     data = request.get_json()
@@ -301,10 +337,8 @@ def handle_chat(version: str):
     if not session_id:
         return jsonify({"error": "缺少 session_id"}), 400
 
-    # DEBUG: 打印前端傳入的完整資料
-    print(
-        f"[Divination Debug] Version: {version}, Session: {session_id}, Payload: {data}"
-    )
+    # DEBUG: 記錄前端傳入的欄位（不含內容）
+    logger.debug("Version: %s, Session: %s, Payload keys: %s", version, session_id, sorted(data))
 
     # 載入會話
     div_session = get_session_by_id(version, session_id)
@@ -314,11 +348,16 @@ def handle_chat(version: str):
     # 記錄用戶輸入
     div_session.add_message("user", message)
 
+    loaded_state = div_session.state.value
+
     # 根據當前狀態處理
     if div_session.state == DivinationState.WAITING_BASIC_INFO:
         # 使用 AI 提取基本資訊
         agent = DivinationAgent()
-        extracted = agent.extract_basic_info(message)
+        try:
+            extracted = agent.extract_basic_info(message)
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "divination extract"))
 
         # 驗證是否提取成功
         if extracted["name"] and extracted["gender"] and extracted["birthdate"]:
@@ -366,9 +405,12 @@ def handle_chat(version: str):
         return save_and_return(version, session_id, div_session, response_data)
 
     elif div_session.state == DivinationState.WAITING_QUESTION:
-        # 使用 Agent 檢查敏感內容
-        agent = DivinationAgent()
-        sensitive_msg = agent.check_question_safety(message)
+        # 免費版使用 Agent 檢查敏感內容（結果為固定模板，沒有其他 AI 呼叫可合併）；
+        # 付費版的審核併入擲筊後的解讀呼叫，提問時不需等待
+        sensitive_msg = None
+        if version == "free":
+            agent = DivinationAgent()
+            sensitive_msg = agent.check_question_safety(message)
 
         if sensitive_msg:
             div_session.add_message("assistant", sensitive_msg)
@@ -457,40 +499,14 @@ def handle_chat(version: str):
             # 判斷組合類型
             combination_type = determine_combination_type(results)
 
-            # 取得基礎解讀 (從 Supabase)
-            db = DivinationDB()
-            combination_data = db.get_combination_interpretation(combination_type)
-
-            if combination_data:
-                base_interpretation = combination_data.get("interpretation_text", "")
-            else:
-                # 若資料庫無資料，使用 Fallback 解讀
-                print(
-                    f"Warning: Interpretation for {combination_type} not found in DB."
-                )
-
-                # 硬編碼 Fallback
-                FALLBACK_MAP = {
-                    "holy_holy_holy": "連三聖筊，大吉大利，神意完全認同，所求必應，萬事亨通。",
-                    "negative_negative_negative": "連三陰筊，時機未到或方法錯誤，神明不認同，建議暫緩或改變方向。",
-                    "laughing_laughing_laughing": "連三笑筊，情況未明或心意不定，神明笑而不答，請釐清問題後再問。",
-                    "holy_holy_negative": "兩聖一陰，大致順利但仍有變數，需謹慎執行。",
-                    "holy_holy_laughing": "兩聖一笑，方向正確但有些細節不需太執著，放鬆心情。",
-                    "negative_negative_holy": "兩陰一聖，雖有阻礙但轉機已現，堅持正道可獲神助。",
-                    "negative_negative_laughing": "兩陰一笑，此路不通且無需再問，應徹底反省或改變計畫。",
-                    "laughing_laughing_holy": "兩笑一聖，事情還在變化中，但最終結果是好的，保持信心。",
-                    "laughing_laughing_negative": "兩笑一陰，目前混沌不明且結果可能不佳，不建議冒進。",
-                    "mixed_all_three": "聖陰笑各一，情況複雜，好壞參半，需智慧判斷，步步為營。",
-                }
-                base_interpretation = FALLBACK_MAP.get(
-                    combination_type, "神意深奧，請依直覺行事。（無法讀取詳細解讀）"
-                )
+            # 取得基礎解讀 (從 Supabase，無資料時使用備用解讀)
+            base_interpretation = get_combination_base_text(combination_type)
 
             # 使用 AI 生成解讀
             agent = DivinationAgent()
             tone_config = PAID_TONE_PROMPTS.get(tone, PAID_TONE_PROMPTS["guan_gong"])
 
-            interpretation = agent.generate_three_cast_interpretation(
+            reading = agent.interpret_three_cast(
                 tone_config,
                 name,
                 question,
@@ -499,6 +515,25 @@ def handle_chat(version: str):
                 base_interpretation,
             )
 
+            if reading["refusal_text"]:
+                # 問題違反規則：返回固定回應，請使用者重新提問
+                div_session.question = None
+                div_session.divination_results = []
+                div_session.state = DivinationState.WAITING_QUESTION
+                div_session.add_message("assistant", reading["refusal_text"])
+                return save_and_return(
+                    version,
+                    session_id,
+                    div_session,
+                    {
+                        "session_id": session_id,
+                        "response": reading["refusal_text"],
+                        "state": div_session.state.value,
+                    },
+                )
+
+            interpretation = reading["interpretation"]
+
             # 添加持續提問引導
             ask_question = "\n\n如果有什麼還不清楚的，或是想再深入了解，請繼續提問。我會盡力為你解答。"
             response_text = f"{interpretation}{ask_question}"
@@ -560,12 +595,15 @@ def handle_chat(version: str):
         tone = div_session.tone
         tone_config = PAID_TONE_PROMPTS.get(tone, PAID_TONE_PROMPTS["guan_gong"])
 
-        response_text = agent.generate_followup_response(
-            tone_config,
-            div_session.user_name,
-            message,
-            div_session.conversation_history,
-        )
+        try:
+            response_text = agent.generate_followup_response(
+                tone_config,
+                div_session.user_name,
+                message,
+                div_session.conversation_history,
+            )
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "divination follow_up"))
 
         # 記錄助手回應
         div_session.add_message("assistant", response_text)
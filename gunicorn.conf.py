@@ -0,0 +1,38 @@
+"""
+Gunicorn 設定
+SERVING_MODE 決定 worker 類型：
+
+- gthread（預設）：每個 worker 以 GUNICORN_THREADS 個執行緒處理請求，
+  同時等待 LLM 回應的請求數最多等於執行緒數，其餘請求排隊
+- gevent：每個請求是一個 greenlet，OpenAI、Redis、Supabase 的 socket 等待時會讓出，
+  單一 worker 可同時等待 GUNICORN_WORKER_CONNECTIONS 個請求；
+  handler 與 GPTClient 維持同步寫法，不需改寫成 async
+
+啟動：
+    gunicorn --config gunicorn.conf.py app:app
+"""
+
+import os
+
+SERVING_MODE = os.getenv("SERVING_MODE", "gthread").lower()
+if SERVING_MODE not in ("gthread", "gevent"):
+    raise ValueError(f"未知的 SERVING_MODE: {SERVING_MODE}（可用 gthread / gevent）")
+
+if SERVING_MODE == "gevent":
+    # 必須在 master 載入 ssl、socket 相關模組之前完成 monkey patch
+    from gevent import monkey
+
+    monkey.patch_all()
+
+bind = f":{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+# 卡住的 worker 超過此秒數會被重啟（長篇解讀請改用工作模式，見 jobs_api.py）
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+if SERVING_MODE == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 500))
+else:
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", 8))
@@ -0,0 +1,133 @@
+"""
+背景工作 API Blueprint
+對話端點的工作模式與結果查詢：
+
+- 對話請求帶上 "job_mode": true（或 header Prefer: respond-async）時，立即返回 202 與 job_id，
+  回合在背景 worker 中處理，完成後會話照常寫回 Redis
+- 會話有進行中的工作時，同一會話的同步對話請求也返回 409，避免工作完成後覆寫會話
+- GET /jobs/<job_id>?wait=20 查詢結果，wait 為長輪詢的最長等待秒數（上限 JOB_LONG_POLL_MAX）
+"""
+
+import os
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request
+
+from shared.jobs import FAILED, FINISHED, JobConflictError, JobRejectedError, get_job_manager
+from shared.logger import get_logger
+from shared.request_context import bind_request_context, get_request_context, reset_request_context
+
+# 創建 Blueprint
+jobs_bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+logger = get_logger(__name__)
+
+# 長輪詢的最長等待秒數（需小於前端代理與 Gunicorn 的逾時）
+JOB_LONG_POLL_MAX = float(os.getenv("JOB_LONG_POLL_MAX", 25))
+
+# 工作佇列已滿時建議的重試秒數
+JOB_RETRY_AFTER = 5
+
+
+def wants_job() -> bool:
+    """請求是否要求以背景工作處理"""
+    data = request.get_json(silent=True) or {}
+    return bool(data.get("job_mode")) or "respond-async" in request.headers.get("Prefer", "")
+
+
+def job_mode(kind: str):
+    """
+    讓對話處理函數支援工作模式的裝飾器（未要求工作模式時照常同步處理）
+
+    Args:
+        kind: 工作類型（blueprint 名稱，用於會話鎖與指標）
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(version: str):
+            data = request.get_json(silent=True) or {}
+            session_id = data.get("session_id")
+            if not session_id:
+                return handler(version)
+            owner = f"{kind}:{version}:{session_id}"
+            if not wants_job():
+                try:
+                    active = get_job_manager().active_job(owner)
+                except Exception as e:
+                    # Redis 不可用時沒有進行中的工作可檢查，照常同步處理
+                    logger.warning("檢查會話工作鎖失敗: %s", e)
+                    active = None
+                if active:
+                    return jsonify({"error": "此會話已有處理中的回覆", "job_id": active}), 409
+                return handler(version)
+
+            app = current_app._get_current_object()
+            path, method = request.path, request.method
+            body = {key: value for key, value in data.items() if key != "job_mode"}
+            context = get_request_context()
+
+            def run():
+                token = bind_request_context(**context)
+                try:
+                    with app.test_request_context(path, method=method, json=body):
+                        response = app.make_response(handler(version))
+                        return response.get_json(), response.status_code
+                finally:
+                    reset_request_context(token)
+
+            try:
+                job = get_job_manager().submit(run, owner=owner, kind=kind)
+            except JobRejectedError:
+                response = jsonify({"error": "目前處理中的請求較多，請稍後再試"})
+                response.headers["Retry-After"] = str(JOB_RETRY_AFTER)
+                return response, 503
+            except JobConflictError as e:
+                return jsonify({"error": "此會話已有處理中的回覆", "job_id": e.job_id}), 409
+            except Exception as e:
+                # Redis 不可用時無法保存工作結果，改為同步處理
+                logger.warning("背景工作送出失敗，改為同步處理: %s", e)
+                return handler(version)
+
+            response = jsonify(
+                {
+                    "job_id": job["job_id"],
+                    "status": job["status"],
+                    "session_id": session_id,
+                    "poll_url": f"{jobs_bp.url_prefix}/{job['job_id']}",
+                }
+            )
+            response.headers["Location"] = f"{jobs_bp.url_prefix}/{job['job_id']}"
+            return response, 202
+
+        return wrapper
+
+    return decorator
+
+
+@jobs_bp.route("/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    """查詢工作狀態；完成時附上對話回應（result）與原本的 HTTP 狀態碼（status_code）"""
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0.0), JOB_LONG_POLL_MAX)
+    except ValueError:
+        return jsonify({"error": "wait 必須是數字"}), 400
+
+    try:
+        job = get_job_manager().wait(job_id, timeout=wait)
+    except Exception as e:
+        logger.error("查詢背景工作失敗: %s", e)
+        return jsonify({"error": "工作狀態暫時無法查詢"}), 503
+
+    if job is None:
+        return jsonify({"error": "工作不存在或已過期", "job_id": job_id}), 404
+
+    data = {"job_id": job_id, "status": job["status"]}
+    if job["status"] not in FINISHED:
+        return jsonify(data), 202
+    data["status_code"] = job.get("status_code")
+    if job["status"] == FAILED:
+        data["error"] = job.get("error")
+    else:
+        data["result"] = job.get("result")
+    return jsonify(data), 200
@@ -6,6 +6,10 @@ from typing import Optional, Dict, Any
 from enum import Enum
 
 from .gpt_client import GPTClient
+from shared.admission import LLMOverloadedError
+from shared.logger import get_logger, sampled
+
+logger = get_logger(__name__)
 
 
 class ConversationState(Enum):
@@ -128,7 +132,7 @@ class ConversationSession:
     def clear_memory(self):
         """清空記憶"""
         self.memory.clear()
-        print(f"[記憶系統] 第 {self.conversation_count} 輪對話，記憶已自動清空")
+        logger.debug("[記憶系統] 第 %d 輪對話，記憶已自動清空", self.conversation_count)
 
     def to_dict(self) -> Dict[str, Any]:
         """轉換為字典"""
@@ -210,7 +214,7 @@ class LifeNumberAgent:
                     )
                     return age
         except Exception as e:
-            print(f"[ERROR] 計算年齡失敗: {e}")
+            logger.error("計算年齡失敗: %s", e)
 
         return 25  # 預設年齡
 
@@ -1082,9 +1086,10 @@ class LifeNumberAgent:
                 response_format={"type": "json_object"},
                 temperature=0.3,
                 max_tokens=1000,
+                site="extract",
             )
 
-            print(f"[DEBUG] extract_birthdate_with_ai response: {response}")
+            logger.debug("extract_birthdate_with_ai response: %d chars", len(response))
 
             result = json.loads(response)
             has_birthdate = result.get("has_birthdate", False)
@@ -1115,8 +1120,11 @@ class LifeNumberAgent:
 
             return name, gender, birthdate, english_name, None
 
+        except LLMOverloadedError:
+            # 負載過高不是輸入不完整，交給呼叫端回覆模板
+            raise
         except Exception as e:
-            print(f"Error in extract_birthdate_with_ai: {e}")
+            logger.error("Error in extract_birthdate_with_ai: %s", e)
             return None, None, None, None, "無法解析輸入資訊"
 
     def detect_module_from_purpose(self, purpose: str, name: str) -> tuple[str, str]:
@@ -1156,6 +1164,7 @@ class LifeNumberAgent:
                 response_format={"type": "json_object"},
                 temperature=0.5,
                 max_tokens=1000,
+                site="route",
             )
 
             result = json.loads(response)
@@ -1168,7 +1177,10 @@ class LifeNumberAgent:
 
             return module, reason
         except Exception as e:
-            print(f"Error in detect_module_from_purpose: {e}")
+            if isinstance(e, LLMOverloadedError):
+                logger.info("detect_module_from_purpose 名額不足，使用預設模組", extra=sampled())
+            else:
+                logger.error("Error in detect_module_from_purpose: %s", e)
             # 預設返回核心生命靈數
             return (
                 "core",
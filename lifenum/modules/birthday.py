@@ -1,6 +1,9 @@
 """生日數模組 - 天生才華"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_birthday_prompt(number: int) -> str:
@@ -26,7 +29,7 @@ def get_birthday_prompt(number: int) -> str:
             "- 相關領域/場合的建議（2-4 個）\n"
         )
     except Exception as e:
-        print(f"Error generating birthday prompt: {e}")
+        logger.error("Error generating birthday prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
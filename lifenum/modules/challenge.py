@@ -1,6 +1,9 @@
 """挑戰數模組 - 人生課題與限制"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_challenge_prompt(number: int) -> str:
@@ -27,7 +30,7 @@ def get_challenge_prompt(number: int) -> str:
             "- 成長後的正面轉化方向\n"
         )
     except Exception as e:
-        print(f"Error generating challenge prompt: {e}")
+        logger.error("Error generating challenge prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
@@ -1,6 +1,9 @@
 """核心生命靈數模組 - 性格天賦與人生方向"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_core_prompt(number: int, category: str = None) -> str:
@@ -44,7 +47,7 @@ def get_core_prompt(number: int, category: str = None) -> str:
         return prompt
 
     except Exception as e:
-        print(f"Error generating core prompt: {e}")
+        logger.error("Error generating core prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
@@ -1,137 +1,149 @@
 import os
+from typing import Dict, Iterable
 from shared.supabase_client import get_supabase_client
+from shared.logger import get_logger
+from shared.reference_snapshot import get_reference_store
+from shared.refresh_cache import RefreshingCache
+from shared.tracing import traced
+from ..utils import GRID_LINES
+
+logger = get_logger(__name__)
+
+GRID_LINES_TABLE = "lifenum_grid_lines"
+
+
+def _fetch_grid_line_index() -> Dict[str, dict]:
+    """一次取得全部 8 條九宮格連線（失敗時拋出例外，由快取退避）"""
+    return LifeNumberDB().get_many(
+        GRID_LINES_TABLE, "line_key", GRID_LINES.keys(), raise_errors=True
+    )
+
+
+# 九宮格連線只有 8 筆，整批預載後常駐記憶體
+_grid_line_index = RefreshingCache(
+    "lifenum_grid_lines", _fetch_grid_line_index, ttl=600, refresh_ahead=60
+)
+
+
+def _on_reference_update(store, changed_tables):
+    if GRID_LINES_TABLE in changed_tables:
+        _grid_line_index.invalidate()
+
+
+get_reference_store().add_listener(_on_reference_update)
 
 
 class LifeNumberDB:
     def __init__(self):
         self.supabase = get_supabase_client()
+        self.reference = get_reference_store()
 
-    def get_main_number(self, number: int):
+    @traced("db.lifenum.get_many", "db", lambda self, table, *a, **k: {"table": table})
+    def get_many(
+        self,
+        table: str,
+        column: str,
+        values: Iterable,
+        raise_errors: bool = False,
+    ) -> Dict[str, dict]:
+        """
+        批次查詢多筆資料（本機參考資料找不到的部分以單次 in_ 查詢補齊）
+
+        Args:
+            table: 資料表名稱
+            column: 查詢欄位
+            values: 欄位值列表
+            raise_errors: 查詢失敗時是否拋出例外（預設只記錄並返回已取得的部分）
+
+        Returns:
+            以 str(欄位值) 為鍵的資料字典，找不到的值不會出現在結果中
+        """
+        values = list(dict.fromkeys(values))
+        rows: Dict[str, dict] = {}
+        missing = []
+        for value in values:
+            row = self.reference.get_row(table, column, value)
+            if row is not None:
+                rows[str(value)] = row
+            else:
+                missing.append(value)
+
+        if missing:
+            try:
+                response = (
+                    self.supabase.table(table)
+                    .select("*")
+                    .in_(column, missing)
+                    .execute()
+                )
+                for row in response.data or []:
+                    rows.setdefault(str(row.get(column)), row)
+            except Exception as e:
+                if raise_errors:
+                    raise
+                logger.error("DB Error get_many %s: %s", table, e)
+        return rows
+
+    @traced("db.lifenum.get_grid_lines", "db", lambda self, *a, **k: {"table": GRID_LINES_TABLE})
+    def get_grid_lines(self, line_keys: Iterable[str]) -> Dict[str, dict]:
+        """
+        批次取得九宮格連線資料（使用預載的 8 條連線索引）
+
+        Returns:
+            {line_key: 資料}，找不到的連線不會出現在結果中
+        """
+        line_keys = list(line_keys)
+        index = _grid_line_index.get() or {}
+        result = {key: index[key] for key in line_keys if key in index}
+        missing = [key for key in line_keys if key not in result]
+        if missing:
+            result.update(self.get_many(GRID_LINES_TABLE, "line_key", missing))
+        return result
+
+    @traced("db.lifenum.get_one", "db", lambda self, table, *a, **k: {"table": table})
+    def _get_one(self, table: str, column: str, value, label: str):
+        """查詢單筆資料：優先使用本機參考資料，找不到時才查詢 Supabase"""
+        row = self.reference.get_row(table, column, value)
+        if row is not None:
+            return row
         try:
             response = (
-                self.supabase.table("lifenum_main")
+                self.supabase.table(table)
                 .select("*")
-                .eq("number", number)
+                .eq(column, value)
                 .execute()
             )
             return response.data[0] if response.data else None
         except Exception as e:
-            print(f"DB Error get_main_number: {e}")
+            logger.error("DB Error %s: %s", label, e)
             return None
 
+    def get_main_number(self, number: int):
+        return self._get_one("lifenum_main", "number", number, "get_main_number")
+
     def get_birthday_number(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_birthday")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_birthday_number: {e}")
-            return None
+        return self._get_one("lifenum_birthday", "number", number, "get_birthday_number")
 
     def get_personal_year(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_personal_year")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_personal_year: {e}")
-            return None
+        return self._get_one("lifenum_personal_year", "number", number, "get_personal_year")
 
     def get_grid_line(self, line_key: str):
-        try:
-            response = (
-                self.supabase.table("lifenum_grid_lines")
-                .select("*")
-                .eq("line_key", line_key)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_grid_line: {e}")
-            return None
+        return self._get_one("lifenum_grid_lines", "line_key", line_key, "get_grid_line")
 
     def get_challenge(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_challenge")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_challenge: {e}")
-            return None
+        return self._get_one("lifenum_challenge", "number", number, "get_challenge")
 
     def get_expression(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_expression")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_expression: {e}")
-            return None
+        return self._get_one("lifenum_expression", "number", number, "get_expression")
 
     def get_maturity(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_maturity")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_maturity: {e}")
-            return None
+        return self._get_one("lifenum_maturity", "number", number, "get_maturity")
 
     def get_soul(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_soul")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_soul: {e}")
-            return None
+        return self._get_one("lifenum_soul", "number", number, "get_soul")
 
     def get_personality(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_personality")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_personality: {e}")
-            return None
+        return self._get_one("lifenum_personality", "number", number, "get_personality")
 
     def get_karma(self, number: int):
-        try:
-            response = (
-                self.supabase.table("lifenum_karma")
-                .select("*")
-                .eq("number", number)
-                .execute()
-            )
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"DB Error get_karma: {e}")
-            return None
+        return self._get_one("lifenum_karma", "number", number, "get_karma")
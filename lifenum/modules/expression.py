@@ -1,6 +1,9 @@
 """表達數模組 - 整體表達風格與社交風格"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_expression_prompt(number: int) -> str:
@@ -27,7 +30,7 @@ def get_expression_prompt(number: int) -> str:
             "- 如何將此能力運用在生活中（具體建議）\n"
         )
     except Exception as e:
-        print(f"Error generating expression prompt: {e}")
+        logger.error("Error generating expression prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
@@ -1,5 +1,8 @@
 from .db import LifeNumberDB
 from typing import List
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_grid_prompt(present_lines: List[str], counts: dict) -> str:
@@ -26,8 +29,9 @@ def get_grid_prompt(present_lines: List[str], counts: dict) -> str:
 
         # 1. Fetch Present Lines Info
         prompt += "[您的連線特質]：\n"
+        lines_data = db.get_grid_lines(present_lines)
         for line_key in present_lines:
-            line_data = db.get_grid_line(line_key)
+            line_data = lines_data.get(line_key)
             if line_data:
                 prompt += (
                     f"【{line_key} 連線｜{line_data.get('name')}】\n"
@@ -44,5 +48,5 @@ def get_grid_prompt(present_lines: List[str], counts: dict) -> str:
         return prompt
 
     except Exception as e:
-        print(f"Error generating grid prompt: {e}")
+        logger.error("Error generating grid prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
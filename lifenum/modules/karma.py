@@ -1,6 +1,9 @@
 """業力數模組 - 前世未完成的課題"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_karma_prompt(number: int) -> str:
@@ -39,7 +42,7 @@ def get_karma_prompt(number: int) -> str:
             "- 如何償還或轉化這份業力（具體行動）\n"
         )
     except Exception as e:
-        print(f"Error generating karma prompt: {e}")
+        logger.error("Error generating karma prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
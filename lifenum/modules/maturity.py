@@ -1,6 +1,9 @@
 """成熟數模組 - 人生後半段的方向與潛力"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_maturity_prompt(number: int) -> str:
@@ -26,7 +29,7 @@ def get_maturity_prompt(number: int) -> str:
             "- 給予成熟期的建議（具體行動）\n"
         )
     except Exception as e:
-        print(f"Error generating maturity prompt: {e}")
+        logger.error("Error generating maturity prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
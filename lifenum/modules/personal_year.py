@@ -1,6 +1,9 @@
 """流年數模組 - 年度運勢與重點"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_personal_year_prompt(number: int, year: int = None) -> str:
@@ -35,7 +38,7 @@ def get_personal_year_prompt(number: int, year: int = None) -> str:
             "- 年度口號（激勵用戶）\n"
         )
     except Exception as e:
-        print(f"Error generating personal year prompt: {e}")
+        logger.error("Error generating personal year prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
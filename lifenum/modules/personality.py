@@ -1,4 +1,7 @@
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_personality_prompt(number: int) -> str:
@@ -24,7 +27,7 @@ def get_personality_prompt(number: int) -> str:
             "- 如何善用這個面具來幫助自己（具體建議）\n"
         )
     except Exception as e:
-        print(f"Error generating personality prompt: {e}")
+        logger.error("Error generating personality prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
@@ -1,6 +1,9 @@
 """靈魂數模組 - 內心渴望"""
 
 from .db import LifeNumberDB
+from shared.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_soul_prompt(number: int) -> str:
@@ -26,7 +29,7 @@ def get_soul_prompt(number: int) -> str:
             "- 如何滋養自己的靈魂（具體建議）\n"
         )
     except Exception as e:
-        print(f"Error generating soul prompt: {e}")
+        logger.error("Error generating soul prompt: %s", e)
         return "（系統錯誤：生成提示詞時發生異常）"
 
 
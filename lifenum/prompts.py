@@ -0,0 +1,103 @@
+"""
+生命靈數 Prompt 範本
+語氣設定與解讀的靜態前綴（全域規則 → 內容要求 → 語氣 → 模組參考資料），
+依 (模組, 數字, 類別, 版本, 語氣) 預先編譯；不依賴 Redis，可供離線量測使用
+"""
+
+from typing import Optional
+
+from shared.prompt_builder import SystemPrompt
+from shared.prompt_templates import get_prompt_registry
+from shared.rule_loader import load_global_rules
+
+from .modules.core import get_core_prompt
+from .modules.birthday import get_birthday_prompt
+from .modules.personal_year import get_personal_year_prompt
+from .modules.grid import get_grid_prompt
+from .modules.soul_number import get_soul_prompt
+from .modules.personality import get_personality_prompt
+from .modules.expression import get_expression_prompt
+from .modules.maturity import get_maturity_prompt
+from .modules.challenge import get_challenge_prompt
+from .modules.karma import get_karma_prompt
+
+prompts = get_prompt_registry()
+
+# 免費版語氣提示
+FREE_TONE_PROMPTS = {
+    "friendly": "請使用親切、輕鬆的語氣，像普通朋友聊天一樣，適合日常對話場景。後續稱呼使用「你」或「妳」。",
+    "caring": "請使用貼心、溫暖、關懷的語氣，像家人或閨蜜關心一樣，比親切版更加溫柔體貼，適合需要被理解的人。後續稱呼使用「你」或「妳」。",
+    "ritual": "請使用莊重、神聖、充滿儀式感的語氣，適合需做重大決策的場景。保持正式且尊重的態度，使用「您」、「在下」等文言用詞。",
+}
+
+# 付費版語氣提示
+PAID_TONE_PROMPTS = {
+    "guan_yu": "請使用關聖帝君的莊嚴、正直語氣，帶有沉穩節奏。關鍵語彙：忠義、正道、守信、因果、明辨是非。**嚴格警告：禁止使用任何文言文詞彙（汝、吾、乃、之、於、若、然、故、是以、當、須、方能、焉、矣、已為汝析得、為汝、汝之等），必須100%使用現代中文（你、我、的、在、如果、因此、應該、需要、能夠、已為你分析、為你、你的）。語調莊重威嚴但完全現代化表達。",
+    "michael": "請使用大天使米迦勒的堅定、有領導感語氣，帶安定力量。關鍵語彙：勇氣、信任、光明、防禦、戰士。語調堅定且充滿力量。",
+    "gabriel": "請使用大天使加百列的溫柔中帶清晰指引語氣，像傳信者。關鍵語彙：啟發、信息、真理、溝通、覺醒。語調溫和且具有啟發性。",
+    "raphael": "請使用大天使拉斐爾的柔和、慈悲、安撫人心語氣。關鍵語彙：療癒、平衡、綠光、修復、愛自己。語調溫暖且充滿愛意。",
+    "uriel": "請使用大天使烏列爾的沈穩、智者風格語氣，講話慢而深。關鍵語彙：洞察、智慧、火焰、真理、學習。語調深沈且充滿智慧。",
+    "zadkiel": "請使用大天使沙德基爾的柔中帶慈悲語氣，像引導人放下怨恨的導師。關鍵語彙：寬恕、紫焰、轉化、慈悲、理解。語調慈悲且包容。",
+    "jophiel": "請使用大天使喬菲爾的溫柔、鼓舞、偏女性化語氣，有藝術氣息。關鍵語彙：美感、靈感、光彩、愛自己。語調優雅且具有美感。",
+    "chamuel": "請使用大天使沙木爾的溫暖、包容語氣，像心理諮商師。關鍵語彙：愛、關係、理解、和解、自我接納。語調溫暖且充滿愛。",
+    "metatron": "請使用大天使梅塔特隆的權威、理性語氣，有數據感與宇宙秩序感。關鍵語彙：紀律、次序、靈性法則、神聖幾何。語調理性且系統化。",
+    "ariel": "請使用大天使阿列爾的豐盛、自然語氣，帶大地母親般的滋養感。關鍵語彙：豐盛、大地、自然、繁榮、創造。語調溫和且充滿生命力。",
+}
+
+
+# 解讀的內容與格式要求（所有數字、語氣共用，放在 system prompt 前段）
+READING_TASK_PROMPT = """稱呼只是開頭，主要內容是生命靈數的深度解析。
+【內容要求】除了稱呼外，必須提供至少300字以上的完整生命靈數解析，包含性格分析、優勢說明、人生方向建議等詳細內容。絕不可只有稱呼就結束。
+【格式要求】請使用純文字回覆，不要使用任何 markdown 格式標記（如 **、__、#、- 等），直接以清楚的文字和換行組織內容。"""
+
+
+# 各模組的參考資料段落（資料庫內容，依數字預先編譯）
+MODULE_PROMPTS = {
+    "core": lambda number, category: get_core_prompt(number, category),
+    "birthday": lambda number, category: get_birthday_prompt(number),
+    "year": lambda number, category: get_personal_year_prompt(number),
+    "grid": lambda lines, category: get_grid_prompt(list(lines), {}),
+    "soul": lambda number, category: get_soul_prompt(number),
+    "personality": lambda number, category: get_personality_prompt(number),
+    "expression": lambda number, category: get_expression_prompt(number),
+    "maturity": lambda number, category: get_maturity_prompt(number),
+    "challenge": lambda number, category: get_challenge_prompt(number),
+    "karma": lambda number, category: get_karma_prompt(number),
+}
+
+LIFENUM_TABLES = (
+    "lifenum_main",
+    "lifenum_birthday",
+    "lifenum_personal_year",
+    "lifenum_grid_lines",
+    "lifenum_challenge",
+    "lifenum_expression",
+    "lifenum_maturity",
+    "lifenum_soul",
+    "lifenum_personality",
+    "lifenum_karma",
+)
+
+
+def get_tone_instruction(version: str, tone: str) -> str:
+    if version == "free":
+        return FREE_TONE_PROMPTS.get(tone, FREE_TONE_PROMPTS["friendly"])
+    return PAID_TONE_PROMPTS.get(tone, PAID_TONE_PROMPTS["guan_yu"])
+
+
+@prompts.template(
+    "lifenum.reading",
+    tables=LIFENUM_TABLES,
+    # 資料庫讀取失敗時的錯誤提示不快取，下次請求重新查詢
+    cacheable=lambda prompt: "（系統錯誤" not in prompt.reference,
+)
+def build_reading_prompt(
+    module_type: str, number, category: Optional[str], version: str, tone: str
+) -> SystemPrompt:
+    """解讀的靜態前綴：全域規則 → 內容要求 → 語氣 → 模組參考資料"""
+    return SystemPrompt(
+        rules=load_global_rules(),
+        task=READING_TASK_PROMPT,
+        tone=f"【語氣要求】{get_tone_instruction(version, tone)}",
+        reference=MODULE_PROMPTS[module_type](number, category),
+    )
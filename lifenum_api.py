@@ -6,23 +6,18 @@
 from flask import Blueprint, request, jsonify
 import uuid
 
-from lifenum.modules.core import get_core_prompt
-from lifenum.modules.birthday import get_birthday_prompt
-from lifenum.modules.personal_year import get_personal_year_prompt
 from lifenum.modules.grid import get_grid_prompt
-from lifenum.modules.soul_number import get_soul_prompt
-from lifenum.modules.personality import get_personality_prompt
-from lifenum.modules.expression import get_expression_prompt
-from lifenum.modules.maturity import get_maturity_prompt
-from lifenum.modules.challenge import get_challenge_prompt
-from lifenum.modules.karma import get_karma_prompt
-
 from lifenum.gpt_client import GPTClient
+from shared.admission import LLMOverloadedError, overloaded_response
+from shared.llm_resilience import LLMUnavailableError
+from jobs_api import job_mode
+from shared.logger import get_logger
+from shared.request_context import bind_session
 from lifenum.agent import LifeNumberAgent, ConversationSession, ConversationState
 from lifenum.version_config import get_config
 from lifenum.tone_config import get_tone_config
 from lifenum.session_store import get_session_store
-from shared.rule_loader import load_global_rules
+from lifenum.prompts import prompts
 from lifenum.utils import (
     birthdate_to_digits_sum,
     reduce_to_core_number,
@@ -42,34 +37,14 @@ from lifenum.utils import (
 # 創建 Blueprint
 lifenum_bp = Blueprint("lifenum", __name__, url_prefix="/life")
 
+logger = get_logger(__name__)
+
 # Session 存儲管理器（使用 Redis）
 session_store = get_session_store()
 
 # Agent 實例
 agent = LifeNumberAgent()
 
-# 免費版語氣提示
-FREE_TONE_PROMPTS = {
-    "friendly": "請使用親切、輕鬆的語氣，像普通朋友聊天一樣，適合日常對話場景。後續稱呼使用「你」或「妳」。",
-    "caring": "請使用貼心、溫暖、關懷的語氣，像家人或閨蜜關心一樣，比親切版更加溫柔體貼，適合需要被理解的人。後續稱呼使用「你」或「妳」。",
-    "ritual": "請使用莊重、神聖、充滿儀式感的語氣，適合需做重大決策的場景。保持正式且尊重的態度，使用「您」、「在下」等文言用詞。",
-}
-
-# 付費版語氣提示
-PAID_TONE_PROMPTS = {
-    "guan_yu": "請使用關聖帝君的莊嚴、正直語氣，帶有沉穩節奏。關鍵語彙：忠義、正道、守信、因果、明辨是非。**嚴格警告：禁止使用任何文言文詞彙（汝、吾、乃、之、於、若、然、故、是以、當、須、方能、焉、矣、已為汝析得、為汝、汝之等），必須100%使用現代中文（你、我、的、在、如果、因此、應該、需要、能夠、已為你分析、為你、你的）。語調莊重威嚴但完全現代化表達。",
-    "michael": "請使用大天使米迦勒的堅定、有領導感語氣，帶安定力量。關鍵語彙：勇氣、信任、光明、防禦、戰士。語調堅定且充滿力量。",
-    "gabriel": "請使用大天使加百列的溫柔中帶清晰指引語氣，像傳信者。關鍵語彙：啟發、信息、真理、溝通、覺醒。語調溫和且具有啟發性。",
-    "raphael": "請使用大天使拉斐爾的柔和、慈悲、安撫人心語氣。關鍵語彙：療癒、平衡、綠光、修復、愛自己。語調溫暖且充滿愛意。",
-    "uriel": "請使用大天使烏列爾的沈穩、智者風格語氣，講話慢而深。關鍵語彙：洞察、智慧、火焰、真理、學習。語調深沈且充滿智慧。",
-    "zadkiel": "請使用大天使沙德基爾的柔中帶慈悲語氣，像引導人放下怨恨的導師。關鍵語彙：寬恕、紫焰、轉化、慈悲、理解。語調慈悲且包容。",
-    "jophiel": "請使用大天使喬菲爾的溫柔、鼓舞、偏女性化語氣，有藝術氣息。關鍵語彙：美感、靈感、光彩、愛自己。語調優雅且具有美感。",
-    "chamuel": "請使用大天使沙木爾的溫暖、包容語氣，像心理諮商師。關鍵語彙：愛、關係、理解、和解、自我接納。語調溫暖且充滿愛。",
-    "metatron": "請使用大天使梅塔特隆的權威、理性語氣，有數據感與宇宙秩序感。關鍵語彙：紀律、次序、靈性法則、神聖幾何。語調理性且系統化。",
-    "ariel": "請使用大天使阿列爾的豐盛、自然語氣，帶大地母親般的滋養感。關鍵語彙：豐盛、大地、自然、繁榮、創造。語調溫和且充滿生命力。",
-}
-
-
 # ========== 工具函數 ==========
 def get_session_by_id(version: str, session_id: str):
     """
@@ -78,7 +53,9 @@ def get_session_by_id(version: str, session_id: str):
     if not session_id:
         return None
 
-    return session_store.load_session(version, session_id)
+    conv_session = session_store.load_session(version, session_id)
+    bind_session(conv_session)
+    return conv_session
 
 
 def save_and_return(
@@ -108,8 +85,15 @@ def execute_module(
     english_name: str = "",
     category: str = "",
 ) -> dict:
-    """執行指定的模組計算（統一版本，支持免費和付費）"""
+    """
+    執行指定的模組計算（統一版本，支持免費和付費）
+
+    Raises:
+        LLMOverloadedError: AI 名額不足（呼叫未送出）
+    """
     year = None
+    prompt_category = None
+    prompt_number = None
 
     try:
         # 根據模組類型計算
@@ -117,71 +101,55 @@ def execute_module(
             total = birthdate_to_digits_sum(birthdate)
             number = reduce_to_core_number(total)
 
-            # 使用新函數從 DB 獲取 Prompt
-            # 只有付費版且有選擇類別時，才傳入 category
-            req_category = category if (version == "paid" and category) else None
-            system_prompt = get_core_prompt(number, req_category)
+            # 只有付費版且有選擇類別時，才加入類別的詳細內容
+            prompt_category = category if (version == "paid" and category) else None
             extra_info = f"加總：{total}\n"
 
         elif module_type == "birthday":
             number = compute_birthday_number(birthdate)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_birthday_prompt(number)
             extra_info = ""
         elif module_type == "year":
             number = compute_personal_year_number(birthdate, year)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_personal_year_prompt(number)
             extra_info = f"指定年份：{year if year else '當年'} (流年數: {number})\n"
         elif module_type == "grid":
             counts = compute_grid_counts(birthdate)
             lines = detect_present_lines(counts)
 
-            # 若無連線，直接使用 get_grid_prompt 返回的訊息作為最終回應，無需調用 LLM
-            system_prompt = get_grid_prompt(lines, counts)
             number = (
                 lines if lines else ["none"]
             )  # 回傳連線列表，若無連線則回傳 ["none"]
 
+            # 若無連線，直接使用 get_grid_prompt 返回的訊息作為最終回應，無需調用 LLM
             if not lines:
-                return {"response": system_prompt, "number": number}
+                return {"response": get_grid_prompt(lines, counts), "number": number}
+            prompt_number = tuple(lines)
 
             grid_display = build_ascii_grid(counts)
             extra_info = f"九宮格：\n{grid_display}\n連線：{lines}\n"
         elif module_type == "soul":
             number = compute_soul_number(english_name)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_soul_prompt(number)
             extra_info = "計算依據：姓名母音分析\n"
         elif module_type == "personality":
             number = compute_personality_number(english_name)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_personality_prompt(number)
             extra_info = "計算依據：姓名子音分析\n"
         elif module_type == "expression":
             number = compute_expression_number(english_name)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_expression_prompt(number)
             extra_info = "計算依據：姓名完整字母分析\n"
         elif module_type == "maturity":
             number = compute_maturity_number(birthdate)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_maturity_prompt(number)
             extra_info = ""
         elif module_type == "challenge":
             number = compute_challenge_number(birthdate)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_challenge_prompt(number)
             extra_info = ""
         elif module_type == "karma":
             number = compute_karma_number(birthdate)
-            # 使用新函數從 DB 獲取 Prompt
-            system_prompt = get_karma_prompt(number)
             extra_info = ""
         else:
             return {"error": "不支援的模組類型"}
     except Exception as e:
         return {"error": f"計算錯誤：{str(e)}"}
+    if prompt_number is None:
+        prompt_number = number
 
     # 根據版本和語氣決定稱呼格式
     if version == "free":
@@ -196,16 +164,13 @@ def execute_module(
         else:  # ritual
             title = "先生" if gender == "male" else "小姐"
             greeting = f"{name}{title}您好\n\n"
-
-        tone_instruction = FREE_TONE_PROMPTS.get(tone, FREE_TONE_PROMPTS["friendly"])
     else:  # paid
         greeting = ""  # 付費版由語氣決定，通常不用固定格式
-        tone_instruction = PAID_TONE_PROMPTS.get(tone, PAID_TONE_PROMPTS["guan_yu"])
 
-    # 組合完整的 system prompt
+    # 組合完整的 system prompt（靜態段落已預先編譯，這裡只接上使用者相關的要求）
     # 如果有英文名字資訊，添加隱私保護指示
     privacy_note = (
-        "\n【隱私要求】計算過程中使用的英文名字僅供數字計算使用，請勿在回覆內容中直接顯示或提及英文名字本身。"
+        "【隱私要求】計算過程中使用的英文名字僅供數字計算使用，請勿在回覆內容中直接顯示或提及英文名字本身。"
         if english_name
         else ""
     )
@@ -217,14 +182,11 @@ def execute_module(
         # 付費版動態稱呼，強制要求使用名字
         greeting_instruction = f"【稱呼要求】請根據設定的語氣與角色，自行生成合適的開頭稱呼。**必須使用使用者的名字「{name}」來稱呼對方，嚴禁使用「使用者」、「用戶」、「朋友」等泛稱。**"
 
-    full_system_prompt = f"""{system_prompt}
-
-【語氣要求】{tone_instruction}
-{greeting_instruction}稱呼只是開頭，主要內容是生命靈數的深度解析。
-【內容要求】除了稱呼外，必須提供至少300字以上的完整生命靈數解析，包含性格分析、優勢說明、人生方向建議等詳細內容。絕不可只有稱呼就結束。
-【格式要求】請使用純文字回覆，不要使用任何 markdown 格式標記（如 **、__、#、- 等），直接以清楚的文字和換行組織內容。{privacy_note}
-{load_global_rules()}
-"""
+    full_system_prompt = prompts.render(
+        "lifenum.reading",
+        (module_type, prompt_number, prompt_category, version, tone),
+        user=f"{greeting_instruction}\n{privacy_note}",
+    )
 
     # 建立 user prompt
     if user_purpose:
@@ -236,7 +198,11 @@ def execute_module(
     try:
         client = GPTClient()
         final_response = client.ask(
-            full_system_prompt, user_prompt, temperature=1.0, max_tokens=2000
+            full_system_prompt,
+            user_prompt,
+            temperature=1.0,
+            max_tokens=2000,
+            site="reading",
         )
 
         # 清理 markdown 格式標記
@@ -256,11 +222,15 @@ def execute_module(
             return {"error": "AI 回應異常（太短），請重試"}
 
         return {"response": final_response, "number": number}
+    except LLMOverloadedError:
+        # 名額不足不是一般錯誤：呼叫端回覆模板且不保存會話
+        raise
+    except LLMUnavailableError as e:
+        # 重試與備用模型都失敗（或斷路器斷開）：快速返回，不讓使用者等到逾時
+        logger.error("execute_module AI 服務不可用: %s", e)
+        return {"error": "AI 服務暫時忙碌，請稍後再試一次"}
     except Exception as e:
-        print(f"[ERROR] execute_module 錯誤: {e}")
-        import traceback
-
-        traceback.print_exc()
+        logger.exception("execute_module 錯誤: %s", e)
         return {"error": f"計算過程發生錯誤：{str(e)}"}
 
 
@@ -291,7 +261,7 @@ def handle_init_with_tone(version: str):
     # 保存會話到 Redis
     session_store.save_session(version, session_id, conv_session)
 
-    print(f"[Init] 創建新會話: {session_id}, 版本: {version}")
+    logger.info("創建新會話: %s, 版本: %s", session_id, version)
 
     return jsonify(
         {
@@ -303,6 +273,7 @@ def handle_init_with_tone(version: str):
     )
 
 
+@job_mode("lifenum")
 def handle_chat(version: str):
     """主對話處理"""
     data = request.json
@@ -338,20 +309,26 @@ def handle_chat(version: str):
 
     conv_session.add_message("user", user_input)
 
+    loaded_state = conv_session.state.value
+
     # ========== 狀態機處理 ==========
 
     # 1. WAITING_BASIC_INFO - 等待基本資訊
     if conv_session.state == ConversationState.WAITING_BASIC_INFO:
         # 使用 AI 解析基本資訊（根據版本決定是否要求英文名）
         require_english = config.get("require_english_name", False)
-        name, gender, birthdate, english_name, error_msg = (
-            agent.extract_birthdate_with_ai(
-                user_input, require_english_name=require_english
+        try:
+            name, gender, birthdate, english_name, error_msg = (
+                agent.extract_birthdate_with_ai(
+                    user_input, require_english_name=require_english
+                )
             )
-        )
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "lifenum extract"))
 
-        print(
-            f"[DEBUG] extract result: name={name}, gender={gender}, birthdate={birthdate}, error={error_msg}"
+        logger.debug(
+            "extract result: name=%s, gender=%s, birthdate=%s, error=%s",
+            bool(name), gender, bool(birthdate), error_msg,
         )
 
         if error_msg:
@@ -399,9 +376,7 @@ def handle_chat(version: str):
         module_key, reason = agent.detect_module_from_purpose(
             user_input, conv_session.user_name
         )
-        print(
-            f"[DEBUG] WAITING_MODULE_SELECTION Detected module: {module_key}, reason: {reason}"
-        )
+        logger.debug("WAITING_MODULE_SELECTION Detected module: %s, reason: %s", module_key, reason)
 
         # 識別選擇的模組
         selected_module = module_key
@@ -425,17 +400,20 @@ def handle_chat(version: str):
         conv_session.current_module = selected_module
 
         # 執行模組計算（所有模組都要先計算）
-        result = execute_module(
-            version,
-            selected_module,
-            conv_session.birthdate,
-            conv_session.user_name,
-            conv_session.user_gender,
-            conv_session.tone,
-            "",
-            conv_session.english_name or "",
-            "",  # 其他模組不需要類別
-        )
+        try:
+            result = execute_module(
+                version,
+                selected_module,
+                conv_session.birthdate,
+                conv_session.user_name,
+                conv_session.user_gender,
+                conv_session.tone,
+                "",
+                conv_session.english_name or "",
+                "",  # 其他模組不需要類別
+            )
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "lifenum module"))
 
         # 檢查是否有錯誤
         if "error" in result:
@@ -574,17 +552,20 @@ def handle_chat(version: str):
         user_question = user_input
 
         # 執行 core 模組，帶上用戶問題和類別
-        result = execute_module(
-            version,
-            "core",
-            conv_session.birthdate,
-            conv_session.user_name,
-            conv_session.user_gender,
-            conv_session.tone,
-            user_question,  # 傳入用戶問題
-            conv_session.english_name or "",
-            conv_session.selected_category or "",  # 傳入選擇的類別
-        )
+        try:
+            result = execute_module(
+                version,
+                "core",
+                conv_session.birthdate,
+                conv_session.user_name,
+                conv_session.user_gender,
+                conv_session.tone,
+                user_question,  # 傳入用戶問題
+                conv_session.english_name or "",
+                conv_session.selected_category or "",  # 傳入選擇的類別
+            )
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "lifenum question"))
 
         if "error" in result:
             error_message = result["error"]
@@ -651,19 +632,22 @@ def handle_chat(version: str):
             )
 
         # 執行當前模組，帶上用戶問題
-        result = execute_module(
-            version,
-            current_module,
-            conv_session.birthdate,
-            conv_session.user_name,
-            conv_session.user_gender,
-            conv_session.tone,
-            user_question,
-            conv_session.english_name or "",
-            conv_session.selected_category
-            if current_module == "core"
-            else "",  # core 模組傳入類別
-        )
+        try:
+            result = execute_module(
+                version,
+                current_module,
+                conv_session.birthdate,
+                conv_session.user_name,
+                conv_session.user_gender,
+                conv_session.tone,
+                user_question,
+                conv_session.english_name or "",
+                conv_session.selected_category
+                if current_module == "core"
+                else "",  # core 模組傳入類別
+            )
+        except LLMOverloadedError:
+            return jsonify(overloaded_response(session_id, loaded_state, "lifenum follow_up"))
 
         if "error" in result:
             error_message = result["error"]
@@ -874,7 +858,7 @@ def handle_reset(version: str):
     if session_id:
         # 從 Redis 刪除會話
         session_store.delete(version, session_id)
-        print(f"[Reset] 刪除會話: {session_id}, 版本: {version}")
+        logger.info("刪除會話: %s, 版本: %s", session_id, version)
 
     return jsonify({"success": True})
 
@@ -0,0 +1,352 @@
+"""
+LLM 准入控制（共享基礎設施）
+所有 LLM 呼叫送出前先取得名額，負載高時付費版與進行中的對話優先，免費版的新請求先被拒絕：
+
+- 優先等級依請求上下文決定：paid（付費版）> follow_up（免費版已完成首次解讀，正在追問或選擇下一步）> free；
+  follow_up 依 (blueprint, 對話狀態) 判斷，各模組的狀態名稱相同但意義不同（例如擲筊的 waiting_question 是首次提問前）
+- 本 instance 以有上限的名額（LLM_ADMISSION_LIMIT）限制同時進行的呼叫；
+  名額釋出時依權重（paid 4 : follow_up 2 : free 1）輪流分配給等待中的等級，低優先等級不會完全餓死
+- 免費版最多只能使用 LLM_ADMISSION_FREE_SHARE 比例的名額，其餘保留給付費版與追問
+- 可選的全域令牌桶（LLM_GLOBAL_RPS > 0 時啟用）：以 Redis 記錄所有 instance 共用的每秒呼叫數，
+  免費版需在桶內剩餘令牌高於保留量時才能取得；Redis 不可用時不限制（fail open）
+- 取不到名額時拋出 LLMOverloadedError（LLMUnavailableError 的子類別），呼叫端改用快取的解讀變體，
+  或以 overloaded_response() 回覆模板並保持對話狀態，讓使用者重送；免費版等待上限較短，很快就會放棄
+- 安全審核（EXEMPT_SITES）不受限制：審核被拒絕時只能放行或誤判違規，兩者都不可接受
+- 指標：各等級的等待數與進行中數（量表）、准入結果（計數器）與等待秒數（直方圖）
+
+使用方式：
+    with admit():  # 依請求上下文決定優先等級
+        content = resilient_call(...)
+"""
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterator, List, Optional
+
+from .llm_resilience import LLM_MAX_INFLIGHT, LLMUnavailableError
+from .logger import get_logger, sampled
+from .metrics import get_metrics_registry
+from .redis_client import get_redis_client
+from .request_context import get_request_context
+from .tracing import span
+
+logger = get_logger(__name__)
+
+PAID, FOLLOW_UP, FREE = "paid", "follow_up", "free"
+PRIORITIES = (PAID, FOLLOW_UP, FREE)
+
+# 名額釋出時各等級的分配權重
+PRIORITY_WEIGHTS = {PAID: 4, FOLLOW_UP: 2, FREE: 1}
+
+# 各模組中視為進行中對話的狀態（已完成首次解讀，使用者正在追問或選擇下一步）
+# 擲筊的 waiting_question 同時用於首次提問與再次擲筊前，無法區分，因此視為 free
+FOLLOW_UP_STATES: Dict[str, FrozenSet[str]] = {
+    "lifenum": frozenset({"continue_selection", "waiting_question", "completed"}),
+    "angelnum": frozenset({"asking_for_question", "conversation", "completed"}),
+    "divination": frozenset({"asking_for_question", "completed"}),
+    "auspicious": frozenset({"asking_for_question", "completed"}),
+}
+
+# 不經准入控制的呼叫點
+EXEMPT_SITES = frozenset({"safety"})
+
+# 負載過高時給使用者的模板回應
+OVERLOADED_REPLY = "目前使用人數較多，請稍等片刻後再送出一次訊息。"
+
+# 設定（可用環境變數調整）
+# 預設為 LLM 執行緒數的一半，保留空間給重試與對沖請求
+LLM_ADMISSION_LIMIT = int(os.getenv("LLM_ADMISSION_LIMIT", max(1, LLM_MAX_INFLIGHT // 2)))
+LLM_ADMISSION_FREE_SHARE = float(os.getenv("LLM_ADMISSION_FREE_SHARE", 0.75))
+LLM_ADMISSION_WAIT = float(os.getenv("LLM_ADMISSION_WAIT", 20))  # 付費版與追問的最長等待秒數
+LLM_ADMISSION_FREE_WAIT = float(os.getenv("LLM_ADMISSION_FREE_WAIT", 2))  # 免費版的最長等待秒數
+
+LLM_GLOBAL_RPS = float(os.getenv("LLM_GLOBAL_RPS", 0))  # 所有 instance 合計的每秒呼叫數（0 表示不限制）
+LLM_GLOBAL_BURST = float(os.getenv("LLM_GLOBAL_BURST", max(1.0, LLM_GLOBAL_RPS * 2)))
+LLM_GLOBAL_FREE_RESERVE = float(os.getenv("LLM_GLOBAL_FREE_RESERVE", 0.25))  # 免費版不能使用的令牌比例
+GLOBAL_BUCKET_KEY = "admission:bucket"
+GLOBAL_RETRY_SECONDS = 5  # Redis 失敗後暫停使用全域令牌桶的秒數
+
+# 令牌桶：以 Redis 時間補充令牌，剩餘令牌高於 reserve 時扣除一個
+# 返回 {是否取得, 剩餘令牌（字串，Lua 數字轉換時會捨去小數）}
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 + reserve then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_metrics = get_metrics_registry()
+_queue_depth = _metrics.gauge("llm_admission_queue_depth", "等待 LLM 名額的呼叫數", ("priority",))
+_inflight = _metrics.gauge("llm_admission_inflight", "已取得 LLM 名額的呼叫數", ("priority",))
+_admissions = _metrics.counter("llm_admission_total", "LLM 准入結果", ("priority", "result"))
+_admission_wait = _metrics.histogram(
+    "llm_admission_wait_seconds",
+    "取得 LLM 名額前的等待秒數",
+    ("priority",),
+    buckets=(0.005, 0.025, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30),
+)
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """負載過高，呼叫未送出（訊息可直接顯示給使用者）"""
+
+    def __init__(self, priority: str, reason: str):
+        super().__init__(OVERLOADED_REPLY)
+        self.priority = priority
+        self.reason = reason
+
+
+def overloaded_response(session_id: str, state: str, where: str) -> Dict[str, object]:
+    """
+    名額不足（呼叫未送出）時的回應內容
+
+    呼叫端不保存會話：對話狀態與歷史維持原樣，使用者重送同一則訊息即可，
+    因此 state 應傳入載入會話時的狀態，而不是處理途中已更新的狀態
+
+    Args:
+        session_id: 會話 ID
+        state: 載入會話時的對話狀態
+        where: 呼叫點（僅用於日誌）
+    """
+    # 負載過高時每個請求都會走到這裡：日誌取樣
+    logger.info("%s 名額不足，回覆模板", where, extra=sampled())
+    return {
+        "session_id": session_id,
+        "response": OVERLOADED_REPLY,
+        "state": state,
+        "requires_input": True,
+        "overloaded": True,
+    }
+
+
+def request_priority(context: Optional[Dict[str, str]] = None) -> str:
+    """依請求上下文決定優先等級（請求之外的背景呼叫視為 free）"""
+    context = get_request_context() if context is None else context
+    if context.get("version") == "paid":
+        return PAID
+    if context.get("state") in FOLLOW_UP_STATES.get(context.get("blueprint"), ()):
+        return FOLLOW_UP
+    return FREE
+
+
+class PriorityLimiter:
+    """
+    本 instance 的名額限制：有空名額且沒有人排隊時直接取得，
+    否則依平滑加權輪詢（smooth weighted round-robin）決定下一個取得名額的等級，同等級內先到先得
+    """
+
+    def __init__(
+        self,
+        capacity: int = LLM_ADMISSION_LIMIT,
+        free_share: float = LLM_ADMISSION_FREE_SHARE,
+        weights: Optional[Dict[str, int]] = None,
+    ):
+        self.capacity = max(1, capacity)
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self._limits = {priority: self.capacity for priority in PRIORITIES}
+        self._limits[FREE] = max(1, min(self.capacity, int(self.capacity * free_share)))
+        self._cond = threading.Condition()
+        self._waiting: Dict[str, List[object]] = {priority: [] for priority in PRIORITIES}
+        self._inflight = 0
+        self._credits = {priority: 0 for priority in PRIORITIES}
+
+    def _eligible(self) -> List[str]:
+        return [
+            priority
+            for priority in PRIORITIES
+            if self._waiting[priority] and self._inflight < self._limits[priority]
+        ]
+
+    def _next_priority(self, eligible: List[str]) -> str:
+        # 累積權重相同時較高的等級優先
+        return max(
+            eligible,
+            key=lambda priority: (self._credits[priority] + self.weights[priority], -PRIORITIES.index(priority)),
+        )
+
+    def _grant(self, priority: str, eligible: List[str]):
+        # 平滑加權輪詢：每次分配時所有候選等級累加權重，被選中的等級扣除總權重
+        for candidate in eligible:
+            self._credits[candidate] += self.weights[candidate]
+        self._credits[priority] -= sum(self.weights[candidate] for candidate in eligible)
+        if not any(self._waiting[candidate] for candidate in PRIORITIES if candidate != priority):
+            self._credits = {candidate: 0 for candidate in PRIORITIES}
+
+    def acquire(self, priority: str, timeout: float) -> bool:
+        """等待名額（最多 timeout 秒），取得時返回 True"""
+        ticket = object()
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            queue = self._waiting[priority]
+            queue.append(ticket)
+            _queue_depth.inc(priority=priority)
+            try:
+                while True:
+                    eligible = self._eligible()
+                    if priority in eligible and queue[0] is ticket and self._next_priority(eligible) == priority:
+                        self._grant(priority, eligible)
+                        self._inflight += 1
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                queue.remove(ticket)
+                _queue_depth.dec(priority=priority)
+                # 隊首離開（取得名額或逾時）後，輪到的可能是其他執行緒
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+
+class GlobalTokenBucket:
+    """所有 instance 共用的令牌桶（Redis）"""
+
+    def __init__(
+        self,
+        rate: float = LLM_GLOBAL_RPS,
+        burst: float = LLM_GLOBAL_BURST,
+        free_reserve: float = LLM_GLOBAL_FREE_RESERVE,
+    ):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._reserves = {
+            PAID: 0.0,
+            FOLLOW_UP: self.burst * free_reserve / 2,
+            FREE: self.burst * free_reserve,
+        }
+        self._script = None
+        self._retry_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def try_acquire(self, priority: str) -> bool:
+        """嘗試取得一個令牌（未啟用或 Redis 不可用時一律通過）"""
+        if not self.enabled or time.monotonic() < self._retry_at:
+            return True
+        try:
+            if self._script is None:
+                self._script = get_redis_client().register_script(_TOKEN_BUCKET_SCRIPT)
+            allowed, _ = self._script(
+                keys=[GLOBAL_BUCKET_KEY], args=[self.rate, self.burst, self._reserves[priority]]
+            )
+            return bool(int(allowed))
+        except Exception as e:
+            # 每 GLOBAL_RETRY_SECONDS 最多記錄一次
+            self._retry_at = time.monotonic() + GLOBAL_RETRY_SECONDS
+            logger.warning("全域令牌桶不可用，暫時只使用本機限制: %s", e)
+            return True
+
+
+class AdmissionController:
+    """本機名額 + 全域令牌桶"""
+
+    def __init__(
+        self,
+        limiter: Optional[PriorityLimiter] = None,
+        bucket: Optional[GlobalTokenBucket] = None,
+    ):
+        self.limiter = limiter or PriorityLimiter()
+        self.bucket = bucket or GlobalTokenBucket()
+        self.max_waits = {PAID: LLM_ADMISSION_WAIT, FOLLOW_UP: LLM_ADMISSION_WAIT, FREE: LLM_ADMISSION_FREE_WAIT}
+
+    def _reject(self, priority: str, reason: str, started: float):
+        _admissions.inc(priority=priority, result=reason)
+        _admission_wait.observe(time.monotonic() - started, priority=priority)
+        # 負載過高時每次呼叫都會走到這裡：日誌取樣，數量以 llm_admission_total 為準
+        logger.info("LLM 名額不足，%s 呼叫未送出（%s）", priority, reason, extra=sampled())
+        raise LLMOverloadedError(priority, reason)
+
+    def _wait_for_token(self, priority: str, deadline: float) -> bool:
+        """付費版與追問在期限內重試取得令牌；免費版只試一次"""
+        while not self.bucket.try_acquire(priority):
+            remaining = deadline - time.monotonic()
+            if priority == FREE or remaining <= 0:
+                return False
+            # 平均每個令牌的補充間隔，加上抖動避免各 instance 同時重試
+            time.sleep(min(remaining, (1 / self.bucket.rate) * (0.5 + random.random())))
+        return True
+
+    def acquire(self, priority: str):
+        """
+        取得名額（呼叫完成後需 release）
+
+        Raises:
+            LLMOverloadedError: 等待逾時或全域令牌不足
+        """
+        started = time.monotonic()
+        deadline = started + self.max_waits[priority]
+        if not self.limiter.acquire(priority, deadline - started):
+            self._reject(priority, "shed_local", started)
+        if not self._wait_for_token(priority, deadline):
+            self.limiter.release()
+            self._reject(priority, "shed_global", started)
+        _admissions.inc(priority=priority, result="admitted")
+        _admission_wait.observe(time.monotonic() - started, priority=priority)
+        _inflight.inc(priority=priority)
+
+    def release(self, priority: str):
+        _inflight.dec(priority=priority)
+        self.limiter.release()
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """獲取 LLM 准入控制器 (Singleton)"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+@contextmanager
+def admit(priority: Optional[str] = None, site: Optional[str] = None) -> Iterator[str]:
+    """
+    在名額內執行 LLM 呼叫
+
+    Args:
+        priority: 優先等級（預設依請求上下文決定）
+        site: 呼叫點（EXEMPT_SITES 中的呼叫點不經准入控制）
+
+    Raises:
+        LLMOverloadedError: 負載過高
+    """
+    priority = priority or request_priority()
+    if site in EXEMPT_SITES:
+        _admissions.inc(priority=priority, result="exempt")
+        yield priority
+        return
+    controller = get_admission_controller()
+    with span("llm.admission", "queue", priority=priority):
+        controller.acquire(priority)
+    try:
+        yield priority
+    finally:
+        controller.release(priority)
@@ -1,25 +1,231 @@
 """
 GPT 客戶端（共享）
+所有呼叫都經過 llm_resilience：有總期限、可重試錯誤會重試、可選對沖請求，
+主要模型斷路時改用 OPENAI_FALLBACK_MODEL（未設定時拋出 LLMUnavailableError）
+
+呼叫點路由：呼叫端以 site= 指定呼叫點（extract / route / safety / reading / follow_up / summary），
+由路由表決定模型、token 上限與總期限，並依呼叫點統計 token 用量（get_usage_stats）。
+路由表可用 LLM_ROUTES_FILE（JSON 檔）、LLM_ROUTES（JSON 字串）或 OPENAI_MODEL_<SITE> 覆寫
+
+指標：每次呼叫依請求上下文（blueprint、版本、對話狀態、語氣）與呼叫點、模型加上標籤，
+記錄延遲直方圖、呼叫次數、錯誤與 token 計數（GET /metrics）；
+超過 LLM_SLOW_CALL_SECONDS 的呼叫依 LLM_SLOW_LOG_SAMPLE 比例輸出一行 JSON 日誌
+
+准入控制：送出前經 admission 取得名額（付費版與追問優先），
+負載過高時拋出 LLMOverloadedError（status="shed"），呼叫端改用快取或模板回應
 """
 
 from __future__ import annotations
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
 from openai import OpenAI
+import json
 import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
 
+from .admission import LLMOverloadedError, admit
+from .llm_resilience import CallPolicy, LLMUnavailableError, resilient_call
+from .logger import fields, get_logger
+from .metrics import get_metrics_registry
+from .request_context import get_request_context
+from .tracing import span
+
 load_dotenv()
 
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """單一呼叫點的模型設定"""
+
+    model: str
+    max_tokens: Optional[int] = None  # token 上限（呼叫端指定較小值時以呼叫端為準）；None 表示不另設上限
+    timeout: Optional[float] = None  # 總期限（秒，含重試）；None 表示使用 LLM_DEADLINE
+
+
+CALL_SITES = ('extract', 'route', 'safety', 'reading', 'follow_up', 'summary')
+
+
+def _default_routes() -> Dict[str, ModelRoute]:
+    """
+    預設路由：抽取、模組判斷、安全審核與搜尋結果摘要用快速模型，
+    解讀與追問用主要模型
+    """
+    main_model = os.getenv('OPENAI_MODEL', 'gpt-4o')
+    fast_model = os.getenv('OPENAI_FAST_MODEL', 'gpt-4o-mini')
+    return {
+        'extract': ModelRoute(fast_model, max_tokens=500, timeout=20),
+        'route': ModelRoute(fast_model, max_tokens=300, timeout=20),
+        'safety': ModelRoute(fast_model, max_tokens=300, timeout=20),
+        'reading': ModelRoute(main_model, timeout=60),
+        'follow_up': ModelRoute(main_model, timeout=45),
+        'summary': ModelRoute(fast_model, timeout=30),
+    }
+
+
+def _apply_overrides(routes: Dict[str, ModelRoute], overrides: Dict[str, Any], source: str) -> None:
+    """套用覆寫設定：{"site": "model"} 或 {"site": {"model": ..., "max_tokens": ..., "timeout": ...}}"""
+    for site, value in (overrides or {}).items():
+        if site not in routes:
+            logger.warning("%s 中的呼叫點 %s 不存在，已略過", source, site)
+            continue
+        if isinstance(value, str):
+            value = {'model': value}
+        fields = {key: value[key] for key in ('model', 'max_tokens', 'timeout') if key in value}
+        routes[site] = replace(routes[site], **fields)
+
+
+def load_routes() -> Dict[str, ModelRoute]:
+    """
+    載入路由表（後者覆寫前者）：預設值 → LLM_ROUTES_FILE → LLM_ROUTES → OPENAI_MODEL_<SITE>
+    """
+    routes = _default_routes()
+
+    path = os.getenv('LLM_ROUTES_FILE')
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                _apply_overrides(routes, json.load(f), path)
+        except (OSError, ValueError) as e:
+            logger.error("無法讀取路由設定檔 %s: %s", path, e)
+
+    raw = os.getenv('LLM_ROUTES')
+    if raw:
+        try:
+            _apply_overrides(routes, json.loads(raw), 'LLM_ROUTES')
+        except ValueError as e:
+            logger.error("LLM_ROUTES 格式錯誤: %s", e)
+
+    for site in CALL_SITES:
+        model = os.getenv(f'OPENAI_MODEL_{site.upper()}')
+        if model:
+            routes[site] = replace(routes[site], model=model)
+    return routes
+
+
+MODEL_ROUTES: Dict[str, ModelRoute] = load_routes()
+
+
+def get_route(site: str) -> ModelRoute:
+    route = MODEL_ROUTES.get(site)
+    if route is None:
+        raise ValueError(f"未知的呼叫點: {site}")
+    return route
+
+
+# 依呼叫點統計的用量
+_usage_lock = threading.Lock()
+_usage: Dict[str, Dict[str, float]] = {}
+
+
+def cached_tokens(usage: Any) -> int:
+    """回應中命中供應商 prompt 快取的輸入 token 數（不支援時為 0）"""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0
+
+
+def _record_usage(site: str, model: str, usage: Any = None, seconds: Optional[float] = None, error: bool = False) -> None:
+    with _usage_lock:
+        stats = _usage.setdefault(site, {})
+        if error:
+            stats['errors'] = stats.get('errors', 0) + 1
+            return
+        stats['calls'] = stats.get('calls', 0) + 1
+        stats['latency_total'] = stats.get('latency_total', 0.0) + (seconds or 0.0)
+        if usage is not None:
+            stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + (getattr(usage, 'prompt_tokens', 0) or 0)
+            stats['completion_tokens'] = stats.get('completion_tokens', 0) + (getattr(usage, 'completion_tokens', 0) or 0)
+            stats['cached_tokens'] = stats.get('cached_tokens', 0) + cached_tokens(usage)
+            stats['uncached_prompt_tokens'] = stats['prompt_tokens'] - stats['cached_tokens']
+        models = stats.setdefault('models', {})
+        models[model] = models.get(model, 0) + 1
+
+
+def get_usage_stats() -> Dict[str, Any]:
+    """每個呼叫點的呼叫次數、錯誤次數、token 用量（含命中 prompt 快取的 cached_tokens）、總延遲與實際使用的模型"""
+    with _usage_lock:
+        return {site: {**stats, 'models': dict(stats.get('models', {}))} for site, stats in _usage.items()}
+
+
+# ---------- 指標 ----------
+
+LLM_SLOW_CALL_SECONDS = float(os.getenv('LLM_SLOW_CALL_SECONDS', 15))  # 超過此秒數視為慢呼叫
+LLM_SLOW_LOG_SAMPLE = float(os.getenv('LLM_SLOW_LOG_SAMPLE', 1.0))  # 慢呼叫輸出日誌的比例（0–1）
+
+# 計數器帶完整標籤；直方圖省略對話狀態與語氣，避免分桶數隨標籤組合倍增
+_LLM_LABELS = ('blueprint', 'version', 'state', 'site', 'model', 'tone')
+_LATENCY_LABELS = ('blueprint', 'version', 'site', 'model')
+
+_metrics = get_metrics_registry()
+_llm_calls = _metrics.counter('llm_calls_total', 'LLM 呼叫次數（含重試與對沖的一次邏輯呼叫）', _LLM_LABELS + ('status',))
+_llm_errors = _metrics.counter('llm_errors_total', 'LLM 呼叫失敗次數（依例外類型）', _LATENCY_LABELS + ('error',))
+_llm_latency = _metrics.histogram('llm_call_duration_seconds', 'LLM 呼叫延遲（含重試與對沖）', _LATENCY_LABELS)
+_llm_prompt_tokens = _metrics.counter('llm_prompt_tokens_total', 'LLM 輸入 token 數', _LLM_LABELS)
+_llm_cached_tokens = _metrics.counter('llm_cached_prompt_tokens_total', '命中 prompt 快取的輸入 token 數', _LLM_LABELS)
+_llm_completion_tokens = _metrics.counter('llm_completion_tokens_total', 'LLM 輸出 token 數', _LLM_LABELS)
+
+
+def _call_labels(site: str, model: str) -> Dict[str, str]:
+    context = get_request_context()
+    return {
+        'blueprint': context.get('blueprint'),
+        'version': context.get('version'),
+        'state': context.get('state'),
+        'site': site,
+        'model': model,
+        'tone': context.get('tone'),
+    }
+
+
+def _record_tokens(labels: Dict[str, str], usage: Any) -> None:
+    _llm_prompt_tokens.inc(getattr(usage, 'prompt_tokens', 0) or 0, **labels)
+    _llm_cached_tokens.inc(cached_tokens(usage), **labels)
+    _llm_completion_tokens.inc(getattr(usage, 'completion_tokens', 0) or 0, **labels)
+
+
+def _record_call(labels: Dict[str, str], seconds: float, status: str, usage: Any = None, error: Optional[BaseException] = None) -> None:
+    """記錄一次邏輯呼叫的結果；慢呼叫依取樣比例輸出結構化日誌"""
+    _llm_calls.inc(**labels, status=status)
+    latency_labels = {name: labels[name] for name in _LATENCY_LABELS}
+    _llm_latency.observe(seconds, **latency_labels)
+    if error is not None:
+        _llm_errors.inc(**latency_labels, error=type(error).__name__)
+
+    if seconds < LLM_SLOW_CALL_SECONDS or random.random() >= LLM_SLOW_LOG_SAMPLE:
+        return
+    record = {
+        **labels,
+        'status': status,
+        'seconds': round(seconds, 3),
+    }
+    if usage is not None:
+        record.update(
+            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+            cached_tokens=cached_tokens(usage),
+            completion_tokens=getattr(usage, 'completion_tokens', None),
+        )
+    if error is not None:
+        record['error'] = f"{type(error).__name__}: {error}"
+    logger.warning("llm_slow_call", extra=fields(**record))
+
 
 class GPTClient:
     def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, model: Optional[str] = None) -> None:
         self.model = model or os.getenv('OPENAI_MODEL', 'gpt-4o')
+        self.pinned_model = model is not None  # 建構時指定模型則不套用路由表的模型
+        self.fallback_model = os.getenv('OPENAI_FALLBACK_MODEL') or None
         self.client = OpenAI(
             api_key=api_key or os.getenv('OPENAI_API_KEY'),
             base_url=base_url or os.getenv('OPENAI_BASE_URL'),
+            max_retries=0,  # 重試由 llm_resilience 統一處理
         )
 
-    def ask(self, system_prompt: str, user_prompt: str, temperature: float = 0.6, max_tokens: int = 1000) -> str:
+    def ask(self, system_prompt: str, user_prompt: str, temperature: float = 0.6, max_tokens: int = 1000, policy: Optional[CallPolicy] = None, site: Optional[str] = None) -> str:
+        model, max_tokens, policy = self._resolve(site, max_tokens, policy)
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
@@ -27,7 +233,7 @@ class GPTClient:
         
         # 準備 API 參數
         params = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
             "max_completion_tokens": max_tokens,
         }
@@ -37,19 +243,18 @@ class GPTClient:
         if abs(temperature - 1.0) < 0.01:  # 允許浮點數誤差
             params["temperature"] = 1.0
         
-        print(f"[DEBUG GPTClient] Model: {self.model}, Temperature: {temperature}, Max tokens: {max_tokens}")
-        print(f"[DEBUG GPTClient] Using temperature in params: {'temperature' in params}")
+        logger.debug("Site: %s, Model: %s, Temperature: %s, Max tokens: %s", site or '-', model, params.get("temperature"), max_tokens)
         
         try:
-            response = self.client.chat.completions.create(**params)
-            content = response.choices[0].message.content or ""
-            print(f"[DEBUG GPTClient] Response length: {len(content)}")
-            return content.strip()
+            content = self._complete(params, policy, site)
+            logger.debug("Response length: %d", len(content))
+            return content
         except Exception as e:
-            print(f"[ERROR GPTClient] API call failed: {e}")
+            logger.error("API call failed: %s", e)
             raise
 
-    def structured(self, system_prompt: str, user_prompt: str, response_format: Dict[str, Any], temperature: float = 0.3, max_tokens: int = 1000) -> str:
+    def structured(self, system_prompt: str, user_prompt: str, response_format: Dict[str, Any], temperature: float = 0.3, max_tokens: int = 1000, policy: Optional[CallPolicy] = None, site: Optional[str] = None) -> str:
+        model, max_tokens, policy = self._resolve(site, max_tokens, policy)
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
@@ -57,7 +262,7 @@ class GPTClient:
         
         # 準備 API 參數
         params = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
             "max_completion_tokens": max_tokens,
             "response_format": response_format,
@@ -67,6 +272,129 @@ class GPTClient:
         if temperature == 1.0:
             params["temperature"] = temperature
         
-        response = self.client.chat.completions.create(**params)
-        return (response.choices[0].message.content or "").strip()
+        return self._complete(params, policy, site)
+
+    def _resolve(self, site: Optional[str], max_tokens: int, policy: Optional[CallPolicy]) -> Tuple[str, int, Optional[CallPolicy]]:
+        """依呼叫點決定模型、token 上限與呼叫期限（未指定呼叫點時維持原本設定）"""
+        if site is None:
+            return self.model, max_tokens, policy
+        route = get_route(site)
+        model = self.model if self.pinned_model else route.model
+        if route.max_tokens is not None:
+            max_tokens = min(max_tokens, route.max_tokens)
+        if policy is None and route.timeout is not None:
+            policy = CallPolicy(deadline=route.timeout)
+        return model, max_tokens, policy
+
+    def _complete(self, params: Dict[str, Any], policy: Optional[CallPolicy] = None, site: Optional[str] = None) -> str:
+        """以韌性策略送出 chat completion（每次嘗試的逾時由剩餘期限決定）"""
+        usage_site = site or 'unrouted'
+        # 實際請求在 llm_resilience 的執行緒中送出（不會帶入 contextvars），標籤需先在此取得
+        labels = _call_labels(usage_site, params["model"])
+        answered: Dict[str, Any] = {}
+
+        def call(model: str, timeout: float) -> str:
+            started = time.monotonic()
+            response = self.client.chat.completions.create(**{**params, "model": model}, timeout=timeout)
+            # 對沖請求也會計費，因此每個完成的請求都計入用量
+            usage = getattr(response, 'usage', None)
+            _record_usage(usage_site, model, usage, time.monotonic() - started)
+            if usage is not None:
+                _record_tokens({**labels, 'model': model}, usage)
+                logger.debug("Tokens: prompt=%s (cached=%s), completion=%s", usage.prompt_tokens, cached_tokens(usage), usage.completion_tokens)
+            answered.update(model=model, usage=usage)
+            return (response.choices[0].message.content or "").strip()
+
+        started = time.monotonic()
+        try:
+            # 先取得准入名額（負載過高時拋出 LLMOverloadedError），延遲從取得名額後開始計算
+            with admit(site=usage_site):
+                started = time.monotonic()
+                with span(f"llm.{usage_site}", "llm", site=usage_site, model=params["model"]) as current:
+                    content = resilient_call(call, params["model"], self.fallback_model, policy)
+                    if current is not None:
+                        usage = answered.get('usage')
+                        current.set(
+                            model=answered.get('model', params["model"]),
+                            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+                            cached_tokens=cached_tokens(usage) if usage is not None else None,
+                            completion_tokens=getattr(usage, 'completion_tokens', None),
+                        )
+        except LLMOverloadedError:
+            # 呼叫未送出，不計入用量與延遲
+            _llm_calls.inc(**labels, status='shed')
+            raise
+        except Exception as e:
+            _record_usage(usage_site, params["model"], error=True)
+            status = 'unavailable' if isinstance(e, LLMUnavailableError) else 'error'
+            _record_call(labels, time.monotonic() - started, status, error=e)
+            raise
+        _record_call(
+            {**labels, 'model': answered.get('model', params["model"])},
+            time.monotonic() - started,
+            'ok',
+            usage=answered.get('usage'),
+        )
+        return content
+
+    def guarded(self, system_prompt: str, user_prompt: str, temperature: float = 0.7, max_tokens: int = 1000, include_answer: bool = True, default_refusal: str = '', site: Optional[str] = None) -> Dict[str, str]:
+        """
+        單次呼叫同時完成內容審核與回答（取代「先審核、再回答」的兩次呼叫）
+
+        system_prompt 需包含全域規則；模型依規則判斷使用者問題是否違規：
+        - 違規：verdict 為 "refuse"，refusal_text 為規則指定的固定回應
+        - 允許：verdict 為 "allow"，answer 為回答內容
+
+        Args:
+            include_answer: False 時只審核（answer 留空，用於高負載時略過生成）
+            default_refusal: 模型判定違規但沒有給出拒絕文字時使用
+            site: 呼叫點（見 MODEL_ROUTES）
+
+        Returns:
+            {"verdict": "allow" | "refuse", "refusal_text": str, "answer": str}
+        """
+        answer_rule = '否則 verdict 為 "allow"，refusal_text 為空字串，answer 為你的回答。' if include_answer else '否則 verdict 為 "allow"，refusal_text 與 answer 皆為空字串（只需審核，不需回答）。'
+        output_rules = f"""【輸出格式】
+請先依上述規則審核使用者的問題，再以 JSON 回覆：
+若問題違反規則，verdict 為 "refuse"，refusal_text 為規則指定的固定回應，answer 為空字串；
+{answer_rule}"""
+
+        raw = self.structured(
+            f"{system_prompt}\n\n{output_rules}",
+            user_prompt,
+            response_format=GUARDED_RESPONSE_FORMAT,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            site=site,
+        )
+        data = json.loads(raw)
+
+        verdict = 'refuse' if data.get('verdict') == 'refuse' else 'allow'
+        result = {
+            'verdict': verdict,
+            'refusal_text': (data.get('refusal_text') or '').strip(),
+            'answer': (data.get('answer') or '').strip(),
+        }
+        if verdict == 'refuse' and not result['refusal_text']:
+            result['refusal_text'] = default_refusal
+        return result
+
 
+# 審核 + 回答的結構化輸出格式
+GUARDED_RESPONSE_FORMAT: Dict[str, Any] = {
+    'type': 'json_schema',
+    'json_schema': {
+        'name': 'guarded_answer',
+        'strict': True,
+        'schema': {
+            'type': 'object',
+            'properties': {
+                'verdict': {'type': 'string', 'enum': ['allow', 'refuse']},
+                'refusal_text': {'type': 'string'},
+                'answer': {'type': 'string'},
+            },
+            'required': ['verdict', 'refusal_text', 'answer'],
+            'additionalProperties': False,
+        },
+    },
+}
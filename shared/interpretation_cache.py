@@ -0,0 +1,323 @@
+"""
+解讀結果快取（共享基礎設施）
+輸入空間很小、重複度很高的解讀（例如天使數字 111、1111 搭配固定語氣），
+不必每次都呼叫 LLM：
+
+- 以 (數字/結果, 模式, 語氣, 版本, 全域規則雜湊…) 當作快取鍵
+- 每個鍵保存多個「不含姓名」的版本（變體），姓名以 NAME_SLOT 佔位，回應時才填入
+- 本機 LRU + TTL 快取在前，Redis 在後，多個 worker 共用同一批變體
+- 防止快取擊穿：同一個冷鍵只有一個呼叫者真正生成（本機鎖 + Redis SET NX），
+  其他呼叫者等待結果
+- 變體數不足時於背景補齊，不影響當次回應
+- Redis 不可用時自動退回只用本機快取
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .logger import get_logger
+from .refresh_cache import content_hash
+from .ttl_cache import TTLCache
+
+logger = get_logger(__name__)
+
+# 姓名佔位符：生成時要求 LLM 原樣保留，回應時替換成使用者姓名
+NAME_SLOT = "{{name}}"
+
+# 快取設定
+INTERPRETATION_CACHE_TTL = int(os.getenv("INTERPRETATION_CACHE_TTL", 86400))  # Redis 保存 1 天
+INTERPRETATION_VARIANTS = int(os.getenv("INTERPRETATION_VARIANTS", 3))  # 每個鍵的變體數
+LOCAL_CACHE_TTL = 300  # 本機快取 5 分鐘（之後重新讀取 Redis，取得其他 worker 補上的變體）
+LOCAL_CACHE_MAX_KEYS = 512
+GENERATION_LOCK_TTL = 60  # 生成鎖的最長持有秒數
+WAIT_TIMEOUT = 30  # 等待其他呼叫者生成的最長秒數
+WAIT_POLL_INTERVAL = 0.2
+REDIS_RETRY_INTERVAL = 30  # Redis 連線失敗後暫停使用的秒數
+
+
+def render_name(text: str, name: Optional[str]) -> str:
+    """將變體中的姓名佔位符替換成使用者姓名"""
+    return text.replace(NAME_SLOT, name or "你")
+
+
+class InterpretationCache:
+    """多變體的解讀快取"""
+
+    def __init__(
+        self,
+        namespace: str,
+        variants: int = INTERPRETATION_VARIANTS,
+        ttl: int = INTERPRETATION_CACHE_TTL,
+    ):
+        """
+        Args:
+            namespace: 命名空間（模組名稱，用於區分 Redis key）
+            variants: 每個鍵保存的變體數
+            ttl: Redis 中變體的保存秒數
+        """
+        self.namespace = namespace
+        self.variants = max(1, variants)
+        self.ttl = ttl
+
+        self._local = TTLCache(max_entries=LOCAL_CACHE_MAX_KEYS, ttl=LOCAL_CACHE_TTL)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._filling: set = set()
+        self._redis = None
+        self._redis_retry_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- 公開介面 ----------
+
+    def make_key(self, **parts) -> str:
+        """由快取鍵的組成部分產生 Redis key"""
+        return f"interp:{self.namespace}:{content_hash(parts)}"
+
+    def get_variants(self, key: str) -> List[str]:
+        """目前已保存的變體（本機快取優先）"""
+        variants = self._local.get(key)
+        if variants is not None:
+            return variants
+        variants = self._redis_variants(key)
+        if variants:
+            self._local.set(key, variants)
+        return variants
+
+    def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], str],
+        validate: Optional[Callable[[str], bool]] = None,
+        fill: bool = True,
+    ) -> str:
+        """
+        取得一個變體；沒有任何變體時生成一個（同一個鍵同時只生成一次）
+
+        Args:
+            key: make_key 產生的快取鍵
+            generate: 生成一個不含姓名變體的函數（失敗時拋出例外）
+            validate: 判斷生成結果是否可以保存（例如必須包含 NAME_SLOT），不通過時只用於當次回應
+            fill: 變體數不足時是否在背景補齊
+
+        Returns:
+            變體文字（仍含 NAME_SLOT，呼叫端以 render_name 填入姓名）
+        """
+        variants = self.get_variants(key)
+        if variants:
+            self.hits += 1
+            if fill and len(variants) < self.variants:
+                self._fill_in_background(key, generate, validate)
+            return random.choice(variants)
+
+        self.misses += 1
+        return self._generate_once(key, generate, validate)
+
+    def add_variant(
+        self, key: str, text: str, validate: Optional[Callable[[str], bool]] = None
+    ):
+        """直接加入一個變體（預先生成、暖快取時使用）"""
+        self._store(key, text, validate)
+
+    def invalidate(self, key: str):
+        """刪除指定鍵的所有變體"""
+        self._local.pop(key)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.delete(key)
+            except Exception as e:
+                self._redis_error(e)
+
+    # ---------- 內部實作 ----------
+
+    def _generate_once(
+        self,
+        key: str,
+        generate: Callable[[], str],
+        validate: Optional[Callable[[str], bool]],
+    ) -> str:
+        """冷鍵生成：本機只有一個執行緒、跨 worker 只有一個持有 Redis 鎖的呼叫者會生成"""
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait(WAIT_TIMEOUT)
+            variants = self.get_variants(key)
+            # 生成者失敗或結果不可保存時，自行生成（不保存）
+            return random.choice(variants) if variants else generate()
+
+        token = None
+        try:
+            token = self._acquire_remote_lock(key)
+            if token is None:
+                # 其他 worker 正在生成，等待其結果
+                variants = self._wait_for_remote(key)
+                if variants:
+                    return random.choice(variants)
+            text = generate()
+            self._store(key, text, validate)
+            return text
+        finally:
+            if token is not None:
+                self._release_remote_lock(key, token)
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _fill_in_background(
+        self,
+        key: str,
+        generate: Callable[[], str],
+        validate: Optional[Callable[[str], bool]],
+    ):
+        """背景補一個變體（同一個鍵同時只有一個補齊工作）"""
+        with self._lock:
+            if key in self._filling or key in self._inflight:
+                return
+            self._filling.add(key)
+
+        def _run():
+            try:
+                token = self._acquire_remote_lock(key, suffix="fill")
+                if token is None:
+                    return
+                try:
+                    self._store(key, generate(), validate)
+                finally:
+                    self._release_remote_lock(key, token, suffix="fill")
+            except Exception as e:
+                logger.warning("[%s] 背景補齊變體失敗: %s", self.namespace, e)
+            finally:
+                with self._lock:
+                    self._filling.discard(key)
+
+        threading.Thread(
+            target=_run, name=f"interp-fill-{self.namespace}", daemon=True
+        ).start()
+
+    def _store(self, key: str, text: str, validate: Optional[Callable[[str], bool]]):
+        """保存變體（本機與 Redis；超過變體數上限時保留最新的）"""
+        if not text or (validate is not None and not validate(text)):
+            return
+        variants = [v for v in self.get_variants(key) if v != text] + [text]
+        variants = variants[-self.variants:]
+        self._local.set(key, variants)
+
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline()
+            pipe.rpush(key, json.dumps(text, ensure_ascii=False))
+            pipe.ltrim(key, -self.variants, -1)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            self._redis_error(e)
+
+    def _wait_for_remote(self, key: str) -> List[str]:
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            variants = self._redis_variants(key)
+            if variants:
+                self._local.set(key, variants)
+                return variants
+            if not self._remote_lock_held(key):
+                break
+            time.sleep(WAIT_POLL_INTERVAL)
+        return []
+
+    # ---------- Redis ----------
+
+    def _get_redis(self):
+        """取得 Redis 客戶端；連線失敗後一段時間內不再嘗試"""
+        if self._redis is not None:
+            return self._redis
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            from .redis_client import get_redis_client
+
+            self._redis = get_redis_client()
+        except Exception as e:
+            self._redis_error(e)
+        return self._redis
+
+    def _redis_error(self, error: Exception):
+        logger.warning("[%s] Redis 不可用，改用本機快取: %s", self.namespace, error)
+        self._redis = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def _redis_variants(self, key: str) -> List[str]:
+        client = self._get_redis()
+        if client is None:
+            return []
+        try:
+            return [json.loads(item) for item in client.lrange(key, 0, -1)]
+        except Exception as e:
+            self._redis_error(e)
+            return []
+
+    def _acquire_remote_lock(self, key: str, suffix: str = "gen") -> Optional[str]:
+        """
+        取得跨 worker 的生成鎖（Redis 不可用時視為取得）
+
+        Returns:
+            釋放鎖需要的 token；其他 worker 持有鎖時為 None
+        """
+        token = uuid.uuid4().hex
+        client = self._get_redis()
+        if client is None:
+            return token
+        try:
+            if client.set(f"lock:{key}:{suffix}", token, nx=True, ex=GENERATION_LOCK_TTL):
+                return token
+            return None
+        except Exception as e:
+            self._redis_error(e)
+            return token
+
+    def _release_remote_lock(self, key: str, token: str, suffix: str = "gen"):
+        """只釋放自己持有的鎖（生成超過 GENERATION_LOCK_TTL 後鎖可能已被其他 worker 取得）"""
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            from .redis_client import release_lock
+
+            release_lock(client, f"lock:{key}:{suffix}", token)
+        except Exception as e:
+            self._redis_error(e)
+
+    def _remote_lock_held(self, key: str) -> bool:
+        client = self._get_redis()
+        if client is None:
+            return False
+        try:
+            return bool(client.exists(f"lock:{key}:gen"))
+        except Exception as e:
+            self._redis_error(e)
+            return False
+
+
+_caches: Dict[str, InterpretationCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_interpretation_cache(namespace: str) -> InterpretationCache:
+    """獲取指定命名空間的解讀快取 (Singleton)"""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = InterpretationCache(namespace)
+        return cache
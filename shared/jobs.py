@@ -0,0 +1,199 @@
+"""
+非同步工作（共享基礎設施）
+長篇解讀、付費版總結等耗時的對話回合可以改為背景工作，連線不必等到生成完成：
+
+- 送出時立即返回 job_id，實際處理在有上限的 worker pool 中執行
+- 等待中的工作數超過 JOB_MAX_PENDING 時拒絕新工作（由呼叫端返回 503），限制同時進行的 LLM 工作量
+- 工作狀態與結果保存在 Redis（job:{id}，保存 JOB_RESULT_TTL 秒），任何 instance 都能查詢
+- 同一個會話同時只能有一個工作（job:active:{會話}，值為 job_id），避免兩個回合同時改寫會話；
+  同步處理的回合也會檢查此鎖（active_job）。鎖只由持有的工作釋放（compare-and-delete），
+  JOB_LOCK_TTL 只是鎖的有效期，不會中止執行中的工作
+- wait() 支援長輪詢：本 instance 的工作以事件通知，其他 instance 的工作定期讀取 Redis
+
+使用方式：
+    jobs = get_job_manager()
+    job = jobs.submit(run, owner="lifenum:paid:abc123")
+    jobs.wait(job["job_id"], timeout=20)
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .logger import get_logger
+from .metrics import get_metrics_registry
+from .redis_client import get_redis_client, release_lock
+
+logger = get_logger(__name__)
+
+# 設定（可用環境變數調整）
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 8))  # 同時執行的工作數
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 64))  # 執行中 + 排隊中的工作上限
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))  # 結果保存秒數
+# 會話鎖的有效期（秒）：只用於工作異常中斷時自動解鎖，不會中止執行中的工作，
+# 應大於單一回合的最長處理時間（各次 LLM 呼叫的期限合計）
+JOB_LOCK_TTL = int(os.getenv("JOB_LOCK_TTL", 300))
+JOB_POLL_INTERVAL = 0.5  # 長輪詢讀取 Redis 的間隔
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+_metrics = get_metrics_registry()
+_jobs_total = _metrics.counter("jobs_total", "背景工作數（依結果）", ("kind", "status"))
+_job_duration = _metrics.histogram("job_duration_seconds", "背景工作執行秒數", ("kind",))
+_job_queue_wait = _metrics.histogram("job_queue_wait_seconds", "背景工作排隊秒數", ("kind",))
+
+
+class JobRejectedError(RuntimeError):
+    """工作佇列已滿"""
+
+
+class JobConflictError(RuntimeError):
+    """同一個會話已有進行中的工作"""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"會話已有進行中的工作: {job_id}")
+        self.job_id = job_id
+
+
+class JobManager:
+    """背景工作的送出、執行與查詢"""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Redis ----------
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    @staticmethod
+    def _owner_key(owner: str) -> str:
+        return f"job:active:{owner}"
+
+    def _save(self, job: Dict[str, Any]):
+        get_redis_client().setex(
+            self._key(job["job_id"]), JOB_RESULT_TTL, json.dumps(job, ensure_ascii=False)
+        )
+
+    def active_job(self, owner: str) -> Optional[str]:
+        """會話目前進行中的工作 id（沒有時返回 None）"""
+        return get_redis_client().get(self._owner_key(owner))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """讀取工作狀態（不存在或已過期時返回 None）"""
+        raw = get_redis_client().get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    # ---------- 送出與執行 ----------
+
+    def submit(
+        self,
+        run: Callable[[], Tuple[Any, int]],
+        owner: Optional[str] = None,
+        kind: str = "default",
+    ) -> Dict[str, Any]:
+        """
+        送出工作
+
+        Args:
+            run: 在 worker 中執行，返回 (結果, HTTP 狀態碼)
+            owner: 工作所屬的會話（同一會話同時只允許一個工作）
+            kind: 指標用的工作類型（例如 blueprint 名稱）
+
+        Raises:
+            JobRejectedError: 佇列已滿
+            JobConflictError: 會話已有進行中的工作
+        """
+        if not self._slots.acquire(blocking=False):
+            _jobs_total.inc(kind=kind, status="rejected")
+            raise JobRejectedError("背景工作已達上限")
+
+        job_id = uuid.uuid4().hex
+        try:
+            if owner:
+                client = get_redis_client()
+                if not client.set(self._owner_key(owner), job_id, nx=True, ex=JOB_LOCK_TTL):
+                    raise JobConflictError(client.get(self._owner_key(owner)) or "")
+            job = {"job_id": job_id, "status": PENDING, "kind": kind, "created_at": time.time()}
+            self._save(job)
+            with self._lock:
+                self._events[job_id] = threading.Event()
+            self._executor.submit(self._run, job, run, owner)
+        except BaseException:
+            self._slots.release()
+            raise
+        _jobs_total.inc(kind=kind, status="submitted")
+        return job
+
+    def _run(self, job: Dict[str, Any], run: Callable[[], Tuple[Any, int]], owner: Optional[str]):
+        kind = job["kind"]
+        started = time.time()
+        _job_queue_wait.observe(started - job["created_at"], kind=kind)
+        try:
+            self._save({**job, "status": RUNNING, "started_at": started})
+            result, status_code = run()
+            job.update(status=DONE, result=result, status_code=status_code)
+        except Exception as e:
+            logger.exception("背景工作 %s 失敗: %s", job["job_id"], e)
+            job.update(status=FAILED, error="處理過程發生錯誤，請稍後再試", status_code=500)
+        finally:
+            job.update(started_at=started, finished_at=time.time())
+            _job_duration.observe(job["finished_at"] - started, kind=kind)
+            _jobs_total.inc(kind=kind, status=job["status"])
+            try:
+                self._save(job)
+                if owner:
+                    # 只刪除自己的鎖（執行超過 JOB_LOCK_TTL 時鎖可能已屬於較新的工作）
+                    release_lock(get_redis_client(), self._owner_key(owner), job["job_id"])
+            except Exception as e:
+                logger.error("背景工作 %s 結果保存失敗: %s", job["job_id"], e)
+            with self._lock:
+                event = self._events.pop(job["job_id"], None)
+            if event is not None:
+                event.set()
+            self._slots.release()
+
+    # ---------- 長輪詢 ----------
+
+    def wait(self, job_id: str, timeout: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        等待工作完成（最多 timeout 秒），返回最新狀態
+
+        Returns:
+            工作狀態；工作不存在時返回 None
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED or remaining <= 0:
+                return job
+            with self._lock:
+                event = self._events.get(job_id)
+            if event is not None:
+                event.wait(remaining)
+            else:
+                time.sleep(min(JOB_POLL_INTERVAL, remaining))
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """獲取背景工作管理器 (Singleton)"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
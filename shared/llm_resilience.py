@@ -0,0 +1,328 @@
+"""
+LLM 呼叫韌性層（共享基礎設施）
+讓供應商偶發的逾時、限流、5xx 不直接變成使用者看到的錯誤：
+
+- 每次呼叫有總期限（deadline），每次嘗試的逾時不超過剩餘時間
+- 可重試的錯誤以指數退避 + 隨機抖動重試
+- 可選的對沖請求（hedging）：第一個請求超過近期 p95 延遲仍未完成時，再送出一個相同請求，取先完成者
+- 斷路器：模型連續失敗時進入斷開狀態，期間直接改用備用模型（OPENAI_FALLBACK_MODEL）
+  或立即拋出 LLMUnavailableError，讓呼叫端改用快取或模板回應
+- 每次嘗試的結果都會記錄到統計（get_llm_stats）
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 預設設定（可用環境變數調整）
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", 60))  # 單次呼叫總期限（秒）
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3))
+LLM_RETRY_BASE_DELAY = 0.5  # 第一次重試前的退避秒數上限（之後加倍）
+LLM_RETRY_MAX_DELAY = 8
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 2))  # 對沖前至少等待的秒數
+LLM_HEDGE_MIN_SAMPLES = 20  # 近期延遲樣本不足時不對沖
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", 5))  # 連續失敗幾次後斷開
+BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET", 30))  # 斷開多久後允許試探
+
+LATENCY_WINDOW = 200  # 每個模型保留的延遲樣本數
+
+# 同時送出的 LLM 請求上限（gevent 模式下執行緒是 greenlet，可以放寬到數百個）
+SERVING_MODE = os.getenv("SERVING_MODE", "gthread").lower()
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", 512 if SERVING_MODE == "gevent" else 32))
+
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_INFLIGHT, thread_name_prefix="llm-call")
+
+
+class LLMUnavailableError(RuntimeError):
+    """所有嘗試都失敗，或斷路器斷開且沒有可用的備用模型"""
+
+
+@dataclass
+class CallPolicy:
+    """單次呼叫的韌性設定"""
+
+    deadline: float = LLM_DEADLINE
+    max_attempts: int = LLM_MAX_ATTEMPTS
+    hedge: bool = LLM_HEDGE
+
+
+# ---------- 錯誤分類 ----------
+
+
+def _error_names(error: BaseException) -> List[str]:
+    return [cls.__name__ for cls in type(error).__mro__]
+
+
+def is_retryable(error: BaseException) -> bool:
+    """逾時、連線錯誤、限流與 5xx 可以重試；參數錯誤、認證錯誤等不重試"""
+    names = _error_names(error)
+    if any(
+        name in names
+        for name in (
+            "TimeoutError",
+            "APITimeoutError",
+            "APIConnectionError",
+            "RateLimitError",
+            "InternalServerError",
+            "ConnectionError",
+        )
+    ):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+# ---------- 延遲統計與斷路器 ----------
+
+
+class LatencyTracker:
+    """每個模型最近的成功延遲（用於計算對沖延遲）"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self.window = window
+
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """連續失敗達門檻時斷開；斷開一段時間後放行一個試探請求（半開）"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """是否允許送出請求（半開時只放行一個試探請求）"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("斷路器 %s 恢復", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._probing
+            self._probing = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                logger.warning("斷路器 %s 斷開（連續失敗 %d 次）", self.name, self._failures)
+
+
+_latency = LatencyTracker()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(model)
+        return breaker
+
+
+def _record(model: str, outcome: str, seconds: Optional[float] = None):
+    """記錄一次嘗試（outcome: success / error / timeout / retry / hedge / hedge_win / breaker_open / fallback）"""
+    with _stats_lock:
+        stats = _stats.setdefault(model, {})
+        stats[outcome] = stats.get(outcome, 0) + 1
+        if seconds is not None:
+            stats["latency_total"] = stats.get("latency_total", 0.0) + seconds
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """每個模型的嘗試統計、斷路器狀態與近期延遲"""
+    with _stats_lock:
+        snapshot = {model: dict(stats) for model, stats in _stats.items()}
+    for model, stats in snapshot.items():
+        stats["breaker"] = get_breaker(model).state
+        stats["p50"] = _latency.percentile(model, 0.5)
+        stats["p95"] = _latency.percentile(model, 0.95)
+    return snapshot
+
+
+# ---------- 呼叫 ----------
+
+
+def _hedge_delay(model: str) -> Optional[float]:
+    p95 = _latency.percentile(model, 0.95)
+    if p95 is None:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY, p95)
+
+
+def _attempt(call: Callable[[str, float], Any], model: str, timeout: float, hedge: bool) -> Any:
+    """
+    單次嘗試（可能包含一個對沖請求）
+
+    Raises:
+        TimeoutError: 在 timeout 內沒有任何請求成功
+        其他例外：請求失敗
+    """
+    started = time.monotonic()
+    primary = _executor.submit(call, model, timeout)
+    futures = [primary]
+    delay = _hedge_delay(model) if hedge else None
+    hedged = False
+    last_error: Optional[BaseException] = None
+
+    while futures:
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        wait_for = remaining
+        if delay is not None and not hedged:
+            wait_for = min(remaining, max(0.0, delay - (time.monotonic() - started)))
+        done, pending = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            elapsed = time.monotonic() - started
+            _latency.record(model, elapsed)
+            _record(model, "success", elapsed)
+            if future is not primary:
+                _record(model, "hedge_win")
+            return result
+
+        futures = list(pending)
+        if not futures and last_error is not None:
+            raise last_error
+        if delay is not None and not hedged and time.monotonic() - started >= delay:
+            # 第一個請求超過 p95 仍未完成，送出對沖請求（先完成者勝出，另一個在背景結束）
+            hedged = True
+            _record(model, "hedge")
+            futures.append(_executor.submit(call, model, max(0.1, timeout - delay)))
+
+    if last_error is not None and not futures:
+        raise last_error
+    raise TimeoutError(f"LLM 呼叫在 {timeout:.1f} 秒內未完成")
+
+
+def _call_model(call: Callable[[str, float], Any], model: str, policy: CallPolicy, deadline_at: float) -> Any:
+    breaker = get_breaker(model)
+    last_error: Optional[BaseException] = None
+
+    for attempt in range(1, policy.max_attempts + 1):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+        if not breaker.allow():
+            _record(model, "breaker_open")
+            raise LLMUnavailableError(f"模型 {model} 的斷路器已斷開")
+
+        started = time.monotonic()
+        try:
+            result = _attempt(call, model, remaining, policy.hedge)
+            breaker.record_success()
+            return result
+        except Exception as e:
+            last_error = e
+            elapsed = time.monotonic() - started
+            retryable = is_retryable(e)
+            _record(model, "timeout" if isinstance(e, TimeoutError) else "error", elapsed)
+            if not retryable:
+                # 參數錯誤等代表服務有回應，不計入斷路器
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            logger.warning("%s 第 %d 次嘗試失敗（%.1fs）: %s: %s", model, attempt, elapsed, type(e).__name__, e)
+
+        if attempt < policy.max_attempts:
+            delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+            if time.monotonic() + delay >= deadline_at:
+                break
+            _record(model, "retry")
+            time.sleep(delay)
+
+    raise LLMUnavailableError(f"模型 {model} 呼叫失敗: {last_error}") from last_error
+
+
+def resilient_call(
+    call: Callable[[str, float], Any],
+    model: str,
+    fallback_model: Optional[str] = None,
+    policy: Optional[CallPolicy] = None,
+) -> Any:
+    """
+    以韌性策略執行 LLM 呼叫
+
+    Args:
+        call: 實際呼叫函數 call(model, timeout)，失敗時拋出例外
+        model: 主要模型
+        fallback_model: 主要模型不可用（斷路器斷開或重試用盡）時改用的模型
+        policy: 期限、重試與對沖設定
+
+    Raises:
+        LLMUnavailableError: 主要與備用模型都不可用
+        其他例外：不可重試的錯誤（例如參數錯誤）直接拋出
+    """
+    policy = policy or CallPolicy()
+    deadline_at = time.monotonic() + policy.deadline
+    try:
+        return _call_model(call, model, policy, deadline_at)
+    except LLMUnavailableError:
+        if not fallback_model or fallback_model == model or time.monotonic() >= deadline_at:
+            raise
+        _record(model, "fallback")
+        logger.warning("%s 不可用，改用備用模型 %s", model, fallback_model)
+        return _call_model(call, fallback_model, policy, deadline_at)
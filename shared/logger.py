@@ -0,0 +1,227 @@
+"""
+結構化日誌（共享基礎設施）
+以標準 logging 搭配佇列，請求執行緒只把紀錄放入佇列，格式化與寫出由背景執行緒處理：
+
+- LOG_LEVEL 控制等級（預設 INFO，DEBUG 輸出預設關閉）
+- LOG_FORMAT=json（預設）每行一筆 JSON，text 為人工閱讀用的單行格式
+- 每筆紀錄自動帶上請求上下文（request_id、blueprint、版本），在呼叫端執行緒取得
+- 高頻事件以 extra=sampled() 標記，只保留 LOG_SAMPLE_RATE 比例（WARNING 以上不取樣）
+- 輸出前遮蔽個資：生日日期、Email、電話號碼，以及 fields 中的敏感欄位
+- 佇列滿時直接丟棄紀錄，不阻塞請求
+
+使用方式：
+    logger = get_logger(__name__)
+    logger.info("保存會話 %s", key, extra=sampled())
+    logger.warning("對帳失敗", extra=fields(table=table, error=str(e)))
+
+CLI 工具的輸出（python -m ...）仍使用 print。
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .request_context import get_request_context
+
+# 設定（可用環境變數調整）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" / "text"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.1))
+LOG_REDACT = os.getenv("LOG_REDACT", "true").lower() in ("1", "true", "yes")
+
+LOG_QUEUE_SIZE = 10000  # 待寫出的紀錄上限（超過時丟棄）
+
+# 每次 HTTP 請求都會輸出 INFO 的第三方套件（只保留 WARNING 以上）
+NOISY_LOGGERS = ("httpx", "httpcore", "openai", "urllib3", "hpack")
+
+# 內容一律遮蔽的欄位（fields 中的鍵）
+SENSITIVE_FIELDS = frozenset(
+    {"birthdate", "birthday", "birth_date", "name", "user_name", "email", "phone", "message", "question", "content"}
+)
+
+# 文字中的個資：生日日期（含民國年與中文年月日）、Email、電話號碼
+_REDACT_PATTERNS = (
+    (re.compile(r"\b(?:19|20)\d{2}[-/.](?:0?[1-9]|1[0-2])[-/.](?:0?[1-9]|[12]\d|3[01])\b"), "[DATE]"),
+    (re.compile(r"\b(?:19|20)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\b"), "[DATE]"),
+    (re.compile(r"(?:19|20)?\d{2,3}\s*年\s*\d{1,2}\s*月\s*\d{1,2}\s*[日號]"), "[DATE]"),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "[EMAIL]"),
+    (re.compile(r"(?:\+?886[-\s]?|\b0)9\d{2}[-\s]?\d{3}[-\s]?\d{3}\b"), "[PHONE]"),
+)
+
+# LogRecord 的內建屬性（其餘屬性視為 extra）
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+
+def sampled(rate: Optional[float] = None) -> Dict[str, Any]:
+    """高頻事件的 extra：只保留 rate（預設 LOG_SAMPLE_RATE）比例的紀錄"""
+    return {"sample_rate": LOG_SAMPLE_RATE if rate is None else rate}
+
+
+def fields(**values: Any) -> Dict[str, Any]:
+    """結構化欄位的 extra（JSON 輸出時放在 fields 之下）"""
+    return {"fields": values}
+
+
+def redact(text: str) -> str:
+    if not LOG_REDACT:
+        return text
+    for pattern, replacement in _REDACT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _redact_value(key: str, value: Any) -> Any:
+    if not LOG_REDACT or value is None:
+        return value
+    if key.lower() in SENSITIVE_FIELDS:
+        return "[REDACTED]"
+    if isinstance(value, str):
+        return redact(value)
+    return value
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """fields() 與其他 extra 屬性（已遮蔽）"""
+    extra = dict(getattr(record, "fields", None) or {})
+    extra.update(
+        (key, value)
+        for key, value in record.__dict__.items()
+        if key not in _RECORD_ATTRIBUTES and key not in ("context", "fields", "sample_rate")
+    )
+    return {key: _redact_value(key, value) for key, value in extra.items()}
+
+
+class SamplingFilter(logging.Filter):
+    """依紀錄的 sample_rate 取樣（WARNING 以上一律保留）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < rate
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    放入佇列前只做必要的處理（在呼叫端執行緒）：
+    合併訊息參數、取出例外堆疊與請求上下文；格式化與遮蔽留給背景執行緒
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.context = get_request_context()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """每行一筆 JSON：ts、level、logger、msg、請求上下文與 fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+        }
+        data.update(getattr(record, "context", None) or {})
+        extra = _extra_fields(record)
+        if extra:
+            data["fields"] = extra
+        if record.exc_text:
+            data["exc"] = redact(record.exc_text)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """人工閱讀用的單行格式"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record)} {record.levelname} [{record.name}] {redact(record.getMessage())}"
+        context = getattr(record, "context", None) or {}
+        if context.get("request_id"):
+            line += f" request_id={context['request_id']}"
+        for key, value in _extra_fields(record).items():
+            line += f" {key}={value}"
+        if record.exc_text:
+            line += "\n" + redact(record.exc_text)
+        return line
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[ContextQueueHandler] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(force: bool = False):
+    """
+    設定根 logger：佇列 handler + 背景寫出 stdout（只執行一次）
+
+    Args:
+        force: 重新設定（例如測試時改變 LOG_LEVEL 後）
+    """
+    global _listener, _handler
+    with _configure_lock:
+        if _handler is not None and not force:
+            return
+        shutdown_logging()
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JSONFormatter())
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+
+        handler = ContextQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        if _handler is not None:
+            root.removeHandler(_handler)
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        for name in NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        _handler = handler
+
+
+def shutdown_logging():
+    """寫出佇列中剩餘的紀錄（程序結束時自動執行）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """取得模組的 logger（第一次呼叫時完成設定）"""
+    if _handler is None:
+        configure_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,646 @@
+"""
+Prompt 大小量測（離線）
+以本機參考資料快照組出所有 prompt 範本的每一種變體，計算 token 數並與基準比較：
+
+- 生命靈數：模組 × 數字（含核心數的類別、九宮格連線組合）× 版本 × 語氣
+- 天使數字：意義表中的數字與每種模式的代表數字 × 版本 × 語氣，以及追問
+- 擲筊：單次結果、三次組合 × 神明語氣，以及安全檢查、追問與個人化
+- 黃道吉日：每個月份的整月黃曆與單日紀錄 × 語氣，以及追問與候選日期說明
+
+靜態段落（rules / task / tone / reference）來自範本的 builder，與線上完全相同；
+請求時才接上的動態段落使用固定的樣本文字，數字可以跨版本比較，但不代表實際分佈。
+
+token 數以 tiktoken（OPENAI_MODEL 對應的編碼）計算；未安裝 tiktoken 時改用估算（標記為 estimate），
+基準與目前結果的計算方式不同時不會比較。
+
+使用方式（需先匯出 data/reference_snapshot.json）：
+    python -m shared.prompt_benchmark run                 # 列出各範本與各段落的 token 數
+    python -m shared.prompt_benchmark run --json report.json
+    python -m shared.prompt_benchmark check               # 與基準比較，超過容許幅度時返回 1
+    python -m shared.prompt_benchmark update              # 以目前結果更新基準
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from itertools import combinations
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from .prompt_builder import SEGMENT_ORDER, normalize_segment
+from .prompt_templates import compile_prompt, get_prompt_registry
+from .reference_snapshot import get_reference_store, get_snapshot_path, reference_tables
+
+BASELINE_FORMAT = "life-number-prompt-baseline"
+BASELINE_FORMAT_VERSION = 1
+
+# 基準檔案位置（相對路徑以專案根目錄為準）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_PATH = os.path.join(_PROJECT_ROOT, "data", "prompt_baseline.json")
+
+DEFAULT_TOLERANCE = 0.05  # 超過基準 5% 視為退步
+DEFAULT_ENCODING = "o200k_base"  # gpt-4o 系列
+
+# 資料庫讀取失敗時 builder 返回的錯誤提示（出現時代表快照不完整，結果不可作為基準）
+ERROR_MARKER = "（系統錯誤"
+
+# 動態段落的樣本
+SAMPLE_NAME = "王小明"
+SAMPLE_ZODIAC = "馬"
+SAMPLE_QUESTION = "我最近在考慮換工作，現在是適合的時機嗎？"
+SAMPLE_HISTORY = [
+    ("user", "我最近常常看到這組數字，代表什麼意思？"),
+    ("assistant", "這組數字提醒你留意內在的聲音，最近的選擇會影響接下來的方向。"),
+    ("user", "那在工作上我應該注意什麼？"),
+    ("assistant", "可以先整理手邊的計畫，把重心放在自己真正想投入的事情上。"),
+]
+CORE_CATEGORIES = ("財運事業", "家庭人際", "自我成長", "目標規劃")
+NARRATE_CANDIDATES = 5
+
+# 生命靈數各模組的參考資料表（依表中的數字列舉變體）
+LIFENUM_NUMBER_TABLES = {
+    "core": "lifenum_main",
+    "birthday": "lifenum_birthday",
+    "year": "lifenum_personal_year",
+    "soul": "lifenum_soul",
+    "personality": "lifenum_personality",
+    "expression": "lifenum_expression",
+    "maturity": "lifenum_maturity",
+    "challenge": "lifenum_challenge",
+    "karma": "lifenum_karma",
+}
+
+
+@dataclass(frozen=True)
+class PromptSample:
+    """一個要量測的 prompt 變體"""
+
+    template: str
+    key: Tuple[Hashable, ...]
+    label: str
+    dynamic: Dict[str, str] = field(default_factory=dict)
+
+
+# ---------- token 計算 ----------
+
+_CJK = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """沒有 tokenizer 時的估算：中日韓與全形字元各算 1 個，其他字元每 4 個算 1 個"""
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class TokenCounter:
+    """token 計數（相同文字只計算一次）"""
+
+    def __init__(self, model: Optional[str] = None):
+        self.name, self._count = self._load(model or os.getenv("OPENAI_MODEL", "gpt-4o"))
+        self._cache: Dict[str, int] = {}
+
+    @staticmethod
+    def _load(model: str) -> Tuple[str, Callable[[str], int]]:
+        try:
+            import tiktoken
+        except ImportError:
+            return "estimate", estimate_tokens
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+        except Exception as e:
+            # 編碼檔需要下載且目前離線
+            print(f"[PromptBenchmark] 無法載入 tiktoken 編碼，改用估算: {e}")
+            return "estimate", estimate_tokens
+        return f"tiktoken:{encoding.name}", lambda text: len(
+            encoding.encode(text, disallowed_special=())
+        )
+
+    def count(self, text: str) -> int:
+        tokens = self._cache.get(text)
+        if tokens is None:
+            tokens = self._cache[text] = self._count(text)
+        return tokens
+
+
+# ---------- 變體列舉 ----------
+
+
+def _table_numbers(table: str) -> List[Any]:
+    rows = get_reference_store().get_rows(table) or []
+    return sorted({row["number"] for row in rows if row.get("number") is not None})
+
+
+def lifenum_samples() -> Iterator[PromptSample]:
+    import lifenum.prompts  # noqa: F401（註冊範本）
+    from lifenum.utils import GRID_LINES
+    from lifenum.version_config import VERSION_CONFIG
+
+    line_keys = list(GRID_LINES)
+    grid_keys = [
+        tuple(lines)
+        for size in range(1, len(line_keys) + 1)
+        for lines in combinations(line_keys, size)
+    ]
+    numbers = {module: _table_numbers(table) for module, table in LIFENUM_NUMBER_TABLES.items()}
+
+    for version, config in VERSION_CONFIG.items():
+        if version == "free":
+            user = f"【稱呼要求】請在回應開頭使用「哈囉{SAMPLE_NAME}！」作為稱呼，然後繼續提供完整的詳細解析內容。"
+        else:
+            user = (
+                f"【稱呼要求】請根據設定的語氣與角色，自行生成合適的開頭稱呼。**必須使用使用者的名字「{SAMPLE_NAME}」來稱呼對方，嚴禁使用「使用者」、「用戶」、「朋友」等泛稱。**\n"
+                "【隱私要求】計算過程中使用的英文名字僅供數字計算使用，請勿在回覆內容中直接顯示或提及英文名字本身。"
+            )
+        categories = [None]
+        if config.get("enable_category_selection"):
+            categories += list(CORE_CATEGORIES)
+
+        for module in config["available_modules"]:
+            for tone in config["available_tones"]:
+                if module == "grid":
+                    for lines in grid_keys:
+                        yield PromptSample(
+                            "lifenum.reading",
+                            (module, lines, None, version, tone),
+                            f"{version}/{tone}/grid/{'+'.join(lines)}",
+                            {"user": user},
+                        )
+                    continue
+                for number in numbers[module]:
+                    for category in categories if module == "core" else [None]:
+                        label = f"{version}/{tone}/{module}/{number}"
+                        yield PromptSample(
+                            "lifenum.reading",
+                            (module, number, category, version, tone),
+                            f"{label}/{category}" if category else label,
+                            {"user": user},
+                        )
+
+
+def angelnum_samples() -> Iterator[PromptSample]:
+    from angelnum.modules.angel_numbers import (
+        get_angel_number_meaning,
+        get_meanings_table,
+        get_pattern_table,
+    )
+    from angelnum.prompts import FREE_TONE_PROMPTS, PAID_TONE_PROMPTS
+
+    # 意義表中的數字，加上每種模式的一個代表數字（取位數最多者）
+    representatives: Dict[str, str] = {}
+    for number, entry in get_pattern_table().items():
+        current = representatives.get(entry["pattern"])
+        if current is None or len(number) > len(current):
+            representatives[entry["pattern"]] = number
+    numbers = sorted(set(get_meanings_table()) | set(representatives.values()), key=lambda n: (len(n), n))
+
+    history = "\n".join(f"{role}: {content}" for role, content in SAMPLE_HISTORY)
+    for version, tones in (("free", FREE_TONE_PROMPTS), ("paid", PAID_TONE_PROMPTS)):
+        for tone in tones:
+            for number in numbers:
+                yield PromptSample(
+                    "angelnum.reading", (number, version, tone), f"{version}/{tone}/{number}"
+                )
+            for number in numbers[:1] + numbers[-1:]:
+                meanings = get_angel_number_meaning(number, use_intelligent_analysis=version == "paid")
+                meanings_text = "\n".join(meanings["meanings"])
+                yield PromptSample(
+                    "angelnum.follow_up",
+                    (version, tone),
+                    f"{version}/{tone}/{number}",
+                    {
+                        "reference": f"天使數字 {number} 的核心意義：\n{meanings_text}",
+                        "user": f"""你正在與使用者 {SAMPLE_NAME} 進行深度對話。
+
+【對話背景】
+你們正在討論天使數字 {number},以下是最近的對話內容：
+{history}""",
+                    },
+                )
+
+
+def divination_samples() -> Iterator[PromptSample]:
+    from divination.agent import tone_key
+    from divination.modules.variants import COMBINATION_RESULTS, RESULT_MEANINGS, RESULT_NAMES
+    from divination_api import PAID_TONE_PROMPTS, get_combination_base_text
+
+    yield PromptSample("divination.safety", (), "safety")
+
+    history = "\n".join(
+        f"{'信眾' if role == 'user' else '神明'}: {content}" for role, content in SAMPLE_HISTORY
+    )
+    for tone, tone_config in PAID_TONE_PROMPTS.items():
+        key = tone_key(tone_config)
+        for result in RESULT_MEANINGS:
+            yield PromptSample("divination.single", (result, key), f"{tone}/{result}")
+        for combination_type, results in COMBINATION_RESULTS.items():
+            results_chinese = "、".join(RESULT_NAMES[r] for r in results)
+            base_text = get_combination_base_text(combination_type)
+            yield PromptSample(
+                "divination.three_cast",
+                (key,),
+                f"{tone}/{combination_type}",
+                {
+                    "reference": f"""擲筊三次的結果：{results_chinese}
+組合類型：{combination_type}
+
+基礎解讀：
+{base_text}"""
+                },
+            )
+            yield PromptSample(
+                "divination.personalize",
+                (key,),
+                f"{tone}/{combination_type}",
+                {
+                    "user": f"""擲筊結果：{results_chinese}
+
+你剛剛的解讀：
+{base_text}
+
+信眾的名字：{SAMPLE_NAME}"""
+                },
+            )
+        yield PromptSample(
+            "divination.follow_up",
+            (key,),
+            tone,
+            {
+                "user": f"""你正在與信眾 {SAMPLE_NAME} 進行對話，請使用信眾的名字「{SAMPLE_NAME}」稱呼對方。
+之前的對話記錄：
+{history}
+
+信眾的新問題：{SAMPLE_QUESTION}"""
+            },
+        )
+
+
+def auspicious_samples() -> Iterator[PromptSample]:
+    from auspicious.modules.calendar_db import get_calendar_db
+    from auspicious.modules.calendar_index import format_day_record
+    from auspicious.modules.lunar_calendar import describe_day, format_day_description
+    from auspicious.prompts import FREE_TONE_PROMPTS, PAID_TONE_PROMPTS
+
+    calendar_db = get_calendar_db()
+    tones = list(FREE_TONE_PROMPTS) + list(PAID_TONE_PROMPTS)
+
+    def user_info(selected_date: str) -> str:
+        return f"""用戶資訊：
+- 姓名：{SAMPLE_NAME}
+- 性別：男
+- 生日：1990-07-12
+- 生肖：{SAMPLE_ZODIAC}
+- 選擇日期：{selected_date}
+- 查詢分類：家庭居所
+- 具體事項：搬家
+
+【判斷方式】根據 {selected_date} 這一天的「宜」和「忌」事項進行判斷
+請檢查是否沖到用戶的生肖（{SAMPLE_ZODIAC}），並在回答中使用用戶的名字「{SAMPLE_NAME}」。"""
+
+    for month in calendar_db.get_available_months():
+        month_content = calendar_db.get_month_data(month) or ""
+        records = calendar_db.get_day_index(month)
+        # 單日紀錄取內容最長的一天（最壞情況）
+        day = max(records.values(), key=lambda record: len(format_day_record(record)), default=None)
+        selected_date = day["date"] if day else f"{month}-01"
+        lunar = format_day_description(
+            describe_day(date.fromisoformat(selected_date), SAMPLE_ZODIAC)
+        )
+        references = {"month": f"黃曆資料（{month}月）：\n{month_content}\n\n農曆與沖煞（本地推算）：\n{lunar}"}
+        if day:
+            references["day"] = (
+                f"黃曆資料（{selected_date}）：\n{format_day_record(day)}\n\n農曆與沖煞（本地推算）：\n{lunar}"
+            )
+
+        candidates = "\n".join(
+            f"{index}. {record['date']}：宜 {'、'.join(record['yi'])}；忌 {'、'.join(record['ji']) or '無'}"
+            for index, record in enumerate(list(records.values())[:NARRATE_CANDIDATES], 1)
+        )
+        for tone in tones:
+            for scope, reference in references.items():
+                yield PromptSample(
+                    "auspicious.date_advice",
+                    (tone,),
+                    f"{tone}/{month}/{scope}",
+                    {"reference": reference, "user": user_info(selected_date)},
+                )
+            yield PromptSample(
+                "auspicious.narrate",
+                (tone,),
+                f"{tone}/{month}",
+                {
+                    "user": f"""查詢分類：家庭居所
+使用者生肖：{SAMPLE_ZODIAC}
+
+候選日期：
+{candidates}"""
+                },
+            )
+
+    for tone in PAID_TONE_PROMPTS:
+        yield PromptSample(
+            "auspicious.follow_up",
+            (tone,),
+            tone,
+            {
+                "user": f"""用戶資訊：
+- 姓名：{SAMPLE_NAME}
+- 選擇日期：2025-12-15
+- 分類：family_home
+- 具體事項：搬家"""
+            },
+        )
+
+
+SUITES: Dict[str, Callable[[], Iterator[PromptSample]]] = {
+    "lifenum": lifenum_samples,
+    "angelnum": angelnum_samples,
+    "divination": divination_samples,
+    "auspicious": auspicious_samples,
+}
+
+
+# ---------- 量測 ----------
+
+
+class TemplateReport:
+    """單一範本所有變體的統計"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.variants = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max = 0
+        self.largest = ""
+        self.segment_total: Dict[str, int] = {}
+        self.segment_max: Dict[str, int] = {}
+        self.errors: List[str] = []
+
+    def add(self, label: str, segments: Dict[str, int], total: int):
+        self.variants += 1
+        self.total += total
+        self.min = total if self.min is None else min(self.min, total)
+        if total > self.max:
+            self.max = total
+            self.largest = label
+        for name, tokens in segments.items():
+            self.segment_total[name] = self.segment_total.get(name, 0) + tokens
+            self.segment_max[name] = max(self.segment_max.get(name, 0), tokens)
+
+    @property
+    def avg(self) -> float:
+        return round(self.total / self.variants, 1) if self.variants else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "variants": self.variants,
+            "min": self.min or 0,
+            "avg": self.avg,
+            "max": self.max,
+            "largest": self.largest,
+            "segments_avg": {
+                name: round(self.segment_total[name] / self.variants, 1)
+                for name in SEGMENT_ORDER
+                if name in self.segment_total
+            },
+            "segments_max": {
+                name: self.segment_max[name] for name in SEGMENT_ORDER if name in self.segment_max
+            },
+            "errors": len(self.errors),
+        }
+
+
+def measure(
+    suites: Optional[List[str]] = None, counter: Optional[TokenCounter] = None
+) -> Dict[str, TemplateReport]:
+    """
+    組出所有變體並計算 token 數
+
+    Returns:
+        {範本名稱: 統計}
+    """
+    counter = counter or TokenCounter()
+    registry = get_prompt_registry()
+    reports: Dict[str, TemplateReport] = {}
+
+    for suite in suites or list(SUITES):
+        for sample in SUITES[suite]():
+            report = reports.setdefault(sample.template, TemplateReport(sample.template))
+            prompt = registry.get(sample.template).build(*sample.key)
+            segments = prompt.segments()
+            if any(ERROR_MARKER in text for text in segments.values()):
+                report.errors.append(sample.label)
+            for name, text in sample.dynamic.items():
+                text = normalize_segment(text)
+                if text:
+                    segments[name] = text
+            rendered = compile_prompt(prompt).render(**sample.dynamic)
+            report.add(
+                sample.label,
+                {name: counter.count(text) for name, text in segments.items()},
+                counter.count(rendered),
+            )
+    return reports
+
+
+def format_report(reports: Dict[str, TemplateReport], tokenizer: str) -> str:
+    lines = [f"tokenizer: {tokenizer}"]
+    header = f"{'template':<24}{'variants':>9}{'min':>8}{'avg':>9}{'max':>8}  " + "".join(
+        f"{name:>10}" for name in SEGMENT_ORDER
+    )
+    lines.append(header)
+    for name in sorted(reports):
+        data = reports[name].to_dict()
+        segments = "".join(
+            f"{data['segments_max'].get(segment, 0):>10}" for segment in SEGMENT_ORDER
+        )
+        lines.append(
+            f"{name:<24}{data['variants']:>9}{data['min']:>8}{data['avg']:>9}{data['max']:>8}  {segments}"
+        )
+        lines.append(f"{'':<24}最大的變體：{data['largest']}")
+        if data["errors"]:
+            lines.append(f"{'':<24}資料讀取失敗的變體：{data['errors']} 個（例如 {reports[name].errors[0]}）")
+    lines.append("（各段落欄位為該段落的最大 token 數）")
+    return "\n".join(lines)
+
+
+# ---------- 基準比較 ----------
+
+
+def build_baseline(reports: Dict[str, TemplateReport], tokenizer: str) -> Dict[str, Any]:
+    return {
+        "format": BASELINE_FORMAT,
+        "format_version": BASELINE_FORMAT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tokenizer": tokenizer,
+        "reference_version": get_reference_store().version,
+        "templates": {
+            name: {
+                key: value
+                for key, value in report.to_dict().items()
+                if key in ("variants", "avg", "max", "segments_max")
+            }
+            for name, report in sorted(reports.items())
+        },
+    }
+
+
+def compare(
+    baseline: Dict[str, Any],
+    reports: Dict[str, TemplateReport],
+    tolerance: float,
+    partial: bool = False,
+) -> Tuple[List[str], List[str]]:
+    """
+    與基準比較（partial：只量測了部分模組，不回報基準中其他範本）
+
+    Returns:
+        (退步項目, 其他變化)
+    """
+    regressions, notes = [], []
+    expected = baseline.get("templates", {})
+    if baseline.get("reference_version") != get_reference_store().version:
+        notes.append("參考資料快照與建立基準時不同，數字變化可能來自資料內容")
+
+    def check(label: str, before: float, after: float):
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{label}: {before} → {after}（+{(after / before - 1) * 100:.1f}%）")
+        elif before and after < before * (1 - tolerance):
+            notes.append(f"{label}: {before} → {after}（{(after / before - 1) * 100:.1f}%）")
+
+    for name, report in sorted(reports.items()):
+        current = report.to_dict()
+        previous = expected.get(name)
+        if previous is None:
+            notes.append(f"{name}: 新範本（平均 {current['avg']}、最大 {current['max']} tokens）")
+            continue
+        check(f"{name} 平均", previous["avg"], current["avg"])
+        check(f"{name} 最大", previous["max"], current["max"])
+        for segment, tokens in current["segments_max"].items():
+            check(f"{name}.{segment} 最大", previous["segments_max"].get(segment, 0), tokens)
+        if current["variants"] != previous["variants"]:
+            notes.append(f"{name}: 變體數 {previous['variants']} → {current['variants']}")
+    for name in sorted(set(expected) - set(reports)) if not partial else []:
+        notes.append(f"{name}: 基準中有、但本次未量測")
+    return regressions, notes
+
+
+# ---------- CLI ----------
+
+
+def _load_snapshot(path: str) -> bool:
+    """載入參考資料快照（量測只使用快照內容，不查詢 Supabase）"""
+    store = get_reference_store()
+    if not store.load_file(path):
+        print(f"找不到可用的參考資料快照: {path}")
+        print("請先執行 python -m shared.reference_snapshot export")
+        return False
+    missing = [table for table in reference_tables() if not store.has_table(table)]
+    if missing:
+        print(f"快照缺少以下資料表: {', '.join(missing)}")
+        return False
+    return True
+
+
+def _run(args) -> Tuple[Dict[str, TemplateReport], str]:
+    counter = TokenCounter(args.model)
+    reports = measure(args.suites, counter)
+    print(format_report(reports, counter.name))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "tokenizer": counter.name,
+                    "templates": {name: report.to_dict() for name, report in sorted(reports.items())},
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"報告已寫入 {args.json}")
+    return reports, counter.name
+
+
+def _cmd_run(args) -> int:
+    _run(args)
+    return 0
+
+
+def _cmd_check(args) -> int:
+    if not os.path.exists(args.baseline):
+        print(f"找不到基準檔案: {args.baseline}（請先執行 update）")
+        return 2
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("format") != BASELINE_FORMAT:
+        print(f"不是 prompt 基準檔案: {args.baseline}")
+        return 2
+
+    reports, tokenizer = _run(args)
+    if baseline.get("tokenizer") != tokenizer:
+        print(f"基準使用 {baseline.get('tokenizer')} 計算，本次使用 {tokenizer}，無法比較")
+        return 2
+
+    regressions, notes = compare(baseline, reports, args.tolerance, partial=bool(args.suites))
+    for note in notes:
+        print(f"  {note}")
+    if regressions:
+        print(f"以下項目超過基準 {args.tolerance * 100:.0f}%：")
+        for item in regressions:
+            print(f"  {item}")
+        return 1
+    print("所有範本都在基準範圍內")
+    return 0
+
+
+def _cmd_update(args) -> int:
+    reports, tokenizer = _run(args)
+    failed = [name for name, report in reports.items() if report.errors]
+    if failed:
+        print(f"以下範本有資料讀取失敗的變體，未更新基準: {', '.join(sorted(failed))}")
+        return 1
+    if args.suites:
+        print("只量測部分範本時不更新基準")
+        return 1
+    os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+    with open(args.baseline, "w", encoding="utf-8") as f:
+        json.dump(build_baseline(reports, tokenizer), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"基準已寫入 {args.baseline}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prompt 大小量測")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, func, help_text in (
+        ("run", _cmd_run, "量測並列出各範本的 token 數"),
+        ("check", _cmd_check, "與基準比較"),
+        ("update", _cmd_update, "以目前結果更新基準"),
+    ):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("--snapshot", default=get_snapshot_path(), help="參考資料快照路徑")
+        sub.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基準檔案路徑")
+        sub.add_argument("--suites", nargs="*", choices=list(SUITES), help="只量測指定的模組")
+        sub.add_argument("--model", help="決定 tiktoken 編碼的模型（預設 OPENAI_MODEL）")
+        sub.add_argument("--json", help="另存完整報告（JSON）")
+        sub.add_argument(
+            "--tolerance", type=float, default=DEFAULT_TOLERANCE, help="容許的增幅（預設 0.05）"
+        )
+        sub.set_defaults(func=func)
+
+    args = parser.parse_args(argv)
+    if not _load_snapshot(args.snapshot):
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
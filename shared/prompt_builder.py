@@ -0,0 +1,61 @@
+"""
+System prompt 組裝（共享）
+供應商的 prompt 快取以「前綴」比對：只有與先前請求完全相同的開頭部分能命中快取，
+命中的 token 計費較低、首字延遲也較短。因此 system prompt 依「最靜態 → 最動態」排列：
+
+    rules      全域規則（所有模組、所有使用者共用）
+    task       模組的角色、內容與格式要求（同一個模組共用）
+    tone       語氣設定（同一種語氣共用）
+    reference  參考資料，例如數字意義、擲筊組合、黃曆（同一個數字/組合共用）
+    user       使用者資料、稱呼要求、對話歷史（每次不同）
+
+每個段落都會正規化（統一換行、去除行尾空白與前後空行），相同內容組出的 prompt 位元組完全一致；
+段落內容不要放入時間戳記、隨機值等會讓前綴失效的資料。
+實際命中快取的 token 數記錄在 gpt_client.get_usage_stats() 的 cached_tokens。
+"""
+
+from dataclasses import dataclass
+from typing import Dict
+
+SEGMENT_ORDER = ("rules", "task", "tone", "reference", "user")
+SEGMENT_SEPARATOR = "\n\n"
+
+
+def normalize_segment(text: str) -> str:
+    """統一換行、去除行尾空白與前後空行"""
+    if not text:
+        return ""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+@dataclass(frozen=True)
+class SystemPrompt:
+    """依快取友善順序組裝的 system prompt"""
+
+    rules: str = ""
+    task: str = ""
+    tone: str = ""
+    reference: str = ""
+    user: str = ""
+
+    def segments(self) -> Dict[str, str]:
+        """正規化後的非空段落（依 SEGMENT_ORDER 排列）"""
+        segments = {}
+        for name in SEGMENT_ORDER:
+            text = normalize_segment(getattr(self, name))
+            if text:
+                segments[name] = text
+        return segments
+
+    def render(self) -> str:
+        return SEGMENT_SEPARATOR.join(self.segments().values())
+
+    def static_prefix(self) -> str:
+        """不含使用者資料的前綴（同一模組、語氣與參考資料的請求共用）"""
+        segments = self.segments()
+        segments.pop("user", None)
+        return SEGMENT_SEPARATOR.join(segments.values())
+
+    def __str__(self) -> str:
+        return self.render()
@@ -0,0 +1,214 @@
+"""
+Prompt 範本登錄表（共享）
+system prompt 的靜態段落（全域規則、任務要求、語氣、參考資料）只會隨規則或參考資料變更，
+不必每次請求都重新查詢與組字串：
+
+- 每個範本以名稱註冊一個 builder，builder(*key) 返回不含使用者資料的 SystemPrompt
+- 以 (範本, key) 快取編譯好的前綴，key 通常是 (數字/組合, 語氣, 版本)
+- 全域規則內容變更、相關參考資料表更新或超過 PROMPT_TEMPLATE_TTL 時重新編譯
+- 每次請求只需把使用者資料（以及未編譯的動態段落）接在前綴之後
+- stats() 提供每個範本的命中率與前綴大小，作為量測 prompt 大小的單一入口
+
+使用方式：
+    prompts = get_prompt_registry()
+
+    @prompts.template("lifenum.reading", tables=("lifenum_main",))
+    def _build(module_type, number, tone, version) -> SystemPrompt: ...
+
+    system_prompt = prompts.render("lifenum.reading", (module_type, number, tone, version), user=...)
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from .prompt_builder import SEGMENT_ORDER, SEGMENT_SEPARATOR, SystemPrompt, normalize_segment
+from .ttl_cache import TTLCache
+
+PROMPT_TEMPLATE_TTL = int(os.getenv("PROMPT_TEMPLATE_TTL", 600))  # 與參考資料快取的刷新週期一致
+PROMPT_TEMPLATE_MAX_ENTRIES = 1024  # 每個範本最多保留的前綴數
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """編譯好的靜態前綴"""
+
+    prefix: str
+    last_segment: int  # 前綴中最後一個段落在 SEGMENT_ORDER 的位置
+    segment_sizes: Dict[str, int] = field(default_factory=dict)
+
+    def render(self, **dynamic: str) -> str:
+        """接上動態段落（只能是排在前綴所有段落之後的段落）"""
+        tail = []
+        for name in dynamic:
+            if SEGMENT_ORDER.index(name) <= self.last_segment:
+                raise ValueError(f"段落 {name} 已包含在編譯好的前綴中")
+        for name in SEGMENT_ORDER[self.last_segment + 1:]:
+            text = normalize_segment(dynamic.get(name, ""))
+            if text:
+                tail.append(text)
+        if not tail:
+            return self.prefix
+        return SEGMENT_SEPARATOR.join([self.prefix, *tail]) if self.prefix else SEGMENT_SEPARATOR.join(tail)
+
+
+def compile_prompt(prompt: SystemPrompt) -> CompiledPrompt:
+    segments = prompt.segments()
+    last = max((SEGMENT_ORDER.index(name) for name in segments), default=-1)
+    return CompiledPrompt(
+        prefix=SEGMENT_SEPARATOR.join(segments.values()),
+        last_segment=last,
+        segment_sizes={name: len(text) for name, text in segments.items()},
+    )
+
+
+class PromptTemplate:
+    """單一範本：builder 與其編譯快取"""
+
+    def __init__(
+        self,
+        name: str,
+        build: Callable[..., SystemPrompt],
+        tables: Iterable[str] = (),
+        cacheable: Optional[Callable[[SystemPrompt], bool]] = None,
+    ):
+        """
+        Args:
+            name: 範本名稱（例如 "lifenum.reading"）
+            build: build(*key) 返回不含使用者資料的 SystemPrompt
+            tables: 內容來源的參考資料表（更新時清除此範本的快取）
+            cacheable: 判斷編譯結果是否可以快取（例如資料庫讀取失敗時的錯誤提示不快取）
+        """
+        self.name = name
+        self.build = build
+        self.tables = frozenset(tables)
+        self.cacheable = cacheable
+        self._cache = TTLCache(max_entries=PROMPT_TEMPLATE_MAX_ENTRIES, ttl=PROMPT_TEMPLATE_TTL)
+
+    def compiled(self, key: Tuple[Hashable, ...], rules_hash: str) -> CompiledPrompt:
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == rules_hash:
+            return entry[1]
+        prompt = self.build(*key)
+        compiled = compile_prompt(prompt)
+        if self.cacheable is None or self.cacheable(prompt):
+            self._cache.set(key, (rules_hash, compiled))
+        return compiled
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, object]:
+        entries = [entry[1] for entry in self._cache.values()]
+        sizes = [len(compiled.prefix) for compiled in entries]
+        segments: Dict[str, int] = {}
+        for compiled in entries:
+            for name, size in compiled.segment_sizes.items():
+                segments[name] = max(segments.get(name, 0), size)
+        return {
+            "entries": len(entries),
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "prefix_chars_max": max(sizes, default=0),
+            "prefix_chars_avg": round(sum(sizes) / len(sizes)) if sizes else 0,
+            "segment_chars_max": segments,
+        }
+
+
+class PromptRegistry:
+    """所有範本的登錄表"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def template(
+        self,
+        name: str,
+        tables: Iterable[str] = (),
+        cacheable: Optional[Callable[[SystemPrompt], bool]] = None,
+    ):
+        """註冊範本的裝飾器"""
+
+        def decorator(build: Callable[..., SystemPrompt]) -> Callable[..., SystemPrompt]:
+            self.register(name, build, tables, cacheable)
+            return build
+
+        return decorator
+
+    def register(
+        self,
+        name: str,
+        build: Callable[..., SystemPrompt],
+        tables: Iterable[str] = (),
+        cacheable: Optional[Callable[[SystemPrompt], bool]] = None,
+    ) -> PromptTemplate:
+        with self._lock:
+            template = self._templates[name] = PromptTemplate(name, build, tables, cacheable)
+            self._ensure_listener()
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        template = self._templates.get(name)
+        if template is None:
+            raise KeyError(f"未註冊的 prompt 範本: {name}")
+        return template
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._templates)
+
+    def compiled(self, name: str, key: Tuple[Hashable, ...] = ()) -> CompiledPrompt:
+        """取得編譯好的前綴（全域規則內容變更時自動重新編譯）"""
+        from .rule_loader import get_global_rules_hash, load_global_rules
+
+        load_global_rules()  # 觸發規則快取的到期刷新
+        return self.get(name).compiled(tuple(key), get_global_rules_hash())
+
+    def render(self, name: str, key: Tuple[Hashable, ...] = (), **dynamic: str) -> str:
+        """
+        組出完整的 system prompt
+
+        Args:
+            name: 範本名稱
+            key: 傳給 builder 的參數（同時作為快取鍵，需可雜湊）
+            **dynamic: 前綴之後的動態段落（通常只有 user）
+        """
+        return self.compiled(name, key).render(**dynamic)
+
+    def clear(self, name: Optional[str] = None):
+        for template in [self.get(name)] if name else list(self._templates.values()):
+            template.clear()
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """每個範本的命中率與前綴大小（字元數）"""
+        return {name: template.stats() for name, template in self._templates.items()}
+
+    def _ensure_listener(self):
+        if self._listening:
+            return
+        from .reference_snapshot import get_reference_store
+
+        get_reference_store().add_listener(self._on_reference_update)
+        self._listening = True
+
+    def _on_reference_update(self, store, changed_tables):
+        changed = set(changed_tables)
+        for template in list(self._templates.values()):
+            if template.tables & changed:
+                template.clear()
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """獲取 prompt 範本登錄表 (Singleton)"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PromptRegistry()
+    return _registry
@@ -7,6 +7,10 @@ import redis
 from typing import Optional
 from dotenv import load_dotenv
 
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
 # 載入環境變量
 load_dotenv()
 
@@ -28,6 +32,14 @@ SESSION_TTL = {
     'paid': int(os.getenv('SESSION_TTL', 43200)),   # 12小時
 }
 
+# 只在 key 的值仍是持有者的 token 時刪除（鎖過期後已被其他人取得時不會誤刪）
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 # 全局 Redis 客戶端實例
 _redis_client: Optional[redis.Redis] = None
 
@@ -43,17 +55,27 @@ def get_redis_client() -> redis.Redis:
             _redis_client = redis.Redis(**REDIS_CONFIG)
             # 測試連線
             _redis_client.ping()
-            print("✅ Redis 連線成功")
+            logger.info("Redis 連線成功")
         except redis.ConnectionError as e:
-            print(f"❌ Redis 連線失敗: {e}")
+            logger.error("Redis 連線失敗: %s", e)
             raise
         except Exception as e:
-            print(f"❌ Redis 初始化錯誤: {e}")
+            logger.error("Redis 初始化錯誤: %s", e)
             raise
     
     return _redis_client
 
 
+def release_lock(client: redis.Redis, key: str, token: str) -> bool:
+    """
+    釋放以 SET NX 取得的鎖（compare-and-delete）
+
+    Returns:
+        是否刪除（鎖已過期或已被其他持有者取得時為 False）
+    """
+    return bool(client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token))
+
+
 def close_redis_client():
     """
     關閉 Redis 連線
@@ -62,7 +84,7 @@ def close_redis_client():
     if _redis_client:
         _redis_client.close()
         _redis_client = None
-        print("✅ Redis 連線已關閉")
+        logger.info("Redis 連線已關閉")
 
 
 def test_redis_connection() -> bool:
@@ -72,10 +94,10 @@ def test_redis_connection() -> bool:
     try:
         client = get_redis_client()
         client.ping()
-        print("✅ Redis 連線測試成功")
+        logger.info("Redis 連線測試成功")
         return True
     except Exception as e:
-        print(f"❌ Redis 連線測試失敗: {e}")
+        logger.error("Redis 連線測試失敗: %s", e)
         return False
 
 
@@ -0,0 +1,398 @@
+"""
+參考資料快照（共享基礎設施）
+將 Supabase 上所有「參考資料表」（全域規則、生命靈數、天使數字、擲筊、黃曆）
+保存成本機的版本化 JSON 快照：
+- 啟動時從磁碟載入，不需等待網路
+- 背景執行緒定期與 Supabase 對帳，內容變更時更新記憶體（可選擇寫回檔案）
+- 各資料庫存取層優先從記憶體讀取，Supabase 暫時不可用時仍能正常回應
+
+快照格式（format_version = 1）：
+{
+    "format": "life-number-reference-snapshot",
+    "format_version": 1,
+    "generated_at": "2025-01-01T00:00:00+00:00",
+    "tables": {
+        "<table>": {"key": "<主要查詢欄位>", "hash": "<內容雜湊>", "rows": [...]}
+    }
+}
+
+匯出快照：
+    python -m shared.reference_snapshot export [--output PATH]
+查看快照：
+    python -m shared.reference_snapshot info [--path PATH]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .logger import get_logger
+from .refresh_cache import content_hash
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT = "life-number-reference-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+
+# 快照檔案位置（相對路徑以專案根目錄為準）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SNAPSHOT_PATH = os.path.join("data", "reference_snapshot.json")
+
+# 背景對帳間隔（秒）
+RECONCILE_INTERVAL = int(os.getenv("REFERENCE_RECONCILE_INTERVAL", 600))
+
+# 每頁查詢筆數（PostgREST 預設單次最多回傳 1000 筆）
+PAGE_SIZE = 1000
+
+
+def get_snapshot_path() -> str:
+    """取得快照檔案路徑（環境變數 REFERENCE_SNAPSHOT_PATH）"""
+    path = os.getenv("REFERENCE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    if not os.path.isabs(path):
+        path = os.path.join(_PROJECT_ROOT, path)
+    return path
+
+
+def reference_tables() -> Dict[str, str]:
+    """
+    需要快照的資料表與其主要查詢欄位
+
+    表名與各資料庫存取層一致（部分可由環境變數覆寫）
+    """
+    return {
+        "ai_global_rules": "id",
+        "lifenum_main": "number",
+        "lifenum_birthday": "number",
+        "lifenum_personal_year": "number",
+        "lifenum_grid_lines": "line_key",
+        "lifenum_challenge": "number",
+        "lifenum_expression": "number",
+        "lifenum_maturity": "number",
+        "lifenum_soul": "number",
+        "lifenum_personality": "number",
+        "lifenum_karma": "number",
+        os.environ.get("SUPABASE_TABLE_3", "angel_number_meanings"): "number",
+        os.environ.get("SUPABASE_TABLE_4", "angel_number_basic_energy"): "digit",
+        os.environ.get("SUPABASE_TABLE_1", "divination_results"): "result_key",
+        os.environ.get("SUPABASE_TABLE_2", "divination_combinations"): "combination_key",
+        os.getenv("SUPABASE_CALENDAR_TABLE", "auspicious_calendar"): "month",
+    }
+
+
+def fetch_table(table: str, order_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    """從 Supabase 分頁讀取整張資料表（失敗時拋出例外）"""
+    from .supabase_client import get_supabase_client
+
+    supabase = get_supabase_client()
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        query = supabase.table(table).select("*")
+        if order_by:
+            query = query.order(order_by)
+        response = query.range(start, start + PAGE_SIZE - 1).execute()
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+class ReferenceStore:
+    """
+    記憶體中的參考資料
+
+    每張表以整份替換（copy-on-write），讀取不需加鎖；
+    索引在第一次以某欄位查詢時建立。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._hashes: Dict[str, str] = {}
+        self._indexes: Dict[tuple, tuple] = {}
+        self._listeners: List[Callable[["ReferenceStore", List[str]], None]] = []
+        self.generated_at: Optional[str] = None
+        self.source: Optional[str] = None
+
+    # ---------- 讀取 ----------
+
+    def has_table(self, table: str) -> bool:
+        return table in self._tables
+
+    def get_rows(self, table: str) -> Optional[List[Dict[str, Any]]]:
+        """整張表的資料（尚未載入時為 None）"""
+        return self._tables.get(table)
+
+    def get_row(self, table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        """依欄位值查詢單筆資料（找不到或尚未載入時為 None）"""
+        index = self._get_index(table, column)
+        if index is None:
+            return None
+        return index.get(str(value))
+
+    def get_table_hash(self, table: str) -> Optional[str]:
+        return self._hashes.get(table)
+
+    @property
+    def version(self) -> Optional[str]:
+        """所有表內容的綜合雜湊，供下游快取當作失效鍵"""
+        if not self._hashes:
+            return None
+        return content_hash(sorted(self._hashes.items()))
+
+    def _get_index(self, table: str, column: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        rows = self._tables.get(table)
+        if rows is None:
+            return None
+        cached = self._indexes.get((table, column))
+        # 表被整份替換後 rows 物件不同，索引自然失效
+        if cached is not None and cached[0] is rows:
+            return cached[1]
+        index = {}
+        for row in rows:
+            if row.get(column) is not None:
+                # 同一鍵有多筆時保留第一筆（與原本 .eq(...).data[0] 行為一致）
+                index.setdefault(str(row[column]), row)
+        with self._lock:
+            self._indexes[(table, column)] = (rows, index)
+        return index
+
+    # ---------- 更新 ----------
+
+    def add_listener(self, callback: Callable[["ReferenceStore", List[str]], None]):
+        """註冊資料變更的回呼 callback(store, changed_tables)"""
+        self._listeners.append(callback)
+
+    def replace_tables(self, tables: Dict[str, List[Dict[str, Any]]], source: str) -> List[str]:
+        """
+        以新資料整批替換資料表
+
+        Returns:
+            內容實際有變更的表名
+        """
+        changed = []
+        with self._lock:
+            for table, rows in tables.items():
+                new_hash = content_hash(rows)
+                if self._hashes.get(table) == new_hash:
+                    continue
+                self._tables[table] = list(rows)
+                self._hashes[table] = new_hash
+                changed.append(table)
+            self.source = source
+
+        if changed:
+            for callback in list(self._listeners):
+                try:
+                    callback(self, changed)
+                except Exception as e:
+                    logger.exception("listener 執行失敗: %s", e)
+        return changed
+
+    # ---------- 快照檔案 ----------
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        """轉換成快照格式"""
+        keys = reference_tables()
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "tables": {
+                table: {
+                    "key": keys.get(table),
+                    "hash": self._hashes[table],
+                    "rows": rows,
+                }
+                for table, rows in sorted(self._tables.items())
+            },
+        }
+
+    def load_file(self, path: str) -> bool:
+        """
+        從快照檔案載入（檔案不存在或格式不符時返回 False）
+        """
+        if not os.path.exists(path):
+            logger.warning("快照不存在: %s", path)
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("快照讀取失敗: %s", e)
+            return False
+
+        if snapshot.get("format") != SNAPSHOT_FORMAT:
+            logger.error("未知的快照格式: %s", snapshot.get("format"))
+            return False
+        if snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            logger.error("不支援的快照版本: %s", snapshot.get("format_version"))
+            return False
+
+        tables = {
+            table: entry.get("rows") or []
+            for table, entry in (snapshot.get("tables") or {}).items()
+        }
+        self.replace_tables(tables, source="snapshot")
+        self.generated_at = snapshot.get("generated_at")
+        logger.info("已載入快照 %s（%d 張表，產生於 %s）", path, len(tables), self.generated_at)
+        return True
+
+    def save_file(self, path: str):
+        """以原子替換方式寫入快照檔案"""
+        snapshot = self.to_snapshot()
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".reference_snapshot.", suffix=".tmp", dir=directory
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.generated_at = snapshot["generated_at"]
+
+    # ---------- 與 Supabase 對帳 ----------
+
+    def reconcile(self, tables: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        從 Supabase 重新讀取資料表並更新記憶體
+
+        單張表讀取失敗不影響其他表（保留原本的資料）
+
+        Returns:
+            內容實際有變更的表名
+        """
+        keys = reference_tables()
+        fetched = {}
+        for table in tables or keys.keys():
+            try:
+                fetched[table] = fetch_table(table, order_by=keys.get(table))
+            except Exception as e:
+                logger.warning("對帳失敗 %s: %s", table, e)
+        if not fetched:
+            return []
+        changed = self.replace_tables(fetched, source="supabase")
+        if changed:
+            logger.info("參考資料已更新: %s", ", ".join(changed))
+        return changed
+
+
+_reference_store: Optional[ReferenceStore] = None
+_store_lock = threading.Lock()
+_sync_thread: Optional[threading.Thread] = None
+
+
+def get_reference_store() -> ReferenceStore:
+    """獲取參考資料實例 (Singleton)"""
+    global _reference_store
+    if _reference_store is None:
+        with _store_lock:
+            if _reference_store is None:
+                _reference_store = ReferenceStore()
+    return _reference_store
+
+
+def _reconcile_loop(store: ReferenceStore, interval: float, path: str, write_back: bool):
+    while True:
+        try:
+            changed = store.reconcile()
+            if changed and write_back:
+                store.save_file(path)
+                logger.info("快照已寫回: %s", path)
+        except Exception as e:
+            logger.warning("背景對帳失敗: %s", e)
+        time.sleep(interval)
+
+
+def start_reference_sync(interval: Optional[float] = None) -> ReferenceStore:
+    """
+    啟動時呼叫：同步從磁碟載入快照，再啟動背景對帳執行緒（只會啟動一次）
+
+    設定 REFERENCE_SYNC_DISABLED=true 可關閉背景對帳（僅使用快照）；
+    設定 REFERENCE_SNAPSHOT_WRITEBACK=true 會在資料變更時寫回快照檔案。
+    """
+    global _sync_thread
+    store = get_reference_store()
+    path = get_snapshot_path()
+
+    with _store_lock:
+        if _sync_thread is not None:
+            return store
+        if store.source is None:
+            store.load_file(path)
+
+        if os.getenv("REFERENCE_SYNC_DISABLED", "false").lower() == "true":
+            logger.info("背景對帳已關閉")
+            return store
+
+        write_back = os.getenv("REFERENCE_SNAPSHOT_WRITEBACK", "false").lower() == "true"
+        _sync_thread = threading.Thread(
+            target=_reconcile_loop,
+            args=(store, interval or RECONCILE_INTERVAL, path, write_back),
+            name="reference-sync",
+            daemon=True,
+        )
+        _sync_thread.start()
+    return store
+
+
+# ---------- CLI ----------
+
+
+def _cmd_export(args) -> int:
+    store = ReferenceStore()
+    tables = reference_tables()
+    changed = store.reconcile(tables.keys())
+    missing = [table for table in tables if not store.has_table(table)]
+    if missing:
+        print(f"以下資料表讀取失敗，未產生快照: {', '.join(missing)}")
+        return 1
+    store.save_file(args.output)
+    print(f"已匯出 {len(changed)} 張表至 {args.output}")
+    for table in sorted(tables):
+        print(f"  {table:<32} {len(store.get_rows(table)):>6} 筆  {store.get_table_hash(table)}")
+    return 0
+
+
+def _cmd_info(args) -> int:
+    store = ReferenceStore()
+    if not store.load_file(args.path):
+        return 1
+    print(f"版本雜湊: {store.version}")
+    for table in sorted(reference_tables()):
+        rows = store.get_rows(table)
+        count = f"{len(rows):>6} 筆" if rows is not None else "  （缺少）"
+        print(f"  {table:<32} {count}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="參考資料快照工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="從 Supabase 匯出快照")
+    export_parser.add_argument("--output", default=get_snapshot_path(), help="輸出路徑")
+    export_parser.set_defaults(func=_cmd_export)
+
+    info_parser = subparsers.add_parser("info", help="顯示快照內容摘要")
+    info_parser.add_argument("--path", default=get_snapshot_path(), help="快照路徑")
+    info_parser.set_defaults(func=_cmd_info)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+背景刷新快取（共享基礎設施）
+single-flight + stale-while-revalidate：
+- 同一時間只有一個呼叫者會真正去載入資料，其他呼叫者繼續使用舊值
+- 在過期前提前於背景刷新
+- 載入失敗時記住失敗並指數退避，期間不再重試
+- 提供內容雜湊，供下游快取當作失效鍵
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+
+def content_hash(value: Any) -> str:
+    """計算內容雜湊（前 16 碼），相同內容永遠得到相同雜湊"""
+    if isinstance(value, str):
+        raw = value
+    else:
+        raw = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class RefreshingCache:
+    """單一值的背景刷新快取"""
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        ttl: float = 300,
+        refresh_ahead: float = 60,
+        fallback: Optional[Callable[[], Any]] = None,
+        failure_backoff: float = 5,
+        max_backoff: float = 300,
+        wait_timeout: float = 10,
+    ):
+        """
+        Args:
+            name: 快取名稱（用於日誌）
+            loader: 載入函數，失敗時應拋出例外
+            ttl: 值的有效秒數
+            refresh_ahead: 在過期前多少秒開始背景刷新
+            fallback: 沒有任何可用值時的備用函數
+            failure_backoff: 第一次失敗後的退避秒數（之後每次加倍）
+            max_backoff: 退避秒數上限
+            wait_timeout: 沒有舊值時，等待其他呼叫者載入的最長秒數
+        """
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.fallback = fallback
+        self.failure_backoff = failure_backoff
+        self.max_backoff = max_backoff
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._value: Any = _MISSING
+        self._hash: Optional[str] = None
+        self._loaded_at: float = 0.0
+        self._inflight: Optional[threading.Event] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._listeners: List[Callable[[Any, str], None]] = []
+
+    # ---------- 公開介面 ----------
+
+    def get(self, force_refresh: bool = False) -> Any:
+        """
+        取得快取值
+
+        有舊值時一律立即返回（必要時觸發背景刷新）；
+        沒有任何值或強制刷新時才會同步載入（同一時間只有一個呼叫者載入）。
+        """
+        now = time.monotonic()
+        with self._lock:
+            value = self._value
+            has_value = value is not _MISSING
+            age = now - self._loaded_at
+            can_retry = now >= self._retry_at
+
+        if has_value and not force_refresh:
+            if age >= self.ttl - self.refresh_ahead and can_retry:
+                self._refresh_in_background()
+            return value
+
+        if not force_refresh and not can_retry:
+            # 仍在失敗退避期間，不打擾資料來源
+            return self._fallback_value()
+
+        self._refresh_sync()
+        with self._lock:
+            value = self._value
+        return value if value is not _MISSING else self._fallback_value()
+
+    @property
+    def content_hash(self) -> Optional[str]:
+        """目前值的內容雜湊（尚未載入時為 None）"""
+        return self._hash
+
+    def invalidate(self):
+        """清除快取值與失敗狀態"""
+        with self._lock:
+            self._value = _MISSING
+            self._hash = None
+            self._loaded_at = 0.0
+            self._failures = 0
+            self._retry_at = 0.0
+
+    def seed(self, value: Any, fresh: bool = False):
+        """
+        以外部取得的值（例如本機快照）填入快取
+
+        Args:
+            value: 要填入的值
+            fresh: False 時只在快取為空時填入，且視為已過期（下次讀取會觸發背景刷新）；
+                   True 時視為剛載入的新值直接覆蓋
+        """
+        new_hash = content_hash(value)
+        with self._lock:
+            if not fresh and self._value is not _MISSING:
+                return
+            changed = new_hash != self._hash
+            self._value = value
+            self._hash = new_hash
+            self._loaded_at = time.monotonic() - (0 if fresh else self.ttl)
+            if fresh:
+                self._failures = 0
+                self._retry_at = 0.0
+
+        if changed:
+            self._notify(value, new_hash)
+
+    def add_listener(self, callback: Callable[[Any, str], None]):
+        """註冊內容變更的回呼 callback(new_value, new_hash)"""
+        self._listeners.append(callback)
+
+    # ---------- 內部實作 ----------
+
+    def _fallback_value(self) -> Any:
+        return self.fallback() if self.fallback else None
+
+    def _begin(self) -> Optional[threading.Event]:
+        """嘗試成為載入者；已有其他載入者時返回 None"""
+        with self._lock:
+            if self._inflight is not None:
+                return None
+            self._inflight = threading.Event()
+            return self._inflight
+
+    def _refresh_sync(self):
+        event = self._begin()
+        if event is None:
+            # 其他呼叫者正在載入，等待其結果
+            with self._lock:
+                inflight = self._inflight
+            if inflight is not None:
+                inflight.wait(self.wait_timeout)
+            return
+        self._run_refresh(event)
+
+    def _refresh_in_background(self):
+        event = self._begin()
+        if event is None:
+            return
+        thread = threading.Thread(
+            target=self._run_refresh,
+            args=(event,),
+            name=f"refresh-{self.name}",
+            daemon=True,
+        )
+        thread.start()
+
+    def _run_refresh(self, event: threading.Event):
+        changed = False
+        try:
+            value = self.loader()
+            new_hash = content_hash(value)
+            with self._lock:
+                changed = new_hash != self._hash
+                self._value = value
+                self._hash = new_hash
+                self._loaded_at = time.monotonic()
+                self._failures = 0
+                self._retry_at = 0.0
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                delay = min(
+                    self.max_backoff,
+                    self.failure_backoff * (2 ** (self._failures - 1)),
+                )
+                delay *= random.uniform(0.8, 1.2)
+                self._retry_at = time.monotonic() + delay
+                failures = self._failures
+            logger.warning("[%s] 載入失敗（第 %d 次），%.0f 秒後重試: %s", self.name, failures, delay, e)
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+        if changed:
+            self._notify(self._value, self._hash)
+
+    def _notify(self, value: Any, value_hash: str):
+        for callback in list(self._listeners):
+            try:
+                callback(value, value_hash)
+            except Exception as e:
+                logger.exception("[%s] listener 執行失敗: %s", self.name, e)
@@ -0,0 +1,59 @@
+"""
+請求上下文（共享基礎設施）
+以 contextvars 保存目前請求的 blueprint、版本、對話狀態與語氣，
+LLM 呼叫的指標與日誌直接讀取這些欄位，不必經由每一層函數傳遞：
+
+- app.py 在請求開始時綁定 blueprint、版本與 endpoint，請求結束時還原
+- 各模組載入會話後以 bind_session 補上對話狀態與語氣
+
+contextvars 不會自動帶入 ThreadPoolExecutor 的執行緒，
+需要在背景執行緒使用時，請先在原執行緒以 get_request_context() 取出
+"""
+
+import contextvars
+import uuid
+from typing import Any, Dict, Optional
+
+CONTEXT_FIELDS = ("request_id", "blueprint", "version", "endpoint", "state", "tone")
+
+_context: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar(
+    "request_context", default=None
+)
+
+
+def bind_request_context(**fields: Any) -> contextvars.Token:
+    """
+    開始新的請求上下文（不繼承先前的欄位）
+
+    Returns:
+        reset_request_context 需要的 token
+    """
+    fields.setdefault("request_id", uuid.uuid4().hex[:16])
+    return _context.set({name: str(value) for name, value in fields.items() if value is not None})
+
+
+def reset_request_context(token: contextvars.Token):
+    _context.reset(token)
+
+
+def update_request_context(**fields: Any):
+    """補充目前請求的欄位（值為 None 的欄位略過）"""
+    current = dict(_context.get() or {})
+    current.update({name: str(value) for name, value in fields.items() if value is not None})
+    _context.set(current)
+
+
+def bind_session(session: Any):
+    """以會話的對話狀態與語氣補充上下文（會話不存在時不變）"""
+    if session is None:
+        return
+    state = getattr(session, "state", None)
+    update_request_context(
+        state=getattr(state, "value", state),
+        tone=getattr(session, "tone", None),
+    )
+
+
+def get_request_context() -> Dict[str, str]:
+    """目前請求的欄位（請求之外為空字典）"""
+    return dict(_context.get() or {})
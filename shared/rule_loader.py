@@ -4,69 +4,82 @@
 """
 
 from typing import Optional
+
 from shared.supabase_client import get_supabase_client
-import time
+from shared.logger import get_logger
+from shared.refresh_cache import RefreshingCache, content_hash
+from shared.reference_snapshot import get_reference_store
+from shared.tracing import traced
+
+logger = get_logger(__name__)
 
-# 緩存全域規則（避免每次請求都查詢數據庫）
-_global_rules_cache: Optional[str] = None
-_cache_timestamp: Optional[float] = None
+RULES_TABLE = "ai_global_rules"
+
+# 緩存設定（避免每次請求都查詢數據庫）
 CACHE_DURATION = 300  # 5分鐘
+REFRESH_AHEAD = 60  # 過期前 1 分鐘於背景刷新
+
+# 內容審核違規時的固定回應（與規則內容一致）
+REFUSAL_MESSAGE = "本平台不提供投資、賭博或保證獲利等相關建議。我們只能提供一般的文化與資料說明。如果你有其他生活上的事項想查詢，歡迎重新詢問！"
+
+
+def _fetch_global_rules() -> str:
+    """從 Supabase 查詢所有規則並組合成字符串（失敗時拋出例外）"""
+    supabase = get_supabase_client()
+
+    # 查詢所有規則，按 id 排序
+    response = (
+        supabase.table(RULES_TABLE)
+        .select("rule_content")
+        .order("id")
+        .execute()
+    )
+
+    if not response.data:
+        raise LookupError("No global rules found in database")
 
+    rules = _combine_rules(response.data)
+    logger.info("Loaded %d global rules from database", len(response.data))
+    return rules
 
+
+def _combine_rules(rows: list) -> str:
+    """組合所有規則（rows 需已按 id 排序）"""
+    rules = [item["rule_content"] for item in rows if item.get("rule_content")]
+    return "\n\n".join(rules)
+
+
+def _snapshot_rules() -> Optional[str]:
+    """從本機參考資料快照取得規則（沒有快照時為 None）"""
+    rows = get_reference_store().get_rows(RULES_TABLE)
+    if not rows:
+        return None
+    return _combine_rules(sorted(rows, key=lambda item: item.get("id") or 0)) or None
+
+
+@traced("rules.load_global_rules", "rules")
 def load_global_rules(force_refresh: bool = False) -> str:
     """
     載入所有全域規則並組合成字符串
 
+    同一時間只有一個呼叫者會查詢數據庫，其他呼叫者繼續使用舊的規則；
+    啟動時先使用本機快照中的規則，查詢失敗時會退避一段時間並使用快照或備用規則。
+
     Args:
         force_refresh: 是否強制刷新緩存
 
     Returns:
         組合後的規則文本，可直接添加到 prompt
     """
-    global _global_rules_cache, _cache_timestamp
-
-    current_time = time.time()
+    return _rules_cache.get(force_refresh=force_refresh)
 
-    # 使用緩存（5分鐘內）
-    if (
-        not force_refresh
-        and _global_rules_cache is not None
-        and _cache_timestamp is not None
-        and current_time - _cache_timestamp < CACHE_DURATION
-    ):
-        return _global_rules_cache
 
-    try:
-        supabase = get_supabase_client()
-
-        # 查詢所有規則，按 id 排序
-        response = (
-            supabase.table("ai_global_rules")
-            .select("rule_content")
-            .order("id")
-            .execute()
-        )
-
-        if not response.data:
-            print("[Rule Loader] Warning: No global rules found in database")
-            return get_fallback_rules()
-
-        # 組合所有規則
-        rules = [
-            item["rule_content"] for item in response.data if item.get("rule_content")
-        ]
-        combined_rules = "\n\n".join(rules)
-
-        # 更新緩存
-        _global_rules_cache = combined_rules
-        _cache_timestamp = current_time
-
-        print(f"[Rule Loader] Loaded {len(rules)} global rules from database")
-        return combined_rules
-
-    except Exception as e:
-        print(f"[Rule Loader] Error loading global rules: {e}")
-        return get_fallback_rules()
+def get_global_rules_hash() -> str:
+    """
+    目前使用中的規則內容雜湊
+    下游快取（prompt、解讀快取等）可用來判斷規則是否變更
+    """
+    return _rules_cache.content_hash or content_hash(load_global_rules())
 
 
 def get_fallback_rules() -> str:
@@ -74,7 +87,7 @@ def get_fallback_rules() -> str:
     當數據庫不可用時的備用規則（硬編碼）
     包含所有三個全域規則
     """
-    return """【回答原則】避免給予絕對性的判斷，改用建議導向的表達：
+    return f"""【回答原則】避免給予絕對性的判斷，改用建議導向的表達：
 - 禁止使用「你一定會」、「你絕對不該」、「必須」、「千萬不要」等絕對性表達
 - 請使用「建議」、「可以考慮」、「值得留意」、「或許」等引導性語言
 - 提供多種可能性和方向，而非單一確定的結論
@@ -92,12 +105,33 @@ def get_fallback_rules() -> str:
 
 **違規處理：**
 若判定違規，請**立即停止**所有分析，並僅返回以下固定回應（不添加任何前後文）：
-「本平台不提供投資、賭博或保證獲利等相關建議。我們只能提供一般的文化與資料說明。如果你有其他生活上的事項想查詢，歡迎重新詢問！」"""
+「{REFUSAL_MESSAGE}」"""
+
+
+_rules_cache = RefreshingCache(
+    "global_rules",
+    _fetch_global_rules,
+    ttl=CACHE_DURATION,
+    refresh_ahead=REFRESH_AHEAD,
+    fallback=lambda: _snapshot_rules() or get_fallback_rules(),
+)
+
+
+def _on_reference_update(store, changed_tables):
+    """參考資料快照載入或對帳更新時，同步更新規則緩存"""
+    if RULES_TABLE not in changed_tables:
+        return
+    rules = _snapshot_rules()
+    if rules:
+        # 從磁碟載入的快照視為舊值（會在背景向數據庫確認），對帳結果則是新值
+        _rules_cache.seed(rules, fresh=store.source == "supabase")
+
+
+get_reference_store().add_listener(_on_reference_update)
+_on_reference_update(get_reference_store(), [RULES_TABLE])
 
 
 def clear_rules_cache():
     """清除規則緩存（用於測試或手動刷新）"""
-    global _global_rules_cache, _cache_timestamp
-    _global_rules_cache = None
-    _cache_timestamp = None
-    print("[Rule Loader] Cache cleared")
+    _rules_cache.invalidate()
+    logger.info("Cache cleared")
@@ -0,0 +1,414 @@
+"""
+Session 分析與清理工具（共享基礎設施）
+以 SCAN 增量遍歷 Redis 中的 session:* key，統計各模組、版本與狀態的數量與記憶體用量，
+並可依條件清除或壓縮會話。所有操作都有速率限制，避免阻塞正式環境的 Redis。
+
+CLI 用法：
+    python -m shared.session_admin stats [--module lifenum] [--version paid]
+    python -m shared.session_admin sweep --action purge --state completed --idle-hours 6
+    python -m shared.session_admin sweep --action compact --min-history 80 --keep 20 --execute
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import redis
+
+from .logger import get_logger
+from .session_store import BaseSessionStore
+
+logger = get_logger(__name__)
+
+# 預設每批 SCAN 的數量與每秒最多處理的 key 數
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_OPS_PER_SECOND = 2000
+
+
+class RateLimiter:
+    """簡單的速率限制器：確保每秒處理的 key 數不超過上限"""
+
+    def __init__(self, ops_per_second: Optional[float] = DEFAULT_OPS_PER_SECOND):
+        self.ops_per_second = ops_per_second
+        self._started = time.monotonic()
+        self._done = 0
+
+    def acquire(self, n: int = 1):
+        """登記處理了 n 個 key，超出速率時休眠"""
+        if not self.ops_per_second or self.ops_per_second <= 0:
+            return
+        self._done += n
+        expected = self._done / self.ops_per_second
+        elapsed = time.monotonic() - self._started
+        if expected > elapsed:
+            time.sleep(expected - elapsed)
+
+
+def parse_session_key(key: str) -> Dict[str, str]:
+    """
+    解析 session key
+    格式: session:{module}:{version}:{session_id}
+    """
+    parts = key.split(":", 3)
+    if len(parts) != 4:
+        return {"module": "unknown", "version": "unknown", "session_id": key}
+    return {"module": parts[1], "version": parts[2], "session_id": parts[3]}
+
+
+def _idle_seconds(updated_at: Optional[str], now: datetime) -> Optional[float]:
+    """根據 updated_at 計算閒置秒數"""
+    if not updated_at:
+        return None
+    try:
+        return (now - datetime.fromisoformat(updated_at)).total_seconds()
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_session_info(
+    store: BaseSessionStore,
+    version: str = "*",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_keys: Optional[int] = None,
+    ops_per_second: Optional[float] = DEFAULT_OPS_PER_SECOND,
+) -> Iterator[Dict[str, Any]]:
+    """
+    逐一產生每個 session 的摘要資訊
+
+    每批 key 以 pipeline 一次送出 MEMORY USAGE / TTL / GET，
+    並在批次之間依 ops_per_second 休眠。
+
+    Yields:
+        包含 key、module、version、state、bytes、ttl、history_len、idle_seconds 的字典
+    """
+    limiter = RateLimiter(ops_per_second)
+    client = store.redis_client
+    scanned = 0
+    now = datetime.now()
+
+    for keys in store.scan_keys(version=version, count=batch_size):
+        if max_keys is not None:
+            keys = keys[: max(0, max_keys - scanned)]
+            if not keys:
+                return
+
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+            pipe.ttl(key)
+            pipe.get(key)
+        results = pipe.execute(raise_on_error=False)
+
+        for i, key in enumerate(keys):
+            mem, ttl, raw = results[i * 3 : i * 3 + 3]
+            info = parse_session_key(key)
+            info["key"] = key
+            info["bytes"] = mem if isinstance(mem, int) else 0
+            info["ttl"] = ttl if isinstance(ttl, int) else -2
+            info["state"] = "unknown"
+            info["history_len"] = 0
+            info["idle_seconds"] = None
+
+            if isinstance(raw, str):
+                try:
+                    data = json.loads(raw)
+                    info["state"] = data.get("state") or "unknown"
+                    info["history_len"] = len(data.get("conversation_history") or [])
+                    info["idle_seconds"] = _idle_seconds(data.get("updated_at"), now)
+                except (ValueError, AttributeError):
+                    info["state"] = "invalid"
+            elif raw is None:
+                # 掃描與讀取之間已過期
+                continue
+
+            yield info
+
+        scanned += len(keys)
+        limiter.acquire(len(keys))
+        if max_keys is not None and scanned >= max_keys:
+            return
+
+
+def _bump(bucket: Dict[str, Dict[str, int]], name: str, size: int):
+    entry = bucket.setdefault(name, {"count": 0, "bytes": 0})
+    entry["count"] += 1
+    entry["bytes"] += size
+
+
+def collect_session_stats(
+    store: BaseSessionStore,
+    version: str = "*",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_keys: Optional[int] = None,
+    ops_per_second: Optional[float] = DEFAULT_OPS_PER_SECOND,
+    top_n: int = 10,
+) -> Dict[str, Any]:
+    """
+    統計 session 的數量與記憶體用量
+
+    Returns:
+        依模組、版本、模組內狀態分組的 count / bytes，
+        以及沒有 TTL 的 key 數量與最大的 top_n 個 session
+    """
+    started = time.monotonic()
+    stats: Dict[str, Any] = {
+        "scanned": 0,
+        "total_bytes": 0,
+        "no_ttl": 0,
+        "by_module": {},
+        "by_version": {},
+        "by_state": {},
+        "largest": [],
+    }
+    largest: List[Dict[str, Any]] = []
+
+    for info in iter_session_info(
+        store,
+        version=version,
+        batch_size=batch_size,
+        max_keys=max_keys,
+        ops_per_second=ops_per_second,
+    ):
+        size = info["bytes"]
+        stats["scanned"] += 1
+        stats["total_bytes"] += size
+        if info["ttl"] == -1:
+            stats["no_ttl"] += 1
+
+        _bump(stats["by_module"], info["module"], size)
+        _bump(stats["by_version"], info["version"], size)
+        _bump(stats["by_state"].setdefault(info["module"], {}), info["state"], size)
+
+        if top_n > 0:
+            largest.append(
+                {
+                    "key": info["key"],
+                    "bytes": size,
+                    "state": info["state"],
+                    "history_len": info["history_len"],
+                    "ttl": info["ttl"],
+                }
+            )
+            if len(largest) > top_n * 4:
+                largest.sort(key=lambda item: item["bytes"], reverse=True)
+                del largest[top_n:]
+
+    largest.sort(key=lambda item: item["bytes"], reverse=True)
+    stats["largest"] = largest[:top_n]
+    stats["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def make_predicate(
+    module: Optional[str] = None,
+    states: Optional[List[str]] = None,
+    min_bytes: Optional[int] = None,
+    idle_seconds: Optional[float] = None,
+    min_history: Optional[int] = None,
+    no_ttl: bool = False,
+) -> Callable[[Dict[str, Any]], bool]:
+    """
+    根據條件建立 session 篩選函數（所有條件需同時成立）
+    """
+
+    def predicate(info: Dict[str, Any]) -> bool:
+        if module and info["module"] != module:
+            return False
+        if states and info["state"] not in states:
+            return False
+        if min_bytes is not None and info["bytes"] < min_bytes:
+            return False
+        if idle_seconds is not None:
+            idle = info.get("idle_seconds")
+            if idle is None or idle < idle_seconds:
+                return False
+        if min_history is not None and info["history_len"] < min_history:
+            return False
+        if no_ttl and info["ttl"] != -1:
+            return False
+        return True
+
+    return predicate
+
+
+def _compact_session(client: redis.Redis, key: str, keep_messages: int) -> bool:
+    """
+    壓縮單一 session：只保留最近 keep_messages 則對話與記憶，並保留原本的 TTL
+    使用 WATCH 避免覆蓋掉同時間被更新的會話
+    """
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            raw = pipe.get(key)
+            ttl = pipe.ttl(key)
+            if raw is None:
+                return False
+
+            data = json.loads(raw)
+            history = data.get("conversation_history") or []
+            memory = data.get("memory") or []
+            if len(history) <= keep_messages and len(memory) <= keep_messages:
+                return False
+
+            # keep_messages 為 0 時清空（history[-0:] 會保留整個列表）
+            data["conversation_history"] = history[-keep_messages:] if keep_messages else []
+            if "memory" in data:
+                data["memory"] = memory[-keep_messages:] if keep_messages else []
+            payload = json.dumps(data, ensure_ascii=False)
+
+            pipe.multi()
+            if ttl and ttl > 0:
+                pipe.setex(key, ttl, payload)
+            else:
+                pipe.set(key, payload)
+            pipe.execute()
+            return True
+        except redis.WatchError:
+            logger.info("會話壓縮時被更新，略過: %s", key)
+            return False
+        except ValueError:
+            return False
+
+
+def sweep_sessions(
+    store: BaseSessionStore,
+    predicate: Callable[[Dict[str, Any]], bool],
+    action: str = "purge",
+    version: str = "*",
+    keep_messages: int = 20,
+    dry_run: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_keys: Optional[int] = None,
+    ops_per_second: Optional[float] = DEFAULT_OPS_PER_SECOND,
+) -> Dict[str, Any]:
+    """
+    清除（purge）或壓縮（compact）符合條件的 session
+
+    Args:
+        predicate: make_predicate() 產生的篩選函數
+        action: 'purge' 或 'compact'
+        keep_messages: compact 時保留的對話則數
+        dry_run: True 時只統計符合的會話，不做任何修改
+
+    Returns:
+        掃描、符合、實際處理的數量與符合會話的總 bytes
+    """
+    if action not in ("purge", "compact"):
+        raise ValueError(f"不支援的操作: {action}")
+    if keep_messages < 0:
+        raise ValueError(f"keep_messages 不可為負數: {keep_messages}")
+
+    client = store.redis_client
+    result = {
+        "action": action,
+        "dry_run": dry_run,
+        "scanned": 0,
+        "matched": 0,
+        "matched_bytes": 0,
+        "affected": 0,
+    }
+    pending_deletes: List[str] = []
+
+    def flush_deletes():
+        if pending_deletes:
+            result["affected"] += client.unlink(*pending_deletes)
+            pending_deletes.clear()
+
+    for info in iter_session_info(
+        store,
+        version=version,
+        batch_size=batch_size,
+        max_keys=max_keys,
+        ops_per_second=ops_per_second,
+    ):
+        result["scanned"] += 1
+        if not predicate(info):
+            continue
+
+        result["matched"] += 1
+        result["matched_bytes"] += info["bytes"]
+        if dry_run:
+            continue
+
+        if action == "purge":
+            pending_deletes.append(info["key"])
+            if len(pending_deletes) >= batch_size:
+                flush_deletes()
+        elif _compact_session(client, info["key"], keep_messages):
+            result["affected"] += 1
+
+    if not dry_run:
+        flush_deletes()
+
+    return result
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Redis session 分析與清理工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p: argparse.ArgumentParser):
+        p.add_argument("--module", default="*", help="模組名稱（lifenum/angelnum/divination/auspicious），預設全部")
+        p.add_argument("--version", default="*", help="版本（free/paid），預設全部")
+        p.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE, help="每批 SCAN 數量")
+        p.add_argument("--max-keys", type=int, default=None, help="最多掃描的 key 數")
+        p.add_argument("--rate", type=float, default=DEFAULT_OPS_PER_SECOND, help="每秒最多處理的 key 數（0 表示不限）")
+
+    stats_parser = sub.add_parser("stats", help="統計 session 數量與記憶體用量")
+    add_common(stats_parser)
+    stats_parser.add_argument("--top", type=int, default=10, help="列出最大的前 N 個 session")
+
+    sweep_parser = sub.add_parser("sweep", help="清除或壓縮符合條件的 session")
+    add_common(sweep_parser)
+    sweep_parser.add_argument("--action", choices=["purge", "compact"], default="purge")
+    sweep_parser.add_argument("--state", action="append", help="只處理指定狀態（可重複）")
+    sweep_parser.add_argument("--min-bytes", type=int, default=None)
+    sweep_parser.add_argument("--idle-hours", type=float, default=None)
+    sweep_parser.add_argument("--min-history", type=int, default=None)
+    sweep_parser.add_argument("--no-ttl", action="store_true", help="只處理沒有 TTL 的 session")
+    sweep_parser.add_argument("--keep", type=int, default=20, help="compact 時保留的對話則數")
+    sweep_parser.add_argument("--execute", action="store_true", help="實際執行（預設為 dry run）")
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _build_parser().parse_args(argv)
+    store = BaseSessionStore(module_name=args.module)
+
+    if args.command == "stats":
+        result = collect_session_stats(
+            store,
+            version=args.version,
+            batch_size=args.batch,
+            max_keys=args.max_keys,
+            ops_per_second=args.rate,
+            top_n=args.top,
+        )
+    else:
+        predicate = make_predicate(
+            states=args.state,
+            min_bytes=args.min_bytes,
+            idle_seconds=args.idle_hours * 3600 if args.idle_hours is not None else None,
+            min_history=args.min_history,
+            no_ttl=args.no_ttl,
+        )
+        result = sweep_sessions(
+            store,
+            predicate,
+            action=args.action,
+            version=args.version,
+            keep_messages=args.keep,
+            dry_run=not args.execute,
+            batch_size=args.batch,
+            max_keys=args.max_keys,
+            ops_per_second=args.rate,
+        )
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,17 @@ Session 存儲管理模組（共享基礎設施）
 """
 
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List
 from datetime import datetime
 from .redis_client import get_redis_client, SESSION_TTL
+from .logger import get_logger
+from .tracing import traced
+
+logger = get_logger(__name__)
+
+
+def _session_attributes(store, version, *args, **kwargs):
+    return {"module": store.module_name, "version": version}
 
 
 class BaseSessionStore:
@@ -27,6 +35,7 @@ class BaseSessionStore:
         """
         return f"session:{self.module_name}:{version}:{session_id}"
     
+    @traced("redis.session.save", "redis", _session_attributes)
     def save(self, version: str, session_id: str, data: Dict[str, Any], ttl: Optional[int] = None) -> bool:
         """
         保存會話到 Redis
@@ -56,13 +65,14 @@ class BaseSessionStore:
                 json.dumps(data, ensure_ascii=False)
             )
             
-            print(f"[Redis] 保存會話: {key}, TTL: {expire_time}s")
+            logger.debug("保存會話: %s, TTL: %ss", key, expire_time)
             return True
             
         except Exception as e:
-            print(f"[Redis] 保存會話失敗: {e}")
+            logger.error("保存會話失敗: %s", e)
             return False
     
+    @traced("redis.session.load", "redis", _session_attributes)
     def load(self, version: str, session_id: str) -> Optional[Dict[str, Any]]:
         """
         從 Redis 載入會話
@@ -79,15 +89,15 @@ class BaseSessionStore:
             data_str = self.redis_client.get(key)
             
             if data_str is None:
-                print(f"[Redis] 會話不存在: {key}")
+                logger.debug("會話不存在: %s", key)
                 return None
             
             data = json.loads(data_str)
-            print(f"[Redis] 載入會話: {key}")
+            logger.debug("載入會話: %s", key)
             return data
             
         except Exception as e:
-            print(f"[Redis] 載入會話失敗: {e}")
+            logger.error("載入會話失敗: %s", e)
             return None
     
     def delete(self, version: str, session_id: str) -> bool:
@@ -104,11 +114,11 @@ class BaseSessionStore:
         try:
             key = self._make_key(version, session_id)
             result = self.redis_client.delete(key)
-            print(f"[Redis] 刪除會話: {key}, 結果: {result}")
+            logger.info("刪除會話: %s, 結果: %s", key, result)
             return result > 0
             
         except Exception as e:
-            print(f"[Redis] 刪除會話失敗: {e}")
+            logger.error("刪除會話失敗: %s", e)
             return False
     
     def exists(self, version: str, session_id: str) -> bool:
@@ -119,7 +129,7 @@ class BaseSessionStore:
             key = self._make_key(version, session_id)
             return self.redis_client.exists(key) > 0
         except Exception as e:
-            print(f"[Redis] 檢查會話存在失敗: {e}")
+            logger.error("檢查會話存在失敗: %s", e)
             return False
     
     def get_ttl(self, version: str, session_id: str) -> int:
@@ -133,6 +143,30 @@ class BaseSessionStore:
             key = self._make_key(version, session_id)
             return self.redis_client.ttl(key)
         except Exception as e:
-            print(f"[Redis] 獲取 TTL 失敗: {e}")
+            logger.error("獲取 TTL 失敗: %s", e)
             return -2
 
+    def scan_keys(self, version: str = "*", count: int = 200) -> Iterator[List[str]]:
+        """
+        以 SCAN 增量遍歷此模組的 session key（不使用會阻塞 Redis 的 KEYS）
+
+        module_name 為 "*" 時會遍歷所有模組的 session。
+
+        Args:
+            version: 版本（'free'、'paid' 或 '*'）
+            count: 每次 SCAN 的 COUNT 提示值
+
+        Yields:
+            每一批掃描到的 key 列表
+        """
+        pattern = self._make_key(version, "*")
+        cursor = 0
+        while True:
+            cursor, keys = self.redis_client.scan(
+                cursor=cursor, match=pattern, count=count
+            )
+            if keys:
+                yield keys
+            if cursor == 0:
+                break
+
@@ -0,0 +1,176 @@
+"""
+LLM 准入控制的回歸測試（pytest shared/test_admission.py）
+"""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from shared import admission
+from shared.admission import (
+    FOLLOW_UP,
+    FREE,
+    PAID,
+    AdmissionController,
+    GlobalTokenBucket,
+    LLMOverloadedError,
+    OVERLOADED_REPLY,
+    PriorityLimiter,
+    admit,
+    overloaded_response,
+    request_priority,
+)
+
+
+def _wait_until(predicate, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待逾時"
+        time.sleep(0.005)
+
+
+@pytest.mark.parametrize(
+    "context, expected",
+    [
+        # 擲筊首次提問前（免費版第一輪）不是追問
+        ({"blueprint": "divination", "version": "free", "state": "waiting_question"}, FREE),
+        ({"blueprint": "divination", "version": "free", "state": "asking_for_question"}, FOLLOW_UP),
+        ({"blueprint": "lifenum", "version": "free", "state": "waiting_question"}, FOLLOW_UP),
+        ({"blueprint": "angelnum", "version": "free", "state": "conversation"}, FOLLOW_UP),
+        ({"blueprint": "auspicious", "version": "free", "state": "completed"}, FOLLOW_UP),
+        ({"blueprint": "auspicious", "version": "free", "state": "waiting_basic_info"}, FREE),
+        ({"blueprint": "lifenum", "version": "paid", "state": "waiting_question"}, PAID),
+        ({"state": "completed"}, FREE),
+        ({}, FREE),
+    ],
+)
+def test_request_priority(context, expected):
+    assert request_priority(context) == expected
+
+
+def test_limiter_weighted_ordering():
+    """名額釋出時依 4:2:1 分配給等待中的等級，付費版先取得"""
+    limiter = PriorityLimiter(capacity=1, free_share=1.0)
+    assert limiter.acquire(PAID, 0)
+
+    granted = []
+
+    def worker(priority):
+        if limiter.acquire(priority, 5):
+            granted.append(priority)
+            limiter.release()
+
+    threads = [
+        threading.Thread(target=worker, args=(priority,))
+        for priority in (FREE, FOLLOW_UP, PAID)
+        for _ in range(7)
+    ]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: all(len(limiter._waiting[priority]) == 7 for priority in (PAID, FOLLOW_UP, FREE)))
+
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(granted) == 21
+    assert granted[0] == PAID
+    assert Counter(granted[:7]) == {PAID: 4, FOLLOW_UP: 2, FREE: 1}
+
+
+def test_limiter_free_share_cap():
+    """免費版最多使用 free_share 比例的名額，其餘保留給付費版與追問"""
+    limiter = PriorityLimiter(capacity=4, free_share=0.75)
+    assert all(limiter.acquire(FREE, 0) for _ in range(3))
+    assert not limiter.acquire(FREE, 0.05)
+    assert limiter.acquire(PAID, 0)
+    assert not limiter.acquire(FOLLOW_UP, 0.05)
+
+
+def test_limiter_timeout_cleanup():
+    """逾時的等待者會從隊列移除，等待數量表回到原值"""
+    limiter = PriorityLimiter(capacity=1)
+    before = {priority: admission._queue_depth.value(priority=priority) for priority in (PAID, FREE)}
+    assert limiter.acquire(PAID, 0)
+
+    assert not limiter.acquire(FREE, 0.05)
+    assert not limiter.acquire(PAID, 0.05)
+
+    assert all(not queue for queue in limiter._waiting.values())
+    assert {priority: admission._queue_depth.value(priority=priority) for priority in (PAID, FREE)} == before
+
+    # 逾時的等待者不影響之後的分配
+    limiter.release()
+    assert limiter.acquire(FREE, 0)
+
+
+def test_global_bucket_fails_open(monkeypatch):
+    """Redis 不可用時放行，並在 GLOBAL_RETRY_SECONDS 內不再嘗試"""
+    calls = []
+
+    def broken_client():
+        calls.append(1)
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(admission, "get_redis_client", broken_client)
+    bucket = GlobalTokenBucket(rate=10, burst=1)
+
+    assert bucket.try_acquire(FREE)
+    assert bucket.try_acquire(PAID)
+    assert len(calls) == 1
+
+
+def test_global_bucket_free_reserve(monkeypatch):
+    """免費版不能使用保留的令牌，付費版可以"""
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(admission, "get_redis_client", lambda: fakeredis.FakeRedis())
+    bucket = GlobalTokenBucket(rate=0.001, burst=2, free_reserve=0.25)
+
+    assert bucket.try_acquire(FREE)
+    assert not bucket.try_acquire(FREE)
+    assert bucket.try_acquire(PAID)
+    assert not bucket.try_acquire(PAID)
+
+
+def _saturated_controller() -> AdmissionController:
+    controller = AdmissionController(
+        limiter=PriorityLimiter(capacity=1),
+        bucket=GlobalTokenBucket(rate=0),
+    )
+    controller.max_waits = {priority: 0.05 for priority in controller.max_waits}
+    controller.acquire(PAID)
+    return controller
+
+
+def test_controller_sheds_when_full():
+    controller = _saturated_controller()
+    with pytest.raises(LLMOverloadedError) as excinfo:
+        controller.acquire(FREE)
+    assert excinfo.value.priority == FREE
+    assert excinfo.value.reason == "shed_local"
+
+
+def test_admit_exempts_safety(monkeypatch):
+    """安全審核不經准入控制，負載過高時仍會執行"""
+    monkeypatch.setattr(admission, "_controller", _saturated_controller())
+
+    with admit(priority=FREE, site="safety") as priority:
+        assert priority == FREE
+
+    with pytest.raises(LLMOverloadedError):
+        with admit(priority=FREE, site="chat"):
+            pass
+
+
+def test_overloaded_response_keeps_state():
+    """模板回應回報呼叫端傳入的（載入時）狀態，並提示前端可重送"""
+    response = overloaded_response("sid", "waiting_basic_info", "test")
+    assert response == {
+        "session_id": "sid",
+        "response": OVERLOADED_REPLY,
+        "state": "waiting_basic_info",
+        "requires_input": True,
+        "overloaded": True,
+    }
@@ -0,0 +1,329 @@
+"""
+請求追蹤（共享基礎設施）
+每個 HTTP 請求建立一條 trace，Redis、Supabase、全域規則與 LLM 呼叫各自記錄成 span：
+
+- trace 與 span 堆疊保存在 contextvars，沒有進行中的 trace 時（背景執行緒、CLI）span 不做任何事
+- 回應帶上 Server-Timing header（redis / db / rules / llm / total），瀏覽器開發者工具即可看到各階段耗時
+- 完整的 trace 由背景執行緒輸出，不佔用請求時間：
+    TRACE_EXPORT=file  以 JSONL 附加到 TRACE_FILE
+    TRACE_EXPORT=otlp  以 OTLP/HTTP JSON 送到 TRACE_OTLP_ENDPOINT
+- TRACE_SAMPLE_RATE 決定輸出比例；佇列滿時直接丟棄，不影響請求
+- 請求帶有 W3C traceparent header 時沿用其 trace id，與上游的追蹤串接
+
+使用方式：
+    @traced("db.lifenum.get_many", "db")
+    def get_many(...): ...
+
+    with span("llm.reading", "llm", model=model) as current:
+        ...
+        current.set(prompt_tokens=120)
+"""
+
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 設定（可用環境變數調整）
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").lower()  # "" / "file" / "otlp"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "life-number-backend")
+
+EXPORT_QUEUE_SIZE = 1000  # 待輸出的 trace 上限（超過時丟棄）
+EXPORT_BATCH_SIZE = 50
+
+# Server-Timing 中各類 span 的順序
+SERVER_TIMING_KINDS = ("queue", "redis", "db", "rules", "llm")
+
+# 對外部服務的呼叫（OTLP 的 CLIENT span）
+CLIENT_KINDS = ("redis", "db", "llm")
+
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+def tracing_enabled() -> bool:
+    return bool(TRACE_EXPORT) or TRACE_SERVER_TIMING
+
+
+class Span:
+    """單一階段的耗時紀錄"""
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """一個請求的所有 span（只在處理該請求的執行緒中使用）"""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes: Any):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.root = Span(name, "server", parent_id, attributes)
+        self.spans: List[Span] = [self.root]
+        self._stack: List[Span] = [self.root]
+        # 各類 span 的總耗時與次數（巢狀的同類 span 只計最外層）
+        self.totals: Dict[str, List[float]] = {}
+
+    def start_span(self, name: str, kind: str, attributes: Dict[str, Any]) -> Span:
+        current = Span(name, kind, self._stack[-1].span_id, attributes)
+        self.spans.append(current)
+        self._stack.append(current)
+        return current
+
+    def end_span(self, current: Span):
+        current.end_ns = time.time_ns()
+        if self._stack and self._stack[-1] is current:
+            self._stack.pop()
+        elif current in self._stack:
+            self._stack.remove(current)
+        if not any(parent.kind == current.kind for parent in self._stack):
+            total = self.totals.setdefault(current.kind, [0.0, 0])
+            total[0] += current.duration_ms
+            total[1] += 1
+
+    def server_timing(self) -> str:
+        """Server-Timing header 內容，例如 redis;dur=2.1;desc="2", llm;dur=3120.4;desc="1", total;dur=3180.2"""
+        parts = []
+        for kind in SERVER_TIMING_KINDS:
+            if kind in self.totals:
+                duration, count = self.totals[kind]
+                parts.append(f'{kind};dur={duration:.1f};desc="{int(count)}"')
+        parts.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "spans": [item.to_dict() for item in self.spans]}
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+# ---------- 追蹤 API ----------
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Optional[Token]:
+    """
+    開始一條 trace（追蹤關閉時返回 None）
+
+    Args:
+        name: 根 span 名稱（例如 "POST /life/<version>/api/chat"）
+        traceparent: W3C traceparent header
+    """
+    if not tracing_enabled():
+        return None
+    trace_id = parent_id = None
+    match = _TRACEPARENT_RE.match((traceparent or "").strip().lower())
+    if match:
+        trace_id, parent_id = match.groups()
+    return _trace.set(Trace(name, trace_id, parent_id, **attributes))
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def end_trace(token: Optional[Token], error: Optional[BaseException] = None) -> Optional[Trace]:
+    """結束 trace、還原上下文，並依取樣比例送交背景輸出"""
+    if token is None:
+        return None
+    trace = _trace.get()
+    _trace.reset(token)
+    if trace is None:
+        return None
+    if error is not None:
+        trace.root.error = f"{type(error).__name__}: {error}"
+    trace.root.end_ns = time.time_ns()
+    if TRACE_EXPORT and random.random() < TRACE_SAMPLE_RATE:
+        _get_exporter().submit(trace)
+    return trace
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Optional[Span]]:
+    """記錄一個 span（沒有進行中的 trace 時 yield None）"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, kind, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.end_span(current)
+
+
+def traced(
+    name: str,
+    kind: str = "internal",
+    attributes: Optional[Callable[..., Dict[str, Any]]] = None,
+):
+    """
+    以 span 包住整個函數的裝飾器
+
+    Args:
+        attributes: 以函數參數產生 span 屬性的函數（例如 lambda self, table, *a, **k: {"table": table}）
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return func(*args, **kwargs)
+            attrs = attributes(*args, **kwargs) if attributes else {}
+            with span(name, kind, **attrs):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ---------- 輸出 ----------
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(trace: Trace, item: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": trace.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": 2 if item.kind == "server" else (3 if item.kind in CLIENT_KINDS else 1),
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns or item.start_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in {"span.kind": item.kind, **item.attributes}.items()
+            if value is not None
+        ],
+        "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+    }
+    if item.parent_id:
+        data["parentSpanId"] = item.parent_id
+    return data
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """轉換成 OTLP/HTTP JSON 的 ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "shared.tracing"},
+                        "spans": [_otlp_span(trace, item) for trace in traces for item in trace.spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class TraceExporter:
+    """背景輸出 trace（檔案或 OTLP），請求執行緒只需放入佇列"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.dropped = 0
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def submit(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception as e:
+                logger.warning("輸出 %d 條 trace 失敗: %s", len(batch), e)
+
+    def export(self, traces: List[Trace]):
+        if self.mode == "otlp":
+            import requests
+
+            response = requests.post(TRACE_OTLP_ENDPOINT, json=to_otlp(traces), timeout=5)
+            response.raise_for_status()
+            return
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            for trace in traces:
+                f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+_exporter: Optional[TraceExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def _get_exporter() -> TraceExporter:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = TraceExporter(TRACE_EXPORT)
+    return _exporter
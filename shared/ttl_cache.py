@@ -0,0 +1,68 @@
+"""
+有上限的 TTL 快取（共享基礎設施）
+以 OrderedDict 實作 LRU：超過筆數上限時淘汰最久未使用的項目，過期項目在讀取時移除
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """執行緒安全的 LRU + TTL 快取"""
+
+    def __init__(self, max_entries: int = 128, ttl: float = 3600):
+        """
+        Args:
+            max_entries: 最多保留的項目數
+            ttl: 每個項目的有效秒數
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """取得項目（不存在或已過期時返回 default）"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """寫入項目（ttl 為 None 時使用預設值）"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def values(self) -> List[Any]:
+        """目前未過期的所有項目（不影響 LRU 順序與命中統計）"""
+        now = time.monotonic()
+        with self._lock:
+            return [entry[1] for entry in self._data.values() if entry[0] > now]
+
+    def __len__(self) -> int:
+        return len(self._data)